@@ -0,0 +1,1069 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the automation helpers. Everything runs offline.
+
+    python benchmark.py contacts --sizes 1000 10000 50000
+    python benchmark.py pool --pages 1 2 4 8 --messages 200
+    python benchmark.py typing --lengths 10 100 1000
+    python benchmark.py rate --hours 24 --per-minute 20 --hourly-cap 600
+    python benchmark.py schedule --jobs 100000
+    python benchmark.py e2e --sizes 10 1000 10000 --baseline bench_baseline.json
+    python benchmark.py lean --avatars 300
+    python benchmark.py warmup --boot-delay 3000
+    python benchmark.py accounts --accounts 1 2 4 --messages 400
+    python benchmark.py voice --messages 5 --send-seconds 5
+    python benchmark.py importtime
+    python benchmark.py template --rows 1000000
+    python benchmark.py media --recipients 500 --size-mb 5
+    python benchmark.py import --rows 1000000 --duplicates 0.3
+    python benchmark.py store --size 1000000
+    python benchmark.py receipts --messages 100000 --sends 50
+    python benchmark.py invalid --dead 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+def _write_contacts(path, size):
+    contacts = {f'Contact {i:06d}': f'1555{i:07d}' for i in range(size)}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(contacts, f)
+    return list(contacts)
+
+
+def bench_contacts(args):
+    import contacts_manager
+
+    print(f"{'contacts':>10} {'first (ms)':>12} {'lookup (us)':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'contacts.json')
+            names = _write_contacts(path, size)
+            contacts_manager.invalidate_index()
+
+            # first call parses the file and builds the index
+            start = time.perf_counter()
+            contacts_manager.get_phone_by_name(names[0], path=path)
+            first_ms = (time.perf_counter() - start) * 1000
+
+            picks = [random.choice(names).upper() for _ in range(args.lookups)]
+            start = time.perf_counter()
+            for name in picks:
+                contacts_manager.get_phone_by_name(name, path=path)
+            per_lookup_us = (time.perf_counter() - start) / len(picks) * 1e6
+        print(f'{size:>10} {first_ms:>12.1f} {per_lookup_us:>12.2f}')
+    return 0
+
+
+def bench_pool(args):
+    """
+    Messages/minute for 1..N tabs against the local fake WhatsApp Web page.
+    The fake page has no one-active-tab rule, so this measures the pool's
+    overhead, not what the real site allows (one tab per session).
+    """
+    from fake_whatsapp import install_route_async
+    from send_whatsapp_async import send_many
+
+    print(f"{'pages':>6} {'msgs':>6} {'seconds':>9} {'msgs/min':>9}")
+    for pages in args.pages:
+        jobs = ({'phone': f'1555{i:07d}', 'message': f'bench {i}'} for i in range(args.messages))
+        with tempfile.TemporaryDirectory() as profile:
+            start = time.perf_counter()
+            results = send_many(jobs, profile_dir=profile, pages=pages, headless=True,
+                                setup_context=install_route_async)
+            elapsed = time.perf_counter() - start
+        ok = sum(1 for r in results if r['status'] in ('queued', 'sent', 'delivered'))
+        print(f'{pages:>6} {ok:>6} {elapsed:>9.2f} {ok / elapsed * 60:>9.0f}')
+    return 0
+
+
+def bench_typing(args):
+    """Composer fill time per typing strategy and message length (fake WhatsApp Web)."""
+    from playwright.sync_api import sync_playwright
+
+    import fake_whatsapp
+    import send_whatsapp
+
+    print(f"{'mode':>7} {'chars':>6} {'ms':>9} {'us/char':>9}")
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch(headless=True)
+        context = browser.new_context()
+        fake_whatsapp.install_route(context)
+        page = context.new_page()
+        page.goto(send_whatsapp.chat_url('15550001111', ''))
+        composer = send_whatsapp.MSG_SELECTORS[0]
+        for mode in send_whatsapp.TYPING_MODES:
+            for length in args.lengths:
+                # mix of ASCII, emoji, RTL and a line break every 80 chars
+                text = ''.join('\n' if i % 80 == 79 else 'aé😀ש'[i % 4] for i in range(length))
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    send_whatsapp.insert_message(page, composer, text, mode)
+                ms = (time.perf_counter() - start) / args.repeat * 1000
+                print(f'{mode:>7} {length:>6} {ms:>9.1f} {ms * 1000 / length:>9.1f}')
+        browser.close()
+    return 0
+
+
+def bench_rate(args):
+    """Simulated day of pacing: achieved throughput vs. configured ceilings, and per-recipient fairness."""
+    import collections
+
+    from rate_limiter import RateScheduler, SimulatedClock
+
+    clock = SimulatedClock()
+    sched = RateScheduler(per_minute=args.per_minute, burst=args.burst,
+                          per_recipient_per_hour=args.per_recipient_per_hour,
+                          hourly_cap=args.hourly_cap, daily_cap=args.daily_cap,
+                          jitter=args.jitter, clock=clock, seed=1)
+    per_recipient = collections.Counter()
+    hours = collections.Counter()
+    start = time.perf_counter()
+    while clock.now() < args.hours * 3600:
+        recipient = f'r{sched.sent % args.recipients}'
+        sched.next_slot('bench', recipient)
+        if clock.now() >= args.hours * 3600:
+            break
+        per_recipient[recipient] += 1
+        hours[int(clock.now() // 3600)] += 1
+    elapsed = time.perf_counter() - start
+    total = sum(hours.values())
+    print(f'simulated {args.hours} h in {elapsed:.2f} s real time: {total} sends, {total / args.hours:.0f}/h average')
+    print(f'busiest hour: {max(hours.values())} sends (hourly cap {args.hourly_cap}, per-minute {args.per_minute})')
+    print(f'per recipient: min {min(per_recipient.values())}, max {max(per_recipient.values())}')
+    return 0
+
+
+def bench_schedule(args):
+    """Load time for a large schedule file (mixed one-shot and cron jobs) and the cost of draining it."""
+    from datetime import datetime, timedelta
+
+    import message_scheduler
+
+    rng = random.Random(1)
+    crons = ['0 9 * * 1-5', '*/15 * * * *', '30 18 * * fri', '0 8 1 * *', '5 12 * * sun']
+    base = datetime.now() + timedelta(days=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'schedule.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            for i in range(args.jobs):
+                row = {'id': f'j{i}', 'phone': f'1555{i:07d}', 'message': f'Reminder {i}'}
+                if rng.random() < args.cron_share:
+                    row['cron'] = rng.choice(crons)
+                else:
+                    row['at'] = (base + timedelta(minutes=rng.randrange(60 * 24 * 30))).strftime('%Y-%m-%d %H:%M')
+                f.write(json.dumps(row) + '\n')
+        start = time.perf_counter()
+        jobs = message_scheduler.load_jobs(path)
+        parsed = time.perf_counter()
+        sched = message_scheduler.Scheduler(jobs, lambda batch: [job['id'] for job in batch])
+        built = time.perf_counter()
+    print(f'{args.jobs} jobs: parse {(parsed - start) * 1000:.0f} ms, heap build {(built - parsed) * 1000:.0f} ms, '
+          f'total {(built - start) * 1000:.0f} ms')
+    start = time.perf_counter()
+    batches = popped = 0
+    while len(sched):
+        batch = sched.due_batch(sched._heap[0][0])
+        batches += 1
+        popped += len(batch)
+    elapsed = time.perf_counter() - start
+    print(f'drained {popped} due entries in {batches} batches, {elapsed / max(1, popped) * 1e6:.1f} us each')
+    return 0
+
+
+def _browser_rss_mb():
+    """RSS of every browser process under this one (needs psutil; None without it)."""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 2 ** 20
+
+
+def _e2e_run(pw, size, args, server):
+    """One run: fresh profile, ensure_logged_in through the QR gate, then `size` sends."""
+    import fake_whatsapp
+    import metrics
+    import send_whatsapp
+
+    metrics.METRICS.reset()
+    hits = server.hits
+    with tempfile.TemporaryDirectory() as profile:
+        context = pw.chromium.launch_persistent_context(profile, headless=True)
+        fake_whatsapp.install_route(context, server_url=f'http://127.0.0.1:{server.server_address[1]}')
+        page = context.new_page()
+        # the browser holds the app, the chats and the DOM; the Python driver's own RSS barely moves
+        rss_before = _browser_rss_mb()
+        start = time.perf_counter()
+        send_whatsapp.ensure_logged_in(page, timeout=30)
+        statuses = {}
+        for i in range(size):
+            message = f'bench {i}'
+            if args.name_every and i % args.name_every == args.name_every - 1:
+                result = send_whatsapp.send_by_name(page, f'Contact {i % args.recipients}', message,
+                                                    confirm_timeout=args.confirm_timeout)
+            else:
+                result = send_whatsapp.send_by_phone(page, f'1555{i % args.recipients:07d}', message,
+                                                     confirm_timeout=args.confirm_timeout)
+            statuses[result.status] = statuses.get(result.status, 0) + 1
+        elapsed = time.perf_counter() - start
+        js_heap = page.evaluate('performance.memory ? performance.memory.usedJSHeapSize : null')
+        rss_after = _browser_rss_mb()
+        context.close()
+    ok = statuses.get('sent', 0) + statuses.get('delivered', 0)
+    return {
+        'messages': size,
+        'ok': ok,
+        'statuses': statuses,
+        'seconds': round(elapsed, 3),
+        'msgs_per_sec': round(ok / elapsed, 3) if elapsed else None,
+        'page_loads': server.hits - hits,
+        'browser_rss_mb': round(rss_after, 1) if rss_after is not None else None,
+        'browser_rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+        'js_heap_mb': round(js_heap / 2 ** 20, 1) if js_heap else None,
+        'stages': metrics.METRICS.snapshot(),
+    }
+
+
+def _compare_baseline(baseline, report, tolerance):
+    """Regression lines: throughput down or a stage's p95 up by more than `tolerance`."""
+    problems = []
+    for size, run in report['runs'].items():
+        old = baseline.get('runs', {}).get(size)
+        if not old:
+            continue
+        if old.get('msgs_per_sec') and run['msgs_per_sec'] is not None \
+                and run['msgs_per_sec'] < old['msgs_per_sec'] * (1 - tolerance):
+            problems.append(f"{size} msgs: {run['msgs_per_sec']:.2f} msgs/s vs baseline {old['msgs_per_sec']:.2f}")
+        for stage, stats in run['stages'].items():
+            before = old.get('stages', {}).get(stage, {}).get('p95_ms')
+            now = stats.get('p95_ms')
+            # ignore sub-5 ms wobble on fast stages
+            if before and now and now > before * (1 + tolerance) and now - before > 5:
+                problems.append(f'{size} msgs: {stage} p95 {now:.1f} ms vs baseline {before:.1f} ms')
+    return problems
+
+
+def bench_e2e(args):
+    """Throughput, stage latencies and memory for real send paths against the fake page on loopback HTTP."""
+    import threading
+
+    from playwright.sync_api import sync_playwright
+
+    import fake_whatsapp
+    import metrics
+
+    config = dict(loginDelay=args.login_delay, openDelay=args.open_delay, sentDelay=args.sent_delay,
+                  deliveredDelay=max(args.sent_delay, args.delivered_delay), failRate=args.fail_rate,
+                  openFailRate=args.open_fail_rate)
+    server = fake_whatsapp.make_server(0, fake_whatsapp.make_html(**config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    metrics.METRICS.enable()
+    report = {'config': dict(config, confirm_timeout=args.confirm_timeout, name_every=args.name_every),
+              'python': sys.version.split()[0], 'runs': {}}
+    print(f"{'msgs':>6} {'ok':>6} {'seconds':>8} {'msgs/s':>7} {'loads':>6} {'brws MB':>7} {'heap MB':>8}"
+          f" {'send p50':>9} {'send p95':>9} {'send p99':>9}")
+    try:
+        with sync_playwright() as pw:
+            for size in args.sizes:
+                run = _e2e_run(pw, size, args, server)
+                report['runs'][str(size)] = run
+                total = run['stages'].get('send_by_phone', {})
+                print(f"{size:>6} {run['ok']:>6} {run['seconds']:>8.1f} {run['msgs_per_sec']:>7.2f} "
+                      f"{run['page_loads']:>6} {run['browser_rss_mb'] or 0:>7.1f} {run['js_heap_mb'] or 0:>8.1f} "
+                      f"{total.get('p50_ms') or 0:>9.1f} {total.get('p95_ms') or 0:>9.1f} {total.get('p99_ms') or 0:>9.1f}")
+    finally:
+        server.shutdown()
+    print('Stage timings (last run):')
+    print(metrics.METRICS.summary())
+
+    if not args.baseline:
+        return 0
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    problems = _compare_baseline(baseline, report, args.tolerance)
+    for line in problems:
+        print('REGRESSION:', line)
+    if not problems:
+        print(f'No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).')
+    return 1 if problems else 0
+
+
+def bench_lean(args):
+    """Default vs --lean browser on the fake page with a sidebar full of avatars: ready time, requests, memory."""
+    from playwright.sync_api import sync_playwright
+
+    import browser_session
+    import fake_whatsapp
+    import send_whatsapp
+
+    html = fake_whatsapp.make_html(avatars=args.avatars)
+    print(f"{'mode':>8} {'ready ms':>9} {'load ms':>8} {'requests':>9} {'blocked':>8} {'ok':>4} "
+          f"{'browser MB':>11} {'heap MB':>8}")
+    with sync_playwright() as pw:
+        for mode in ('default', 'lean'):
+            for _ in range(args.repeat):
+                with tempfile.TemporaryDirectory() as profile:
+                    kwargs = {'headless': True}
+                    if mode == 'lean':
+                        browser_session.mark_logged_in(profile)
+                        kwargs = browser_session.lean_launch_kwargs(profile)
+                    start = time.perf_counter()
+                    context = pw.chromium.launch_persistent_context(profile, **kwargs)
+                    fake_whatsapp.install_route(context, html)
+                    stats = browser_session.block_heavy_resources(context) if mode == 'lean' else None
+                    page = context.new_page()
+                    requests = []
+                    page.on('request', requests.append)
+                    send_whatsapp.ensure_logged_in(page, timeout=30)
+                    ready_ms = (time.perf_counter() - start) * 1000
+                    # the load event waits for every image the sidebar asked for
+                    load_start = time.perf_counter()
+                    page.goto(send_whatsapp.WHATSAPP_URL, wait_until='load')
+                    load_ms = (time.perf_counter() - load_start) * 1000
+                    ok = sum(1 for i in range(args.messages)
+                             if send_whatsapp.send_by_phone(page, f'1555{i:07d}', f'lean {i}').status == 'sent')
+                    rss = _browser_rss_mb()
+                    heap = page.evaluate('performance.memory ? performance.memory.usedJSHeapSize : 0') / 2 ** 20
+                    context.close()
+                print(f"{mode:>8} {ready_ms:>9.0f} {load_ms:>8.0f} {len(requests):>9} "
+                      f"{stats['blocked'] if stats else 0:>8} {ok:>4} "
+                      f"{rss if rss is not None else float('nan'):>11.0f} {heap:>8.1f}")
+    return 0
+
+
+def _time_to_first_send(pw, profile, html, trust_stamp):
+    """Launch on `profile`, ensure_logged_in, send one message; returns (ready ms, first send ms)."""
+    import fake_whatsapp
+    import send_whatsapp
+
+    start = time.perf_counter()
+    context = pw.chromium.launch_persistent_context(profile, headless=True)
+    fake_whatsapp.install_route(context, html)
+    page = context.new_page()
+    send_whatsapp.ensure_logged_in(page, timeout=60, profile_dir=profile, trust_stamp=trust_stamp)
+    ready = time.perf_counter()
+    send_whatsapp.send_by_phone(page, '15550001111', 'warm-up check')
+    done = time.perf_counter()
+    context.close()
+    return (ready - start) * 1000, (done - start) * 1000
+
+
+def bench_warmup(args):
+    """Time-to-ready for a repeat invocation: full check vs trusted login stamp vs attaching over CDP."""
+    import subprocess
+
+    from playwright.sync_api import sync_playwright
+
+    import browser_session
+    import fake_whatsapp
+    import send_whatsapp
+
+    html = fake_whatsapp.make_html(bootDelay=args.boot_delay, loginDelay=args.login_delay)
+    print(f"{'mode':>14} {'ready ms':>9} {'first send ms':>14}")
+    with tempfile.TemporaryDirectory() as profile:
+        with sync_playwright() as pw:
+            # first run in the profile: QR gate + boot, stamps the session
+            ready, first = _time_to_first_send(pw, profile, html, trust_stamp=False)
+            print(f"{'first login':>14} {ready:>9.0f} {first:>14.0f}")
+            for mode, trust in (('full check', False), ('trusted stamp', True)):
+                for _ in range(args.repeat):
+                    ready, first = _time_to_first_send(pw, profile, html, trust_stamp=trust)
+                    print(f'{mode:>14} {ready:>9.0f} {first:>14.0f}')
+            exe = pw.chromium.executable_path
+
+    # a browser that outlives the invocations, attached to over CDP each time
+    with tempfile.TemporaryDirectory() as profile:
+        proc = subprocess.Popen([exe, '--headless=new', f'--remote-debugging-port={args.cdp_port}',
+                                 f'--user-data-dir={profile}', 'about:blank'],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        endpoint = f'http://127.0.0.1:{args.cdp_port}'
+        try:
+            with sync_playwright() as pw:
+                for attempt in range(50):
+                    try:
+                        browser, context, page = browser_session.attach_over_cdp(pw, endpoint)
+                        break
+                    except Exception:
+                        time.sleep(0.2)
+                else:
+                    print('Could not attach to the test browser.')
+                    return 1
+                fake_whatsapp.install_route(context, html)
+                send_whatsapp.ensure_logged_in(page, timeout=60)
+                browser.close()
+            for _ in range(args.repeat):
+                with sync_playwright() as pw:
+                    start = time.perf_counter()
+                    browser, context, page = browser_session.attach_over_cdp(pw, endpoint)
+                    send_whatsapp.ensure_logged_in(page, timeout=60)
+                    ready = time.perf_counter()
+                    fake_whatsapp.install_route(context, html)
+                    send_whatsapp.send_by_phone(page, '15550001111', 'warm-up check')
+                    done = time.perf_counter()
+                    browser.close()
+                print(f"{'attached (CDP)':>14} {(ready - start) * 1000:>9.0f} {(done - start) * 1000:>14.0f}")
+        finally:
+            proc.terminate()
+            proc.wait()
+    return 0
+
+
+def bench_accounts(args):
+    """Campaign throughput vs number of accounts (worker processes) for multi_account.py on the fake page."""
+    import functools
+
+    import fake_whatsapp
+    import multi_account
+
+    html = fake_whatsapp.make_html(sentDelay=args.sent_delay, deliveredDelay=args.sent_delay * 2,
+                                   openDelay=args.open_delay)
+    setup = functools.partial(fake_whatsapp.install_route, html=html)
+    print(f"{'accounts':>9} {'msgs':>6} {'seconds':>8} {'msgs/min':>9} {'scaling':>8} {'busiest':>8}")
+    single = None
+    for n in args.accounts:
+        with tempfile.TemporaryDirectory() as tmp:
+            recipients = os.path.join(tmp, 'recipients.jsonl')
+            with open(recipients, 'w', encoding='utf-8') as f:
+                for i in range(args.messages):
+                    f.write(json.dumps({'phone': f'1555{i:07d}', 'message': f'bench {i}'}) + '\n')
+            profiles = [os.path.join(tmp, f'account{i}') for i in range(n)]
+            run_args = multi_account.build_parser().parse_args(
+                ['--profiles', *profiles, '--recipients', recipients, '--headless', '--delay', '0',
+                 '--window', str(args.window), '--confirm-timeout', '5'])
+            start = time.perf_counter()
+            coordinator = multi_account.run(run_args, setup_context=setup)
+            elapsed = time.perf_counter() - start
+        ok = coordinator.counts['ok']
+        rate = ok / elapsed * 60
+        single = single or rate / n
+        busiest = max(w.stats['ok'] for w in coordinator.workers.values())
+        print(f'{n:>9} {ok:>6} {elapsed:>8.1f} {rate:>9.0f} {rate / single:>7.2f}x {busiest / max(ok, 1):>8.0%}')
+    return 0
+
+
+def _voice_serial(paths, recognizer, speaker, sender):
+    """The old assistant loop: every stage waits for the one before, sends included."""
+    import voice_whatsapp
+
+    dialog = voice_whatsapp.Dialog()
+    speaker.say('Ready')
+    for path in paths:
+        prompts, _, job = dialog.handle(recognizer.recognize(voice_whatsapp.WavClip(path)))
+        for prompt in prompts:
+            speaker.say(prompt)
+        if job:
+            speaker.say('Message sent.' if sender(job) else 'Could not send.')
+        if dialog.finished:
+            break
+
+
+def bench_voice(args):
+    """A scripted conversation from WAV files: serial loop vs the threaded voice pipeline."""
+    import contextlib
+    import io
+    import wave
+
+    import contacts_manager
+    import voice_whatsapp
+
+    def sender(job):
+        time.sleep(args.send_seconds)
+        return True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        contacts_manager.CONTACTS_FILE = os.path.join(tmp, 'contacts.json')
+        _write_contacts(contacts_manager.CONTACTS_FILE, 50)
+        contacts_manager.invalidate_index()
+        paths = []
+        script = []
+        for i in range(args.messages):
+            script += [f'send message to contact {i:06d}', f'benchmark message number {i}', 'yes']
+        script.append('exit')
+        for i, text in enumerate(script):
+            path = os.path.join(tmp, f'utterance{i:03d}.wav')
+            with wave.open(path, 'wb') as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(16000)
+                w.writeframes(b'\0\0' * int(16000 * args.utterance_seconds))
+            with open(path[:-4] + '.txt', 'w', encoding='utf-8') as f:
+                f.write(text)
+            paths.append(path)
+
+        def parts():
+            return (voice_whatsapp.StubRecognizer(latency=args.recognize_seconds),
+                    voice_whatsapp.PrintSpeaker(seconds_per_char=args.speak_ms_per_char / 1000))
+
+        print(f"{'mode':>9} {'messages':>9} {'seconds':>8} {'s/message':>10}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            _voice_serial(paths, *parts(), sender)
+            serial = time.perf_counter() - start
+            start = time.perf_counter()
+            voice_whatsapp.VoicePipeline(voice_whatsapp.WavSource(paths), *parts(), sender=sender).run(greeting='Ready')
+            pipelined = time.perf_counter() - start
+    for mode, seconds in (('serial', serial), ('pipeline', pipelined)):
+        print(f'{mode:>9} {args.messages:>9} {seconds:>8.2f} {seconds / args.messages:>10.2f}')
+    return 0
+
+
+def bench_template(args):
+    """Validate + render a large recipients CSV: compiled templates vs per-row str.format_map."""
+    import argparse as _argparse
+    import csv
+
+    import message_template
+    import send_whatsapp
+    from recipients import iter_recipients
+
+    class NullWriter:
+        def write(self, **result):
+            pass
+
+    plain = 'Hi {first_name}, invoice {id} is due {due}.'
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'recipients.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['phone', 'first_name', 'id', 'due', 'amount'])
+            for i in range(args.rows):
+                w.writerow([f'1555{i:07d}', f'name{i}', i, '2026-11-01', f'{i * 1.5:.2f}'])
+
+        def timed(label, func, subtract=0.0):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start - subtract
+            print(f'{label:>36} {elapsed:>8.2f} {elapsed / args.rows * 1e6:>7.2f}')
+            return elapsed
+
+        def each_row(render):
+            def run():
+                for _, row in iter_recipients(path):
+                    render(row)
+            return run
+
+        print(f"{'stage':>36} {'seconds':>8} {'us/row':>7}")
+        parse = timed('read CSV (subtracted below)', each_row(lambda row: None))
+        timed('str.format_map, plain', each_row(plain.format_map), parse)
+        for label, text in (('plain', plain), ('filters + defaults', args.template)):
+            template = message_template.compile_template(text)
+            timed(f'compiled render, {label}', each_row(template.render), parse)
+            run_args = _argparse.Namespace(recipients=path, message=text)
+            timed(f'validate pass, {label}', lambda: send_whatsapp.validate_recipients(run_args), parse)
+            timed(f'job stream, {label}',
+                  lambda: sum(1 for _ in send_whatsapp.iter_campaign_jobs(run_args, NullWriter())), parse)
+    return 0
+
+
+def bench_media(args):
+    """Attachment cost per recipient: re-reading + hashing the file every send vs media.MediaCache; then media vs text sends on the fake page."""
+    import hashlib
+
+    import media
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'brochure.pdf')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(int(args.size_mb * 2 ** 20)))
+
+        def uncached():
+            for _ in range(args.recipients):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                hashlib.sha256(data).hexdigest()
+
+        cache = media.MediaCache()
+
+        def cached():
+            for _ in range(args.recipients):
+                cache.get(path)
+
+        print(f'{args.recipients} recipients, {args.size_mb} MB attachment')
+        print(f"{'preparation':>24} {'seconds':>8} {'ms/recipient':>13} {'MB read':>8}")
+        for label, func in (('read + hash every send', uncached), ('MediaCache', cached)):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            read = args.recipients * args.size_mb if func is uncached else cache.stats['bytes_read'] / 2 ** 20
+            print(f'{label:>24} {elapsed:>8.3f} {elapsed / args.recipients * 1000:>13.3f} {read:>8.1f}')
+
+        try:
+            from playwright.sync_api import sync_playwright
+        except ImportError:
+            print('playwright is not installed; skipping the browser comparison.')
+            return 0
+        import fake_whatsapp
+        import metrics
+        import send_whatsapp
+
+        html = fake_whatsapp.make_html(sentDelay=args.sent_delay, uploadMsPerMB=args.upload_ms_per_mb)
+        metrics.METRICS.reset()
+        statuses = {}
+        with sync_playwright() as pw, tempfile.TemporaryDirectory() as profile:
+            context = pw.chromium.launch_persistent_context(profile, headless=True)
+            fake_whatsapp.install_route(context, html=html)
+            page = context.new_page()
+            send_whatsapp.ensure_logged_in(page, timeout=30)
+            for i in range(args.sends):
+                phone = f'1555{i:07d}'
+                text = send_whatsapp.send_by_phone(page, phone, f'bench {i}')
+                sent = send_whatsapp.send_media(page, send_whatsapp.MEDIA.get(path), phone=phone, caption=f'bench {i}')
+                for result in (text, sent):
+                    statuses[result.status] = statuses.get(result.status, 0) + 1
+            context.close()
+        stages = metrics.METRICS.snapshot()
+        print(f'\n{args.sends} text + {args.sends} media sends on the fake page ({args.upload_ms_per_mb} ms/MB upload): {statuses}')
+        print(f"{'stage':>24} {'p50 ms':>8} {'p95 ms':>8}")
+        for name in ('send_by_phone', 'send_media', 'media.attach', 'media.preview', 'media.upload', 'media.time_to_sent'):
+            if name in stages:
+                print(f"{name:>24} {stages[name]['p50_ms']:>8.1f} {stages[name]['p95_ms']:>8.1f}")
+    return 0
+
+
+def bench_import(args):
+    """csv_to_json.py contact import: rows/min and de-dup memory per --dedup mode on a synthetic messy list."""
+    import csv
+
+    import csv_to_json
+    import phone_numbers
+
+    rng = random.Random(7)
+    formats = ('+44 7911 {:06d}', '07911 {:06d}', '447911{:06d}', '0044 (7911) {:06d}')
+    unique = max(1, int(args.rows * (1 - args.duplicates)))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'contacts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['name', 'phone', 'city'])
+            for i in range(args.rows):
+                if rng.random() < args.invalid:
+                    phone = rng.choice(('n/a', '12345', '+999 1234567', '07911'))
+                else:
+                    phone = rng.choice(formats).format(rng.randrange(unique))
+                w.writerow([f'Contact {i}', phone, 'London'])
+
+        start = time.perf_counter()
+        for _, row in csv_to_json.iter_rows(path):
+            pass
+        parse = time.perf_counter() - start
+        start = time.perf_counter()
+        for phone in ('+44 7911 123456', '07911 123456', '447911123456') * 100000:
+            phone_numbers.normalize_or_none(phone, '44')
+        print(f'{args.rows} rows, {unique} distinct numbers, ~{args.invalid:.0%} invalid; '
+              f'CSV read {parse:.2f}s; normalize {(time.perf_counter() - start) / 300000 * 1e6:.2f} us/number')
+        print(f"{'dedup':>6} {'seconds':>8} {'rows/min':>12} {'written':>9} {'dupes':>9} {'invalid':>8} {'dedup MB':>9}")
+        for dedup in ('none', 'set', 'bloom'):
+            out = os.path.join(tmp, 'contacts.jsonl')
+            start = time.perf_counter()
+            stats = csv_to_json.convert(path, out, default_cc='44', dedup=dedup, capacity=args.rows)
+            elapsed = time.perf_counter() - start
+            print(f"{dedup:>6} {elapsed:>8.2f} {args.rows / elapsed * 60:>12,.0f} {stats['written']:>9} "
+                  f"{stats['duplicates']:>9} {stats['invalid']:>8} {stats.get('dedup_bytes', 0) / 2 ** 20:>9.1f}")
+    return 0
+
+
+def bench_store(args):
+    """Contact book: one update as a contacts.json rewrite vs a contacts.db point write, plus lookups and import/export."""
+    import contact_store
+    import contacts_manager
+
+    def per_op(func, n):
+        start = time.perf_counter()
+        for i in range(n):
+            func(i)
+        return (time.perf_counter() - start) / n * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'contacts.json')
+        db_path = os.path.join(tmp, 'contacts.db')
+        names = _write_contacts(json_path, args.size)
+        print(f"{args.size} contacts")
+        print(f"{'operation':>28} {'ms/op':>10}")
+        start = time.perf_counter()
+        with contact_store.ContactStore(db_path) as store:
+            store.import_file(json_path)
+        print(f"{'import contacts.json -> db':>28} {(time.perf_counter() - start) * 1000:>10.0f}")
+        rows = (
+            ('update, json rewrite', lambda i: contacts_manager.add_contact(f'New {i}', '15550000000', json_path), args.json_ops),
+            ('update, db point write', lambda i: contacts_manager.add_contact(f'New {i}', '15550000000', db_path), args.ops),
+            ('delete, db point write', lambda i: contacts_manager.remove_contact(f'New {i}', db_path), args.ops),
+            ('lookup name, db', lambda i: contacts_manager.get_phone_by_name(names[i * 7919 % args.size], db_path), args.ops),
+            ('lookup phone, db', lambda i: contacts_manager.get_name_by_phone(f'1555{i * 7919 % args.size:07d}', db_path), args.ops),
+        )
+        for label, func, n in rows:
+            print(f'{label:>28} {per_op(func, n):>10.3f}')
+        start = time.perf_counter()
+        contacts_manager.get_store(db_path).export_file(os.path.join(tmp, 'export.json'))
+        print(f"{'export db -> json':>28} {(time.perf_counter() - start) * 1000:>10.0f}")
+    return 0
+
+
+# Import-time budgets (ms, cumulative, best of --runs) for the entry points, and the heavy
+# dependencies none of them may load before they are actually needed. The budgets hold on a
+# machine where REFERENCE_IMPORTS take REFERENCE_MS; a slower machine gets them scaled by its
+# own reference time (never below 1x), so they stay tight without failing on slow hardware
+IMPORT_BUDGETS_MS = {
+    'send_whatsapp': 60,
+    'send_whatsapp_auto': 45,
+    'send_whatsapp_desktop': 45,
+    'voice_whatsapp': 45,
+    'multi_account': 70,
+    'contacts_manager': 30,
+}
+REFERENCE_IMPORTS = 'argparse, json, subprocess'
+REFERENCE_MS = 28
+HEAVY_MODULES = ('playwright', 'pywinauto', 'pyperclip', 'pyttsx3', 'speech_recognition', 'winsound',
+                 'sqlite3', 'http.server', 'urllib.request', 'multiprocessing')
+
+
+def _importtime(module):
+    """
+    (cumulative ms of `module`, names of every module it pulled in) from
+    `python -X importtime`; `module` may be a comma-separated list, whose
+    top-level costs are summed.
+    """
+    import subprocess
+
+    wanted = {name.strip() for name in module.split(',')}
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total, loaded = None, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        loaded.add(name.strip())
+        if name.strip() in wanted and not name[1:].startswith(' '):
+            total = (total or 0) + int(cumulative) / 1000
+    return total, loaded
+
+
+def import_budget_scale(runs=5):
+    """How much slower this machine imports REFERENCE_IMPORTS than the one the budgets were set on (>= 1)."""
+    best = min(_importtime(REFERENCE_IMPORTS)[0] for _ in range(runs))
+    return max(1.0, best / REFERENCE_MS)
+
+
+def check_import(module, runs=5, scale=1.0):
+    """(best ms, budget ms, heavy modules loaded) for one entry point of IMPORT_BUDGETS_MS."""
+    measured = [_importtime(module) for _ in range(runs)]
+    best = min(total for total, _ in measured)
+    heavy = sorted(name for name in measured[0][1]
+                   if any(name == h or name.startswith(h + '.') for h in HEAVY_MODULES))
+    return best, IMPORT_BUDGETS_MS[module] * scale, heavy
+
+
+def bench_importtime(args):
+    """Import cost of each entry point against IMPORT_BUDGETS_MS; exits 1 on a budget or heavy-import violation."""
+    problems = []
+    scale = args.budget_scale or import_budget_scale(args.runs)
+    print(f'budget scale {scale:.2f}x')
+    print(f"{'module':>22} {'best ms':>8} {'budget':>7}  heavy imports")
+    for module in IMPORT_BUDGETS_MS:
+        best, budget, heavy = check_import(module, args.runs, scale)
+        print(f"{module:>22} {best:>8.1f} {budget:>7.0f}  {', '.join(heavy) or '-'}")
+        if best > budget:
+            problems.append(f'{module}: {best:.1f} ms > {budget:.0f} ms')
+        if heavy:
+            problems.append(f"{module}: imports {', '.join(heavy)} at load time")
+    for line in problems:
+        print('REGRESSION:', line)
+    return 1 if problems else 0
+
+
+def bench_receipts(args):
+    """receipts.ReceiptTracker: batch handling + log cost offline, then push receipts for real sends on the fake page."""
+    import receipts
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'receipts.log')
+        tracker = receipts.ReceiptTracker(log_path)
+        jobs = [f'job:{i}' for i in range(args.messages)]
+        with tracker._lock:
+            tracker.jobs.update((job, 'pending') for job in jobs)
+        now = time.time()
+        start = time.perf_counter()
+        for status in ('sent', 'delivered', 'read'):
+            for i in range(0, len(jobs), args.batch):
+                # the bubble and the chat row both report; the duplicate is dropped in Python
+                batch = [[job, status, now] for job in jobs[i:i + args.batch] for _ in (0, 1)]
+                tracker._on_batch(None, batch)
+        elapsed = time.perf_counter() - start
+        tracker.close()
+        size = os.path.getsize(log_path)
+        print(f"{args.messages} messages x 3 ticks in batches of {args.batch}: {tracker.stats['events']} events, "
+              f"{tracker.stats['batches']} batches, {elapsed / tracker.stats['events'] * 1e6:.2f} us/event, "
+              f"log {size / tracker.stats['events']:.0f} B/event")
+        start = time.perf_counter()
+        replayed = receipts.load_receipts(log_path)
+        print(f'load_receipts: {len(replayed)} jobs in {(time.perf_counter() - start) * 1000:.0f} ms')
+
+        try:
+            from playwright.sync_api import sync_playwright
+        except ImportError:
+            print('playwright is not installed; skipping the browser run.')
+            return 0
+        import fake_whatsapp
+        import send_whatsapp
+
+        html = fake_whatsapp.make_html(sentDelay=args.sent_delay, deliveredDelay=args.delivered_delay,
+                                       readDelay=args.read_delay)
+        tracker = receipts.ReceiptTracker(os.path.join(tmp, 'browser.log'), batch_ms=args.batch_ms)
+        with sync_playwright() as pw, tempfile.TemporaryDirectory() as profile:
+            context = pw.chromium.launch_persistent_context(profile, headless=True)
+            fake_whatsapp.install_route(context, html=html)
+            page = context.new_page()
+            send_whatsapp.ensure_logged_in(page, timeout=30)
+            tracker.attach(context)
+            start = time.perf_counter()
+            for i in range(args.sends):
+                phone = f'1555{i % max(1, args.chats):07d}'
+                result = send_whatsapp.send_by_phone(page, phone, f'bench {i}', until='queued')
+                if result:
+                    tracker.track(page, f'job:{i}', phone)
+            send_elapsed = time.perf_counter() - start
+            counts = tracker.drain(page, timeout=args.wait, until='read')
+            waited = time.perf_counter() - start - send_elapsed
+            # attribute churn on every tick icon: what the observer costs a busy page
+            churn_ms = page.evaluate(CHURN_JS)
+            context.close()
+        tracker.close()
+        print(f'\n{args.sends} sends to {args.chats} chats on the fake page ({send_elapsed:.1f}s), '
+              f'receipts after {waited:.1f}s more: {counts}')
+        print(f"{tracker.stats['events']} events in {tracker.stats['batches']} batches "
+              f"({tracker.stats['events'] / max(1, tracker.stats['batches']):.1f} per binding call); "
+              f'20 rounds of attribute churn on every tick icon: {churn_ms:.1f} ms with the observer attached')
+    return 0
+
+
+CHURN_JS = """() => {
+    const start = performance.now();
+    const ticks = document.querySelectorAll('[data-icon^="msg-"]');
+    for (let n = 0; n < 20; n++) for (const el of ticks) el.setAttribute('aria-label', 'churn ' + n);
+    return performance.now() - start;
+}"""
+
+
+def bench_invalid(args):
+    """Dead numbers: the old composer timeout vs racing the invalid-number dialog vs the negative cache."""
+    import invalid_numbers
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = invalid_numbers.InvalidNumberCache().attach(tmp)
+        numbers = [f'1555{i:07d}' for i in range(args.cached)]
+        for number in numbers:
+            cache.add(number)
+        start = time.perf_counter()
+        cache.save()
+        save_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        cache = invalid_numbers.InvalidNumberCache().attach(tmp)
+        load_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for number in numbers:
+            cache.get(number)
+        lookup_us = (time.perf_counter() - start) / len(numbers) * 1e6
+        print(f'{args.cached} cached numbers: save {save_ms:.0f} ms, load {load_ms:.0f} ms, '
+              f'lookup {lookup_us:.2f} us, file {os.path.getsize(cache.path) / 2 ** 10:.0f} KiB')
+
+        try:
+            from playwright.sync_api import sync_playwright
+        except ImportError:
+            print('playwright is not installed; skipping the browser comparison.')
+            return 0
+        import fake_whatsapp
+        import send_whatsapp
+
+        dead = [f'1999{i:07d}' for i in range(args.dead)]
+        html = fake_whatsapp.make_html(invalidNumbers=dead, openDelay=args.open_delay)
+        send_whatsapp.INVALID_NUMBERS.attach(path=os.path.join(tmp, 'run.json'))
+        rows = []
+        with sync_playwright() as pw, tempfile.TemporaryDirectory() as profile:
+            context = pw.chromium.launch_persistent_context(profile, headless=True)
+            fake_whatsapp.install_route(context, html=html)
+            page = context.new_page()
+            send_whatsapp.ensure_logged_in(page, timeout=30)
+
+            def legacy(phone):
+                # what a dead number used to cost: the full chat-open wait, then every selector lookup
+                page.goto(send_whatsapp.chat_url(phone, 'hi'))
+                send_whatsapp.wait_for_chat_open(page)
+                send_whatsapp.SELECTORS.resolve(page, 'compose', timeout=2000)
+                send_whatsapp.SELECTORS.resolve(page, 'send', timeout=1000)
+
+            def send(phone):
+                send_whatsapp.send_by_phone(page, phone, 'hi', nav='goto')
+
+            for label, func, phones in (('composer timeout (old)', legacy, dead[:args.legacy]),
+                                        ('dialog race', send, dead),
+                                        ('negative cache', send, dead)):
+                start = time.perf_counter()
+                for phone in phones:
+                    func(phone)
+                if phones:
+                    rows.append((label, (time.perf_counter() - start) / len(phones) * 1000))
+            context.close()
+        print(f'\n{args.dead} numbers not on WhatsApp on the fake page:')
+        print(f"{'path':>24} {'ms/number':>10}")
+        for label, ms in rows:
+            print(f'{label:>24} {ms:>10.1f}')
+        print('cache stats:', send_whatsapp.INVALID_NUMBERS.stats)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for WhatsApp automation helpers.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('contacts', help='Contact lookup cost vs. address book size')
+    p.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    p.add_argument('--lookups', type=int, default=10000)
+    p.set_defaults(func=bench_contacts)
+
+    p = sub.add_parser('pool', help='Async sender pool throughput vs. number of tabs (fake WhatsApp Web)')
+    p.add_argument('--pages', type=int, nargs='+', default=[1, 2, 4, 8])
+    p.add_argument('--messages', type=int, default=100)
+    p.set_defaults(func=bench_pool)
+
+    p = sub.add_parser('typing', help='Composer fill time per --typing strategy (fake WhatsApp Web)')
+    p.add_argument('--lengths', type=int, nargs='+', default=[10, 100, 1000, 4000])
+    p.add_argument('--repeat', type=int, default=5)
+    p.set_defaults(func=bench_typing)
+
+    p = sub.add_parser('rate', help='Simulated-clock throughput and fairness of the rate scheduler')
+    p.add_argument('--hours', type=float, default=24)
+    p.add_argument('--per-minute', type=float, default=20)
+    p.add_argument('--burst', type=int, default=3)
+    p.add_argument('--per-recipient-per-hour', type=float, default=2)
+    p.add_argument('--hourly-cap', type=int, default=600)
+    p.add_argument('--daily-cap', type=int, default=10000)
+    p.add_argument('--jitter', type=float, default=1.0)
+    p.add_argument('--recipients', type=int, default=500)
+    p.set_defaults(func=bench_rate)
+
+    p = sub.add_parser('schedule', help='Load time for a large timed/recurring schedule file')
+    p.add_argument('--jobs', type=int, default=100000)
+    p.add_argument('--cron-share', type=float, default=0.2)
+    p.set_defaults(func=bench_schedule)
+
+    p = sub.add_parser('e2e', help='send_by_phone/send_by_name/ensure_logged_in against the fake page on loopback HTTP')
+    p.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    p.add_argument('--recipients', type=int, default=50, help='Distinct chats to rotate through')
+    p.add_argument('--name-every', type=int, default=10, help='Every Nth send goes through send_by_name (0: never)')
+    p.add_argument('--login-delay', type=int, default=500, help='ms the fake QR gate takes per fresh profile')
+    p.add_argument('--open-delay', type=int, default=20)
+    p.add_argument('--sent-delay', type=int, default=50)
+    p.add_argument('--delivered-delay', type=int, default=200)
+    p.add_argument('--fail-rate', type=float, default=0.01, help='Share of messages stuck on the clock icon')
+    p.add_argument('--open-fail-rate', type=float, default=0.02, help='Share of searches that find nothing')
+    p.add_argument('--confirm-timeout', type=int, default=1000, help='ms; bounds the wait on stuck messages')
+    p.add_argument('--baseline', help='JSON baseline: written if missing (or with --save-baseline), else compared')
+    p.add_argument('--save-baseline', action='store_true')
+    p.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before a regression is reported')
+    p.set_defaults(func=bench_e2e)
+
+    p = sub.add_parser('lean', help='Default vs --lean browser: ready time, requests and memory (fake WhatsApp Web)')
+    p.add_argument('--avatars', type=int, default=300, help='Profile pictures in the fake chat list')
+    p.add_argument('--messages', type=int, default=5)
+    p.add_argument('--repeat', type=int, default=3)
+    p.set_defaults(func=bench_lean)
+
+    p = sub.add_parser('warmup', help='Time-to-ready: full login check vs trusted stamp vs attach over CDP')
+    p.add_argument('--boot-delay', type=int, default=3000, help='ms the fake app takes to boot on every load')
+    p.add_argument('--login-delay', type=int, default=500, help='ms of the fake QR scan on first login')
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--cdp-port', type=int, default=9333)
+    p.set_defaults(func=bench_warmup)
+
+    p = sub.add_parser('accounts', help='multi_account.py throughput vs number of accounts (fake WhatsApp Web)')
+    p.add_argument('--accounts', type=int, nargs='+', default=[1, 2, 4])
+    p.add_argument('--messages', type=int, default=400)
+    p.add_argument('--window', type=int, default=2)
+    p.add_argument('--sent-delay', type=int, default=300, help='ms until the fake single tick (network round trip)')
+    p.add_argument('--open-delay', type=int, default=100)
+    p.set_defaults(func=bench_accounts)
+
+    p = sub.add_parser('voice', help='Voice assistant: serial loop vs threaded pipeline, driven from WAV files')
+    p.add_argument('--messages', type=int, default=5)
+    p.add_argument('--send-seconds', type=float, default=5.0, help='Simulated send time (the desktop draft wait)')
+    p.add_argument('--recognize-seconds', type=float, default=0.3, help='Simulated recognizer latency per utterance')
+    p.add_argument('--speak-ms-per-char', type=float, default=2.0, help='Simulated TTS speed')
+    p.add_argument('--utterance-seconds', type=float, default=0.5, help='Length of each generated WAV')
+    p.set_defaults(func=bench_voice)
+
+    p = sub.add_parser('importtime', help='Entry-point import time vs budget, and no heavy imports at load (-X importtime)')
+    p.add_argument('--runs', type=int, default=5, help='Take the best of this many fresh interpreters')
+    p.add_argument('--budget-scale', type=float, help='Multiply every budget by this instead of the measured machine factor')
+    p.set_defaults(func=bench_importtime)
+
+    p = sub.add_parser('template', help='Validate + render cost of per-recipient message templates')
+    p.add_argument('--rows', type=int, default=1000000)
+    p.add_argument('--template', default='Hi {first_name|title?there}, invoice {id} for {amount|number:,.2f} is due {due|date:%d %b}.')
+    p.set_defaults(func=bench_template)
+
+    p = sub.add_parser('media', help='Attachment preparation per recipient (cached vs not), then media vs text send time')
+    p.add_argument('--recipients', type=int, default=500)
+    p.add_argument('--size-mb', type=float, default=5.0)
+    p.add_argument('--sends', type=int, default=20, help='Recipients for the fake-page comparison')
+    p.add_argument('--sent-delay', type=int, default=50)
+    p.add_argument('--upload-ms-per-mb', type=int, default=200, help='Simulated upload speed on the fake page')
+    p.set_defaults(func=bench_media)
+
+    p = sub.add_parser('receipts', help='Receipt tracker: events/batches and log size offline, then push receipts on the fake page')
+    p.add_argument('--messages', type=int, default=100000, help='Tracked jobs for the offline run')
+    p.add_argument('--batch', type=int, default=200, help='Events per binding call in the offline run')
+    p.add_argument('--sends', type=int, default=50)
+    p.add_argument('--chats', type=int, default=10, help='Distinct recipients for the sends')
+    p.add_argument('--batch-ms', type=int, default=250)
+    p.add_argument('--sent-delay', type=int, default=50)
+    p.add_argument('--delivered-delay', type=int, default=200)
+    p.add_argument('--read-delay', type=int, default=600)
+    p.add_argument('--wait', type=float, default=30.0, help='Seconds to wait for every message to be read')
+    p.set_defaults(func=bench_receipts)
+
+    p = sub.add_parser('invalid', help='Numbers not on WhatsApp: old timeout vs dialog race vs negative cache')
+    p.add_argument('--cached', type=int, default=100000, help='Entries for the offline cache run')
+    p.add_argument('--dead', type=int, default=20, help='Dead numbers sent to on the fake page')
+    p.add_argument('--legacy', type=int, default=2, help='How many of them also go through the old 15 s+ path')
+    p.add_argument('--open-delay', type=int, default=300, help='ms before the chat or the dialog shows')
+    p.set_defaults(func=bench_invalid)
+
+    p = sub.add_parser('import', help='csv_to_json.py contact import throughput per de-dup mode')
+    p.add_argument('--rows', type=int, default=1000000)
+    p.add_argument('--duplicates', type=float, default=0.3, help='Approximate share of repeated numbers')
+    p.add_argument('--invalid', type=float, default=0.05, help='Share of malformed numbers')
+    p.set_defaults(func=bench_import)
+
+    p = sub.add_parser('store', help='Contact book updates and lookups: contacts.json vs contacts.db (contact_store.py)')
+    p.add_argument('--size', type=int, default=1000000)
+    p.add_argument('--ops', type=int, default=2000, help='Operations timed per database row')
+    p.add_argument('--json-ops', type=int, default=3, help='Updates timed for the (slow) JSON rewrite')
+    p.set_defaults(func=bench_store)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Browser setup shared by the web senders: the `--lean` launch profile, a
+per-profile "last logged in" stamp, and attaching to a running Chromium.
+
+Lean mode is for send-only machines. It runs headless once the profile is
+known to be logged in, launches Chromium with background features switched
+off, and answers image/media/font requests (avatars, stickers, thumbnails,
+media downloads) with an empty 204 so they never hit the network:
+
+    context = pw.chromium.launch_persistent_context(profile_dir, **lean_launch_kwargs(profile_dir))
+    stats = block_heavy_resources(context)
+
+Everything the composer needs (documents, scripts, styles, XHR/websocket
+traffic, emoji sprites) still loads, and media *uploads* are never blocked.
+
+Warm start: session_fresh() says whether this profile was verified as logged
+in within SESSION_TTL and still carries WhatsApp's session keys in its
+localStorage, so ensure_logged_in can skip booting the app just to look at
+it. attach_over_cdp() reuses a Chromium that is already running (started
+with --remote-debugging-port) and its open WhatsApp tab, skipping the
+browser launch as well.
+"""
+import glob
+import json
+import os
+import time
+
+SESSION_FILE = 'session.json'
+# how long a verified login is trusted without looking at the app
+SESSION_TTL = 6 * 3600
+# localStorage keys WhatsApp Web keeps while a device is linked
+SESSION_MARKERS = (b'last-wid-md', b'last-wid')
+
+# Chromium switches that cost memory/CPU/bandwidth and do nothing for sending
+LEAN_ARGS = [
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-breakpad',
+    '--disable-domain-reliability',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--mute-audio',
+    '--disable-gpu',
+    '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,'
+    'CalculateNativeWinOcclusion,InterestFeedContentSuggestions',
+]
+
+BLOCKED_TYPES = frozenset(('image', 'media', 'font'))
+# avatars come from here whatever the request type
+BLOCKED_HOSTS = ('pps.whatsapp.net',)
+# media downloads; GETs only, so attachments can still be uploaded
+MEDIA_HOSTS = ('mmg.whatsapp.net', 'cdn.whatsapp.net')
+# the composer renders emoji from sprite images
+ALLOWED_SUBSTRINGS = ('/emoji',)
+
+
+def _host_in(url, names):
+    host = url.split('://', 1)[-1].split('/', 1)[0].split(':', 1)[0]
+    return any(host == name or host.endswith('.' + name) for name in names)
+
+
+def should_block(url, resource_type, method='GET'):
+    """True for requests a send-only session can do without."""
+    if any(s in url for s in ALLOWED_SUBSTRINGS):
+        return False
+    if _host_in(url, BLOCKED_HOSTS):
+        return True
+    if method == 'GET' and _host_in(url, MEDIA_HOSTS):
+        return True
+    return resource_type in BLOCKED_TYPES
+
+
+def block_heavy_resources(context):
+    """Route every request of `context` through should_block(); returns live {'blocked', 'allowed'} counts."""
+    stats = {'blocked': 0, 'allowed': 0}
+
+    def handle(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, request.method):
+            stats['blocked'] += 1
+            route.fulfill(status=204, body=b'')
+        else:
+            stats['allowed'] += 1
+            # fallback() rather than continue_() so routes registered earlier (e.g. the fake page) still run
+            route.fallback()
+    context.route('**/*', handle)
+    return stats
+
+
+async def block_heavy_resources_async(context):
+    stats = {'blocked': 0, 'allowed': 0}
+
+    async def handle(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, request.method):
+            stats['blocked'] += 1
+            await route.fulfill(status=204, body=b'')
+        else:
+            stats['allowed'] += 1
+            await route.fallback()
+    await context.route('**/*', handle)
+    return stats
+
+
+# -- login stamp ----------------------------------------------------------------
+
+def _session_path(profile_dir):
+    return os.path.join(profile_dir, SESSION_FILE)
+
+
+def read_session(profile_dir):
+    try:
+        with open(_session_path(profile_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def mark_logged_in(profile_dir):
+    """Record that WhatsApp Web was logged in with this profile just now."""
+    data = read_session(profile_dir)
+    data['verified_at'] = time.time()
+    tmp = _session_path(profile_dir) + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, _session_path(profile_dir))
+    except Exception as e:
+        print(f'Warning: could not save session stamp: {e}')
+
+
+def mark_logged_out(profile_dir):
+    data = read_session(profile_dir)
+    if data.pop('verified_at', None) is not None:
+        try:
+            with open(_session_path(profile_dir), 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except Exception:
+            pass
+
+
+def profile_session_markers(profile_dir):
+    """
+    Look for WhatsApp's session keys in the profile's localStorage files on
+    disk (no browser needed). True/False, or None when the profile has no
+    localStorage yet (or it lives somewhere else) and it can't be told.
+    """
+    files = glob.glob(os.path.join(profile_dir, 'Default', 'Local Storage', 'leveldb', '*.l[od][gb]'))
+    if not files:
+        return None
+    for path in files:
+        try:
+            if os.path.getsize(path) > 16 * 2 ** 20:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        if b'web.whatsapp.com' in data and any(marker in data for marker in SESSION_MARKERS):
+            return True
+    return False
+
+
+def session_fresh(profile_dir, ttl=SESSION_TTL):
+    """True when a login was verified within `ttl` seconds and the profile still holds the session keys."""
+    stamp = read_session(profile_dir).get('verified_at')
+    if not stamp or time.time() - stamp > ttl:
+        return False
+    return profile_session_markers(profile_dir) is not False
+
+
+def headless_ok(profile_dir):
+    """Headless is only safe once a QR scan has happened in this profile (nobody can scan a hidden window)."""
+    return read_session(profile_dir).get('verified_at') is not None
+
+
+def lean_launch_kwargs(profile_dir, launch_kwargs=None):
+    """Launch options for --lean: headless when the profile is logged in, plus LEAN_ARGS."""
+    kwargs = dict(launch_kwargs or {})
+    kwargs['args'] = list(kwargs.get('args', [])) + LEAN_ARGS
+    kwargs['headless'] = headless_ok(profile_dir)
+    return kwargs
+
+
+# -- attach to a running browser -------------------------------------------------
+
+def find_whatsapp_page(context, url_prefix='https://web.whatsapp.com'):
+    for page in context.pages:
+        if page.url.startswith(url_prefix):
+            return page
+    return None
+
+
+def attach_over_cdp(pw, endpoint):
+    """
+    Connect to a Chromium started with --remote-debugging-port (e.g.
+    http://127.0.0.1:9222). Returns (browser, context, page); the page is the
+    already open WhatsApp tab when there is one. Closing `browser` afterwards
+    only disconnects - the user's browser keeps running.
+    """
+    browser = pw.chromium.connect_over_cdp(endpoint)
+    context = browser.contexts[0] if browser.contexts else browser.new_context()
+    page = find_whatsapp_page(context) or context.new_page()
+    return browser, context, page
@@ -0,0 +1,212 @@
+"""
+Fuzzy contact-name matching for the voice assistant.
+
+The matcher keeps three small indexes over contact names so a lookup only
+scores a handful of candidates instead of the whole address book:
+  - exact:    normalized name -> names
+  - trigrams: 3-char shingle -> name ids (narrows substring and fuzzy checks)
+  - phonetic: Soundex code of each word -> name ids (catches misheard names,
+              e.g. "jon" / "john", "smyth" / "smith")
+"""
+import difflib
+import heapq
+import threading
+
+import contacts_manager
+
+EXACT, SUBSTRING, FUZZY = 'exact', 'substring', 'fuzzy'
+_KIND_RANK = {EXACT: 0, SUBSTRING: 1, FUZZY: 2}
+
+_SOUNDEX_CODES = {}
+for _letters, _digit in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'),
+                         ('l', '4'), ('mn', '5'), ('r', '6')):
+    for _ch in _letters:
+        _SOUNDEX_CODES[_ch] = _digit
+
+
+def soundex(word):
+    """Classic 4-character Soundex code ('' for words without letters)."""
+    word = ''.join(ch for ch in word.lower() if ch.isalpha())
+    if not word:
+        return ''
+    code = word[0].upper()
+    last = _SOUNDEX_CODES.get(word[0], '')
+    for ch in word[1:]:
+        digit = _SOUNDEX_CODES.get(ch, '')
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in 'hw':
+            last = digit
+    return code.ljust(4, '0')
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ContactMatcher:
+    """
+    Incremental fuzzy index over contact names.
+
+    `match()` keeps the priority of the old linear scan (exact > substring >
+    fuzzy) and returns ranked (name, score, kind) tuples.
+    """
+
+    def __init__(self, names=(), cutoff=0.6, max_candidates=64):
+        self.cutoff = cutoff
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._ids = {}        # name -> id (ids grow in insertion order)
+        self._names = {}      # id -> name
+        self._norm = {}       # id -> normalized name
+        self._exact = {}      # normalized name -> set(ids)
+        self._grams = {}      # trigram -> set(ids)
+        self._phones = {}     # soundex -> set(ids)
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def add(self, name):
+        with self._lock:
+            if name in self._ids:
+                return
+            cid = self._next_id
+            self._next_id += 1
+            norm = contacts_manager.normalize_name(name)
+            self._ids[name] = cid
+            self._names[cid] = name
+            self._norm[cid] = norm
+            self._exact.setdefault(norm, set()).add(cid)
+            for gram in trigrams(norm):
+                self._grams.setdefault(gram, set()).add(cid)
+            for code in {soundex(w) for w in norm.split()} - {''}:
+                self._phones.setdefault(code, set()).add(cid)
+
+    def remove(self, name):
+        with self._lock:
+            cid = self._ids.pop(name, None)
+            if cid is None:
+                return
+            del self._names[cid]
+            norm = self._norm.pop(cid)
+            _discard(self._exact, norm, cid)
+            for gram in trigrams(norm):
+                _discard(self._grams, gram, cid)
+            for code in {soundex(w) for w in norm.split()} - {''}:
+                _discard(self._phones, code, cid)
+
+    def sync(self, names):
+        """Apply only the difference between the indexed names and `names`."""
+        names = list(names)
+        wanted = set(names)
+        for name in [n for n in self._ids if n not in wanted]:
+            self.remove(name)
+        # keep file order for new entries so substring ties resolve like before
+        for name in names:
+            if name not in self._ids:
+                self.add(name)
+
+    def match(self, query, limit=5):
+        norm = contacts_manager.normalize_name(query)
+        if not norm:
+            return []
+        with self._lock:
+            exact = self._exact.get(norm, set())
+            results = [(self._names[cid], 1.0, EXACT, cid) for cid in exact]
+            results += self._substring_matches(norm, exact)
+            if len(results) < limit:
+                seen = {r[3] for r in results}
+                results += self._fuzzy_matches(norm, seen)
+        results.sort(key=lambda r: (_KIND_RANK[r[2]], -r[1], r[3]))
+        return [(name, round(score, 3), kind) for name, score, kind, _ in results[:limit]]
+
+    def best(self, query):
+        matches = self.match(query, limit=1)
+        return matches[0][0] if matches else None
+
+    def _substring_matches(self, norm, skip):
+        grams = trigrams(norm)
+        # drop the padded leading/trailing shingles; a substring can sit mid-word
+        inner = [g for g in grams if not g.startswith(' ') and not g.endswith(' ')] if len(norm) >= 3 else []
+        if inner:
+            postings = sorted((self._grams.get(g, set()) for g in inner), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            # one or two characters: nothing to narrow with, scan the names
+            candidates = self._names.keys()
+        out = []
+        for cid in candidates:
+            if cid not in skip and norm in self._norm[cid]:
+                out.append((self._names[cid], len(norm) / len(self._norm[cid]), SUBSTRING, cid))
+        return out
+
+    def _fuzzy_matches(self, norm, skip):
+        # shingles shared by a big slice of the book ("con", "an ") cost a lot
+        # to count and barely rank anything, so skip them when rarer ones exist
+        postings = [self._grams[g] for g in trigrams(norm) if g in self._grams]
+        common = max(1000, len(self._ids) // 20)
+        rare = [ids for ids in postings if len(ids) <= common]
+        overlap = {}
+        for ids in rare or postings:
+            for cid in ids:
+                overlap[cid] = overlap.get(cid, 0) + 1
+        # every spoken word has to sound like some word of the contact name
+        codes = {soundex(w) for w in norm.split()} - {''}
+        postings = sorted((self._phones.get(c, set()) for c in codes), key=len)
+        phonetic = set(postings[0]).intersection(*postings[1:]) if postings else set()
+        if len(phonetic) > self.max_candidates * 4:
+            # too common a sound ("contact", "mr") to say anything useful
+            phonetic = set()
+        candidates = set(heapq.nlargest(self.max_candidates, overlap, key=overlap.get)) | phonetic
+
+        out = []
+        matcher = difflib.SequenceMatcher(b=norm, autojunk=False)
+        for cid in candidates - skip:
+            matcher.set_seq1(self._norm[cid])
+            score = matcher.ratio()
+            if cid in phonetic:
+                # sounds the same: good enough even if spelled quite differently
+                score = max(score, self.cutoff + 0.1)
+            if score >= self.cutoff:
+                out.append((self._names[cid], score, FUZZY, cid))
+        return out
+
+
+def _discard(postings, key, cid):
+    ids = postings.get(key)
+    if ids is not None:
+        ids.discard(cid)
+        if not ids:
+            del postings[key]
+
+
+_matcher = None
+_matcher_source = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher(path=None):
+    """
+    Process-wide matcher kept in sync with contacts_manager's cached index.
+    When the contacts file changes only the added/removed names are re-indexed.
+    """
+    global _matcher, _matcher_source
+    index = contacts_manager.get_index(path)
+    if _matcher is not None and _matcher_source is index:
+        return _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = ContactMatcher(index.contacts)
+        elif _matcher_source is not index:
+            _matcher.sync(index.contacts)
+        _matcher_source = index
+    return _matcher
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+SQLite contact book: point inserts, updates and deletes without rewriting a
+JSON file, safe with several processes reading and writing at once.
+
+    with ContactStore('contacts.db') as store:
+        store.upsert('Alice Smith', '+44 7911 123456')
+        store.phone_for('alice  smith')      # -> '+44 7911 123456'
+        store.name_for('447911123456')       # -> 'Alice Smith'
+        store.delete('Alice Smith')
+
+Names are unique by their normalized form, so 'alice smith' and 'Alice
+Smith' are the same contact. Lookups by normalized name and by phone digits
+go through secondary indexes. Every write is its own transaction, or one
+transaction per batch in upsert_many/import_file. The database runs in WAL
+mode, so readers in other processes (the voice assistant, bulk runners) see
+either the old or the new contact and never block a writer.
+
+contacts_manager uses a store whenever the contacts path ends in `.db`
+(contacts.db next to contacts.json is picked up automatically). JSON stays
+the exchange format:
+
+    python contact_store.py --db contacts.db import contacts.json
+    python contact_store.py --db contacts.db export backup.json
+    python contact_store.py --db contacts.db add "Alice Smith" 447911123456
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from contacts_manager import normalize_name, normalize_phone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    name_norm   TEXT NOT NULL UNIQUE,
+    phone       TEXT NOT NULL,
+    phone_norm  TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_phone ON contacts (phone_norm, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+UPSERT = ('INSERT INTO contacts (name, name_norm, phone, phone_norm, updated_at) VALUES (?, ?, ?, ?, ?) '
+          'ON CONFLICT (name_norm) DO UPDATE SET name=excluded.name, phone=excluded.phone, '
+          'phone_norm=excluded.phone_norm, updated_at=excluded.updated_at')
+INSERT_NEW = ('INSERT OR IGNORE INTO contacts (name, name_norm, phone, phone_norm, updated_at) '
+              'VALUES (?, ?, ?, ?, ?)')
+
+
+class ContactStore:
+    """
+    One connection to a contacts database; safe to share between threads.
+    `version` goes up with every committed change from any process, so
+    callers can cache derived views (contacts_manager's name index) and
+    notice when they are stale.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, sql, params=()):
+        """Run one statement in its own transaction and bump the version; returns rows changed."""
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front; a second writer waits instead of failing
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                changed = self.db.execute(sql, params).rowcount
+                if changed:
+                    self.db.execute("UPDATE meta SET value=value+1 WHERE key='version'")
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        return changed
+
+    @property
+    def version(self):
+        with self._lock:
+            return self.db.execute("SELECT value FROM meta WHERE key='version'").fetchone()[0]
+
+    def upsert(self, name, phone):
+        """Add `name`, or give it a new phone (and spelling); True if anything changed."""
+        name, phone = str(name).strip(), str(phone).strip()
+        norm = normalize_name(name)
+        if not norm:
+            raise ValueError('contact name is empty')
+        return self._write(UPSERT, (name, norm, phone, normalize_phone(phone), time.time())) > 0
+
+    def delete(self, name):
+        """Remove `name` (any spelling with the same normalized form); True if it existed."""
+        return self._write('DELETE FROM contacts WHERE name_norm=?', (normalize_name(name),)) > 0
+
+    def upsert_many(self, pairs, overwrite=True, batch=10000):
+        """
+        Write (name, phone) pairs, streamed `batch` per transaction. With
+        overwrite=False existing names keep their phone (first one wins, like
+        the JSON index). Returns the number of rows written.
+        """
+        sql = UPSERT if overwrite else INSERT_NEW
+        written = 0
+        rows = []
+
+        def flush():
+            nonlocal written
+            with self._lock:
+                self.db.execute('BEGIN IMMEDIATE')
+                try:
+                    before = self.db.total_changes
+                    self.db.executemany(sql, rows)
+                    changed = self.db.total_changes - before
+                    if changed:
+                        self.db.execute("UPDATE meta SET value=value+1 WHERE key='version'")
+                    self.db.execute('COMMIT')
+                except BaseException:
+                    self.db.execute('ROLLBACK')
+                    raise
+            written += changed
+            rows.clear()
+
+        now = time.time()
+        for name, phone in pairs:
+            name, phone = str(name).strip(), str(phone).strip()
+            norm = normalize_name(name)
+            if norm:
+                rows.append((name, norm, phone, normalize_phone(phone), now))
+            if len(rows) >= batch:
+                flush()
+        if rows:
+            flush()
+        return written
+
+    def replace_all(self, contacts):
+        """Make the store hold exactly the {name: phone} mapping `contacts`, in one transaction."""
+        now = time.time()
+        rows = {}
+        for name, phone in contacts.items():
+            name, phone = str(name).strip(), str(phone).strip()
+            norm = normalize_name(name)
+            if norm:
+                rows.setdefault(norm, (name, norm, phone, normalize_phone(phone), now))
+        with self._lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self.db.execute('CREATE TEMP TABLE IF NOT EXISTS keep (name_norm TEXT PRIMARY KEY)')
+                self.db.execute('DELETE FROM keep')
+                self.db.executemany('INSERT INTO keep VALUES (?)', ((norm,) for norm in rows))
+                self.db.execute('DELETE FROM contacts WHERE name_norm NOT IN (SELECT name_norm FROM keep)')
+                self.db.executemany(UPSERT, rows.values())
+                self.db.execute("UPDATE meta SET value=value+1 WHERE key='version'")
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+
+    def phone_for(self, name):
+        with self._lock:
+            row = self.db.execute('SELECT phone FROM contacts WHERE name_norm=?', (normalize_name(name),)).fetchone()
+        return row[0] if row else None
+
+    def name_for(self, phone):
+        """Name for a phone number, ignoring formatting; the oldest contact wins when several share it."""
+        digits = normalize_phone(phone)
+        if not digits:
+            return None
+        with self._lock:
+            row = self.db.execute('SELECT name FROM contacts WHERE phone_norm=? ORDER BY id LIMIT 1',
+                                  (digits,)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def __contains__(self, name):
+        return self.phone_for(name) is not None
+
+    def items(self, batch=10000):
+        """Yield (name, phone) in insertion order, fetched `batch` rows at a time."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self.db.execute('SELECT id, name, phone FROM contacts WHERE id > ? ORDER BY id LIMIT ?',
+                                       (last, batch)).fetchall()
+            if not rows:
+                return
+            for _, name, phone in rows:
+                yield name, phone
+            last = rows[-1][0]
+
+    def as_dict(self):
+        """{name: phone} for every contact (what contacts_manager.load_contacts returns)."""
+        with self._lock:
+            return dict(self.db.execute('SELECT name, phone FROM contacts ORDER BY id'))
+
+    def import_file(self, path, overwrite=True):
+        """Load a .json ({name: phone} or array), .jsonl or .csv contacts file; returns rows written."""
+        from csv_to_json import iter_rows
+
+        pairs = ((row.get('name', ''), row.get('phone', '')) for _, row in iter_rows(path)
+                 if row.get('name') and row.get('phone'))
+        return self.upsert_many(pairs, overwrite=overwrite)
+
+    def export_file(self, path):
+        """Write every contact to `path` (.json as {name: phone}, .jsonl/.csv as rows); replaced atomically."""
+        from csv_to_json import iter_chunks, open_writer
+
+        tmp = path + '.tmp'
+        count = 0
+        try:
+            with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                writer = open_writer(f, path, key='name', value='phone')
+                for chunk in iter_chunks(self.items()):
+                    writer.write_rows([{'name': name, 'phone': phone} for name, phone in chunk])
+                    count += len(chunk)
+                writer.close()
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the SQLite contact book used by contacts_manager.')
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contacts.db'),
+                        help='Contacts database (default: contacts.db next to this script)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('import', help='Add/update contacts from a .json, .jsonl or .csv file')
+    p.add_argument('file')
+    p.add_argument('--keep-existing', action='store_true', help='Do not change contacts that already exist')
+    p = sub.add_parser('export', help='Write every contact to a .json, .jsonl or .csv file')
+    p.add_argument('file')
+    p = sub.add_parser('add', help='Add a contact or change its number')
+    p.add_argument('name')
+    p.add_argument('phone')
+    p = sub.add_parser('remove', help='Delete a contact')
+    p.add_argument('name')
+    p = sub.add_parser('get', help='Look up a contact by name or phone')
+    p.add_argument('query')
+    args = parser.parse_args()
+
+    with ContactStore(args.db) as store:
+        start = time.perf_counter()
+        if args.command == 'import':
+            try:
+                written = store.import_file(args.file, overwrite=not args.keep_existing)
+            except (OSError, ValueError) as e:
+                print('Import failed:', e)
+                return 1
+            print(f'{written} contacts written in {time.perf_counter() - start:.1f}s; {len(store)} in {args.db}.')
+        elif args.command == 'export':
+            count = store.export_file(args.file)
+            print(f'{count} contacts exported to {args.file}.')
+        elif args.command == 'add':
+            store.upsert(args.name, args.phone)
+            print(f'Saved {args.name}: {args.phone}')
+        elif args.command == 'remove':
+            if not store.delete(args.name):
+                print(f'No contact named {args.name!r}.')
+                return 1
+            print(f'Removed {args.name}.')
+        else:
+            phone = store.phone_for(args.query)
+            name = None if phone else store.name_for(args.query)
+            if not phone and not name:
+                print(f'No contact matches {args.query!r}.')
+                return 1
+            print(f'{args.query}: {phone or name}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,210 @@
 import json
 import os
+import threading
 
 CONTACTS_FILE = os.path.join(os.path.dirname(__file__), 'contacts.json')
+# when this exists it is the contact book (see contact_store.py); contacts.json is then only an export
+CONTACTS_DB = os.path.join(os.path.dirname(__file__), 'contacts.db')
 
-def load_contacts():
-    if not os.path.exists(CONTACTS_FILE):
+
+def normalize_name(name):
+    """Lowercase and collapse whitespace so 'Alice  Smith ' == 'alice smith'."""
+    return ' '.join(str(name).lower().split())
+
+
+def normalize_phone(phone):
+    """Keep only the digits of a phone number (drops '+', spaces, dashes)."""
+    return ''.join(ch for ch in str(phone) if ch.isdigit())
+
+
+def _file_stamp(path):
+    # mtime + size is enough to notice edits without re-reading the file
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_contacts_file(path):
+    if not os.path.exists(path):
         return {}
     try:
-        with open(CONTACTS_FILE, 'r') as f:
-            return json.load(f)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
     except Exception as e:
         print(f"Error loading contacts: {e}")
         return {}
+    # Accept both {"Alice": "1555..."} and [{"name": "Alice", "phone": "1555..."}]
+    if isinstance(data, list):
+        contacts = {}
+        for row in data:
+            if isinstance(row, dict) and row.get('name') and row.get('phone'):
+                contacts.setdefault(str(row['name']), str(row['phone']))
+        return contacts
+    if isinstance(data, dict):
+        return data
+    print(f"Error loading contacts: unexpected JSON type {type(data).__name__}")
+    return {}
+
+
+class ContactIndex:
+    """
+    In-memory view of a contacts file with O(1) lookups by name and phone.
+    Built once per file version; `stamp` is the (mtime, size) it was built from.
+    """
+
+    def __init__(self, contacts, stamp=None):
+        self.contacts = contacts
+        self.stamp = stamp
+        self.by_name = {}
+        self.by_phone = {}
+        for contact_name, phone in contacts.items():
+            # first entry wins on collisions, same as the old linear scan
+            self.by_name.setdefault(normalize_name(contact_name), phone)
+            digits = normalize_phone(phone)
+            if digits:
+                self.by_phone.setdefault(digits, contact_name)
+
+    def phone_for(self, name):
+        return self.by_name.get(normalize_name(name))
+
+    def name_for(self, phone):
+        return self.by_phone.get(normalize_phone(phone))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_stores = {}
+
+
+def _resolve(path):
+    if path:
+        return os.path.abspath(path)
+    return os.path.abspath(CONTACTS_DB if os.path.exists(CONTACTS_DB) else CONTACTS_FILE)
+
+
+def _is_db(path):
+    return path.endswith('.db')
+
+
+def get_store(path=None):
+    """The process-wide contact_store.ContactStore for a `.db` path (default contacts.db)."""
+    path = os.path.abspath(path or CONTACTS_DB)
+    store = _stores.get(path)
+    if store is None:
+        with _indexes_lock:
+            store = _stores.get(path)
+            if store is None:
+                # sqlite3 only loads for setups that have a contacts database
+                from contact_store import ContactStore
+                store = _stores[path] = ContactStore(path)
+    return store
 
-def get_phone_by_name(name):
+
+def get_index(path=None):
+    """
+    Return the process-wide ContactIndex for `path`, rebuilding it only when
+    the file's mtime or size (or a database's change counter) has changed
+    since the last build.
+    """
+    path = _resolve(path)
+    stamp = get_store(path).version if _is_db(path) else _file_stamp(path)
+    index = _indexes.get(path)
+    if index is not None and index.stamp == stamp:
+        return index
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None or index.stamp != stamp:
+            contacts = get_store(path).as_dict() if _is_db(path) else _read_contacts_file(path)
+            index = ContactIndex(contacts, stamp)
+            _indexes[path] = index
+    return index
+
+
+def invalidate_index(path=None):
+    """Drop the cached index so the next lookup re-reads the file."""
+    with _indexes_lock:
+        if path is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(os.path.abspath(path), None)
+
+
+def load_contacts(path=None):
+    """
+    Returns the {name: phone} mapping from contacts.json (or contacts.db).
+    The dict is shared with the cached index, so treat it as read-only.
+    """
+    return get_index(path).contacts
+
+
+def get_phone_by_name(name, path=None):
     """
     Returns the phone number for a given name if it exists in contacts.json.
     Case-insensitive lookup.
     """
-    contacts = load_contacts()
-    # Normalize name for lookup
-    name_lower = name.lower().strip()
-    
-    for contact_name, phone in contacts.items():
-        if contact_name.lower().strip() == name_lower:
-            return phone
-    return None
+    path = _resolve(path)
+    if _is_db(path):
+        # one indexed query; no need to load the whole book
+        return get_store(path).phone_for(name)
+    return get_index(path).phone_for(name)
+
+
+def get_name_by_phone(phone, path=None):
+    """Reverse lookup: contact name for a phone number, ignoring formatting."""
+    path = _resolve(path)
+    if _is_db(path):
+        return get_store(path).name_for(phone)
+    return get_index(path).name_for(phone)
+
+
+def _write_json(contacts, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(contacts, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    invalidate_index(path)
+
+
+def save_contacts(contacts, path=None):
+    """
+    Replace the contact book with the {name: phone} mapping `contacts`.
+    A JSON file is rewritten atomically (temp file + rename), a database in
+    one transaction; readers see either the old or the new book.
+    """
+    path = _resolve(path)
+    if _is_db(path):
+        get_store(path).replace_all(contacts)
+    else:
+        _write_json(dict(contacts), path)
+
+
+def add_contact(name, phone, path=None):
+    """Add or update one contact: a single indexed write for a database, a rewrite for JSON."""
+    path = _resolve(path)
+    if _is_db(path):
+        return get_store(path).upsert(name, phone)
+    contacts = dict(_read_contacts_file(path))
+    norm = normalize_name(name)
+    for existing in [n for n in contacts if normalize_name(n) == norm]:
+        del contacts[existing]
+    contacts[str(name).strip()] = str(phone).strip()
+    _write_json(contacts, path)
+    return True
+
+
+def remove_contact(name, path=None):
+    """Delete one contact; True if it existed."""
+    path = _resolve(path)
+    if _is_db(path):
+        return get_store(path).delete(name)
+    contacts = dict(_read_contacts_file(path))
+    norm = normalize_name(name)
+    doomed = [n for n in contacts if normalize_name(n) == norm]
+    if not doomed:
+        return False
+    for existing in doomed:
+        del contacts[existing]
+    _write_json(contacts, path)
+    return True
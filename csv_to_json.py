@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Convert a contact list (CSV, JSONL or JSON) into a clean JSON/JSONL/CSV file.
+
+    python csv_to_json.py --input contacts.csv --output contacts.json --key name --value phone --country-code 44
+
+Rows are streamed from the input in chunks (`--chunk-size`) and written as
+they come; a .json input is parsed one array item / object member at a
+time, so it never has to fit in memory either. Each row's phone column is normalized to international digits
+(phone_numbers.py). Rows with an invalid number are dropped, and so are
+repeats of a number already written. `--rejects` lists the dropped rows with
+the reason. Duplicates are found with a set of numbers by default; `--dedup
+bloom` uses a fixed-size Bloom filter for lists too large for that, at the
+cost of dropping about `--error-rate` of the unique numbers as false
+duplicates.
+
+The output format follows the --output extension:
+  - .json  an array of rows, or with --key an object keyed by that column
+           (`--key name --value phone` writes the {name: phone} file
+           contacts_manager.py indexes; later rows with a key already
+           written are dropped and counted as duplicate keys)
+  - .jsonl one row per line, the format --recipients campaigns stream
+  - .csv   the input columns, numbers normalized
+The file is written next to the output and moved into place at the end, so
+an interrupted import never leaves half a contacts file behind.
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+
+import phone_numbers
+from recipients import iter_recipients
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class BloomFilter:
+    """
+    Fixed-size set of phone numbers with false positives: about
+    `error_rate` of the numbers never added still test as present.
+    """
+
+    def __init__(self, capacity, error_rate=1e-4):
+        capacity = max(1, int(capacity))
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, number):
+        # numbers fit in 50 bits; two multiplicative hashes, combined (Kirsch-Mitzenmacher)
+        h1 = (number * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = ((number * 0xC2B2AE3D27D4EB4F) >> 17 | 1) & 0xFFFFFFFFFFFFFFFF
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, number):
+        """Add int `number`; True when it was (probably) there already."""
+        bits = self.bits
+        present = True
+        for pos in self._positions(number):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        return present
+
+    def __contains__(self, number):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(number))
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class SeenNumbers:
+    """Exact set of numbers written so far; ints take about half the memory of the digit strings."""
+
+    def __init__(self):
+        self._seen = set()
+
+    def add(self, number):
+        seen = self._seen
+        if number in seen:
+            return True
+        seen.add(number)
+        return False
+
+    def __contains__(self, number):
+        return number in self._seen
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self._seen) + 32 * len(self._seen)
+
+
+def make_seen(dedup, capacity=None, error_rate=1e-4):
+    """The duplicate tracker for --dedup: 'set', 'bloom' or 'none' (None)."""
+    if dedup == 'bloom':
+        return BloomFilter(capacity or 10_000_000, error_rate)
+    if dedup == 'set':
+        return SeenNumbers()
+    return None
+
+
+def iter_json_members(f, read_size=1 << 16):
+    """
+    Yield (None, item) for each item of the top-level JSON array in `f`, or
+    (key, value) for each member of a top-level object, reading `read_size`
+    characters at a time instead of loading the whole document.
+    """
+    decode = json.JSONDecoder().raw_decode
+    skip = json.decoder.WHITESPACE.match
+    buf, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(read_size)
+        if not data:
+            eof = True
+            return False
+        buf, pos = buf[pos:] + data, 0
+        return True
+
+    def peek():
+        nonlocal pos
+        while True:
+            pos = skip(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                raise ValueError('unexpected end of JSON input')
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                obj, end = decode(buf, pos)
+            except json.JSONDecodeError:
+                # most likely cut off by the read boundary; a real error re-raises at EOF
+                if eof or not fill():
+                    raise
+                continue
+            # a value is only complete once a delimiter follows it: "2" may be the start of "2.5e3"
+            if not eof and (end == len(buf) or buf[end] not in ' \t\r\n,]}:') and fill():
+                continue
+            pos = end
+            return obj
+
+    opening = peek()
+    if opening not in '[{':
+        raise ValueError(f"expected a JSON array or object in {getattr(f, 'name', 'the input')}")
+    closing = ']' if opening == '[' else '}'
+    pos += 1
+    if peek() == closing:
+        return
+    while True:
+        if opening == '{':
+            key = value()
+            if not isinstance(key, str) or peek() != ':':
+                raise ValueError(f'expected ":" after JSON key {key!r}')
+            pos += 1
+            yield key, value()
+        else:
+            yield None, value()
+        sep = peek()
+        pos += 1
+        if sep == closing:
+            return
+        if sep != ',':
+            raise ValueError(f'expected "," or "{closing}" in JSON input, got {sep!r}')
+
+
+def iter_rows(path):
+    """Yield (line_no, row) from a .csv/.jsonl file or a .json array/{name: phone} object, all streamed."""
+    if os.path.splitext(path)[1].lower() != '.json':
+        yield from iter_recipients(path)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for i, (key, item) in enumerate(iter_json_members(f), 1):
+            if key is not None:
+                # contacts.json layout: {"Alice": "1555..."}
+                yield i, {'name': key, 'phone': '' if item is None else str(item)}
+            elif isinstance(item, dict):
+                yield i, {str(k): '' if v is None else str(v) for k, v in item.items()}
+            else:
+                yield i, {'_error': 'row is not a JSON object'}
+
+
+def iter_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def clean_chunk(chunk, stats, phone_field='phone', default_cc=None, seen=None, rejects=None):
+    """
+    Normalize and de-duplicate one chunk of (line_no, row); returns the rows
+    to keep. Dropped rows are counted in `stats` and written to `rejects`.
+    """
+    keep = []
+    normalize = phone_numbers.normalize
+    for line_no, row in chunk:
+        reason = row.get('_error')
+        if reason is None and phone_field:
+            raw = row.get(phone_field)
+            if not raw:
+                reason = f'no {phone_field}'
+            else:
+                try:
+                    number = normalize(raw, default_cc)
+                except phone_numbers.PhoneError as e:
+                    reason = str(e)
+                else:
+                    if seen is not None and seen.add(int(number)):
+                        stats['duplicates'] += 1
+                        if rejects:
+                            rejects.write(json.dumps({'line': line_no, phone_field: raw, 'error': 'duplicate'},
+                                                     ensure_ascii=False) + '\n')
+                        continue
+                    row[phone_field] = number
+        if reason is not None:
+            stats['invalid'] += 1
+            if rejects:
+                rejects.write(json.dumps({'line': line_no, phone_field: row.get(phone_field), 'error': reason},
+                                         ensure_ascii=False) + '\n')
+            continue
+        keep.append(row)
+    stats['rows'] += len(chunk)
+    stats['written'] += len(keep)
+    return keep
+
+
+class JsonWriter:
+    """
+    Streams rows into a JSON array, or an object keyed by `key` (first row
+    per key wins; the others are counted in `duplicate_keys`).
+    """
+
+    def __init__(self, f, key=None, value=None):
+        self.f = f
+        self.key = key
+        self.value = value
+        self.duplicate_keys = 0
+        self._keys = set() if key else None
+        self._first = True
+        f.write('{' if key else '[')
+
+    def write_rows(self, rows):
+        dumps = json.dumps
+        parts = []
+        for row in rows:
+            item = row.get(self.value, '') if self.value else row
+            if self.key:
+                key = row.get(self.key, '')
+                if key in self._keys:
+                    self.duplicate_keys += 1
+                    continue
+                self._keys.add(key)
+                parts.append(f'{dumps(key, ensure_ascii=False)}: {dumps(item, ensure_ascii=False)}')
+            else:
+                parts.append(dumps(item, ensure_ascii=False))
+        if parts:
+            self.f.write(('\n' if self._first else ',\n') + ',\n'.join(parts))
+            self._first = False
+
+    def close(self):
+        self.f.write('\n}\n' if self.key else '\n]\n')
+
+
+class JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write_rows(self, rows):
+        dumps = json.dumps
+        self.f.write(''.join(dumps(row, ensure_ascii=False) + '\n' for row in rows))
+
+    def close(self):
+        pass
+
+
+class CsvWriter:
+    """Columns are taken from the first row; later rows' extra columns are dropped."""
+
+    def __init__(self, f):
+        self.f = f
+        self._writer = None
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self.f, fieldnames=list(rows[0]), extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+def open_writer(f, path, key=None, value=None):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.jsonl':
+        return JsonlWriter(f)
+    if ext == '.csv':
+        return CsvWriter(f)
+    return JsonWriter(f, key=key, value=value)
+
+
+def convert(input_path, output_path, key=None, value=None, phone_field='phone', default_cc=None,
+            dedup='set', capacity=None, error_rate=1e-4, rejects_path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream `input_path` into `output_path` (see the module docstring); returns the stats dict."""
+    stats = {'rows': 0, 'written': 0, 'invalid': 0, 'duplicates': 0, 'duplicate_keys': 0}
+    seen = make_seen(dedup if phone_field else 'none', capacity, error_rate)
+    tmp = output_path + '.tmp'
+    rejects = open(rejects_path, 'w', encoding='utf-8') if rejects_path else None
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            writer = open_writer(f, output_path, key=key, value=value)
+            for chunk in iter_chunks(iter_rows(input_path), chunk_size):
+                writer.write_rows(clean_chunk(chunk, stats, phone_field, default_cc, seen, rejects))
+            writer.close()
+        # clean_chunk counted these as written; --key kept only the first row per key
+        stats['duplicate_keys'] = getattr(writer, 'duplicate_keys', 0)
+        stats['written'] -= stats['duplicate_keys']
+        os.replace(tmp, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    finally:
+        if rejects:
+            rejects.close()
+    if seen is not None:
+        stats['dedup_bytes'] = seen.nbytes
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert and clean a contact list: CSV/JSONL/JSON in, JSON/JSONL/CSV out.')
+    parser.add_argument('--input', required=True, help='Source file (.csv, .jsonl, or .json array / {name: phone} object)')
+    parser.add_argument('--output', required=True, help='Destination (.json, .jsonl or .csv)')
+    parser.add_argument('--key', help='JSON output: object keyed by this column instead of an array')
+    parser.add_argument('--value', help='With --key: store only this column as the value (e.g. --key name --value phone)')
+    parser.add_argument('--phone-column', default='phone', help='Column holding the phone number; "" converts without checking numbers')
+    phone_numbers.add_arguments(parser)
+    parser.add_argument('--dedup', choices=['set', 'bloom', 'none'], default='set', help='How repeated numbers are found (bloom: fixed memory, rare false duplicates)')
+    parser.add_argument('--expected-rows', type=int, default=10_000_000, help='With --dedup bloom: filter capacity')
+    parser.add_argument('--error-rate', type=float, default=1e-4, help='With --dedup bloom: share of unique numbers wrongly dropped at capacity')
+    parser.add_argument('--rejects', help='JSONL file listing dropped rows and why')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows read and written per batch')
+    args = parser.parse_args()
+    if args.value and not args.key:
+        print('--value needs --key.')
+        return 1
+
+    start = time.perf_counter()
+    try:
+        stats = convert(args.input, args.output, key=args.key, value=args.value, phone_field=args.phone_column,
+                        default_cc=args.country_code, dedup=args.dedup, capacity=args.expected_rows,
+                        error_rate=args.error_rate, rejects_path=args.rejects, chunk_size=args.chunk_size)
+    except (OSError, ValueError) as e:
+        print('Conversion failed:', e)
+        return 1
+    elapsed = time.perf_counter() - start
+    dropped_keys = f", {stats['duplicate_keys']} dropped as repeated --key {args.key}" if stats['duplicate_keys'] else ''
+    print(f"{stats['rows']} rows: {stats['written']} written to {args.output}, {stats['invalid']} invalid, "
+          f"{stats['duplicates']} duplicates{dropped_keys} "
+          f"({stats['rows'] / elapsed * 60 if elapsed else 0:,.0f} rows/min)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
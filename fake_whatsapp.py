@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for WhatsApp Web, for offline benchmarks.
+
+It only mimics the bits the senders touch: a QR login gate, the chat list /
+search box, the contenteditable composer, the send button, the attach menu
+with its file inputs and caption preview, and outgoing message bubbles with
+their pending -> sent -> delivered (-> read) tick icons, mirrored on the
+chat's row in the chat list. Numbers listed in `invalidNumbers` get the
+"Phone number shared via url is invalid." dialog instead of a chat.
+
+    python fake_whatsapp.py --port 8765        # serve it on loopback
+    install_route(context)                     # or route web.whatsapp.com to it in Playwright
+    install_route(context, server_url='http://127.0.0.1:8765')   # ...through the loopback server
+
+Behaviour is tuned with make_html(**config) (see DEFAULT_CONFIG): artificial
+delays for login, chat open and ticks, plus flakiness - a share of searches
+that find nothing and of messages that never leave the clock icon.
+"""
+import argparse
+import functools
+import json
+import struct
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WHATSAPP_ORIGIN = 'https://web.whatsapp.com'
+AVATAR_ORIGIN = 'https://pps.whatsapp.net'
+
+FAKE_HTML = r"""<!doctype html>
+<html><head><meta charset="utf-8"><title>WhatsApp</title>
+<style>#main{display:none}#main.open{display:block}.message-out{margin:2px}
+#landing{display:none}.locked #landing{display:block}.locked #side,.locked #main.open{display:none}
+#preview{display:none}#preview.open{display:block}</style>
+</head><body class="locked">
+<div id="landing"><canvas aria-label="Scan me!" role="img" width="64" height="64"></canvas></div>
+<div id="side">
+  <div aria-label="Chat list">
+    <div contenteditable="true" role="textbox" data-tab="3" title="Search input textbox"></div>
+    <div id="chats"></div>
+  </div>
+</div>
+<div id="main">
+  <header><span id="chat-title"></span></header>
+  <div id="messages" role="application"></div>
+  <footer>
+    <button title="Attach"><span data-icon="plus"></span></button>
+    <div id="attach-menu"></div>
+    <div contenteditable="true" role="textbox" data-tab="10" title="Type a message"></div>
+    <button aria-label="Send"><span data-icon="send"></span></button>
+  </footer>
+</div>
+<!-- attachment preview: an overlay outside #main, so it never matches the composer selectors -->
+<div id="preview"><span id="preview-name"></span>
+  <div contenteditable="true" role="textbox" aria-label="Add a caption"></div>
+</div>
+<div id="invalid-popup" role="dialog" data-animate-modal-popup="true" style="display:none">
+  Phone number shared via url is invalid.<button>OK</button>
+</div>
+<script>
+(function () {
+  const cfg = Object.assign({sentDelay: 50, deliveredDelay: 200, openDelay: 0, loginDelay: 0,
+                             failRate: 0, openFailRate: 0, avatars: 0, bootDelay: 0,
+                             uploadMsPerMB: 0, readDelay: 0, invalidNumbers: []}, window.FAKE_WA || {});
+  const main = document.getElementById('main');
+  const search = document.querySelector('[data-tab="3"]');
+  const composer = document.querySelector('[data-tab="10"]');
+  const messages = document.getElementById('messages');
+  const preview = document.getElementById('preview');
+  const caption = document.querySelector('[aria-label="Add a caption"]');
+  let pending = null;  // the file picked in the attach menu, waiting in the preview
+  let currentTitle = '';
+  const rows = {};    // chat title -> its chat list row
+  const latest = {};  // chat title -> its newest bubble, whose tick the row shows
+  const afterLogin = [];
+  const invalid = new Set(cfg.invalidNumbers.map(String));
+  const popup = document.getElementById('invalid-popup');
+
+  function unlock() {
+    document.body.classList.remove('locked');
+    // chat list rows with profile pictures, like the real app's sidebar
+    const chats = document.getElementById('chats');
+    for (let i = 0; i < cfg.avatars; i++) {
+      const img = document.createElement('img');
+      img.src = 'https://pps.whatsapp.net/v/avatar' + i + '.bmp';
+      img.width = 49;
+      img.height = 49;
+      chats.appendChild(img);
+    }
+    afterLogin.splice(0).forEach((fn) => fn());
+  }
+
+  function later(ms, fn) {
+    if (ms > 0) setTimeout(fn, ms); else fn();
+  }
+
+  function openChat(title, draft) {
+    later(cfg.openDelay, () => {
+      document.getElementById('chat-title').textContent = title;
+      currentTitle = title;
+      messages.innerHTML = '';
+      main.classList.add('open');
+      composer.textContent = draft || '';
+    });
+  }
+
+  function send() {
+    const text = composer.innerText.replace(/\n$/, '');
+    if (!text.trim()) return;
+    addBubble(text, 0);
+    composer.textContent = '';
+  }
+
+  function chatRow(chat) {
+    let row = rows[chat];
+    if (!row) {
+      row = document.createElement('div');
+      row.setAttribute('role', 'listitem');
+      const name = document.createElement('span');
+      name.setAttribute('title', chat);
+      name.textContent = chat;
+      const icon = document.createElement('span');
+      icon.setAttribute('data-icon', 'status-time');
+      row.append(name, icon);
+      rows[chat] = row;
+    }
+    // the chat with the newest message moves to the top, like the real list
+    document.getElementById('chats').prepend(row);
+    return row;
+  }
+
+  function addBubble(text, uploadMs) {
+    const bubble = document.createElement('div');
+    bubble.className = 'message-out';
+    const body = document.createElement('span');
+    body.textContent = text;
+    const tick = document.createElement('span');
+    bubble.append(body, tick);
+    messages.appendChild(bubble);
+    const chat = currentTitle;
+    const rowIcon = chatRow(chat).lastChild;
+    latest[chat] = bubble;
+    const setTick = (icon, label) => {
+      tick.setAttribute('data-icon', 'msg-' + icon);
+      tick.setAttribute('aria-label', ' ' + label + ' ');
+      if (latest[chat] === bubble) {
+        rowIcon.setAttribute('data-icon', 'status-' + icon);
+        rowIcon.setAttribute('aria-label', ' ' + label + ' ');
+      }
+    };
+    setTick('time', 'Pending');
+    // flaky network: this one never gets past the clock icon
+    if (Math.random() < cfg.failRate) return;
+    // pending clock (for attachments, until the upload is done) -> single tick (sent) -> double tick (delivered)
+    // -> double tick labelled Read
+    setTimeout(() => setTick('check', 'Sent'), uploadMs + cfg.sentDelay);
+    setTimeout(() => setTick('dblcheck', 'Delivered'), uploadMs + cfg.deliveredDelay);
+    if (cfg.readDelay > 0) setTimeout(() => setTick('dblcheck', 'Read'), uploadMs + cfg.readDelay);
+  }
+
+  function openAttachMenu() {
+    const menu = document.getElementById('attach-menu');
+    if (menu.childElementCount) return;
+    // like the real menu: one input for any document, one for photos and videos
+    for (const accept of ['*', 'image/*,video/mp4,video/3gpp,video/quicktime']) {
+      const input = document.createElement('input');
+      input.type = 'file';
+      input.accept = accept;
+      input.style.display = 'none';
+      input.addEventListener('change', () => {
+        pending = input.files[0] || null;
+        input.value = '';
+        if (!pending) return;
+        document.getElementById('preview-name').textContent = pending.name;
+        caption.textContent = '';
+        preview.classList.add('open');
+        caption.focus();
+      });
+      menu.appendChild(input);
+    }
+  }
+
+  function closePreview() {
+    preview.classList.remove('open');
+    pending = null;
+  }
+
+  function sendAttachment() {
+    const text = caption.innerText.replace(/\n$/, '');
+    addBubble(pending.name + (text.trim() ? ' ' + text : ''), cfg.uploadMsPerMB * pending.size / 1048576);
+    closePreview();
+  }
+
+  search.addEventListener('keydown', (e) => {
+    if (e.key !== 'Enter') return;
+    e.preventDefault();
+    const query = search.innerText.trim();
+    search.textContent = '';
+    // flaky search: no result, the sender has to fall back to a full page load.
+    // Numbers without an account never have a chat to find.
+    if (!invalid.has(query) && Math.random() >= cfg.openFailRate) openChat(query);
+  });
+  composer.addEventListener('keydown', (e) => {
+    if (e.key === 'Enter' && !e.shiftKey) { e.preventDefault(); send(); }
+  });
+  composer.addEventListener('paste', (e) => {
+    e.preventDefault();
+    document.execCommand('insertText', false, e.clipboardData.getData('text/plain'));
+  });
+  document.querySelector('button[aria-label="Send"]').addEventListener('click', send);
+  document.querySelector('button[title="Attach"]').addEventListener('click', openAttachMenu);
+  const closePopup = () => { popup.style.display = 'none'; };
+  popup.querySelector('button').addEventListener('click', closePopup);
+  document.addEventListener('keydown', (e) => { if (e.key === 'Escape') closePopup(); });
+  caption.addEventListener('keydown', (e) => {
+    if (e.key === 'Escape') { e.preventDefault(); closePreview(); }
+    if (e.key === 'Enter' && !e.shiftKey && pending) { e.preventDefault(); sendAttachment(); }
+  });
+  caption.addEventListener('paste', (e) => {
+    e.preventDefault();
+    document.execCommand('insertText', false, e.clipboardData.getData('text/plain'));
+  });
+
+  const params = new URLSearchParams(location.search);
+  if (location.pathname.startsWith('/send') && params.get('phone')) {
+    const phone = params.get('phone');
+    afterLogin.push(() => invalid.has(phone)
+      ? later(cfg.openDelay, () => { popup.style.display = 'block'; })
+      : openChat(phone, params.get('text')));
+  }
+  // every load boots for bootDelay; the first load in a profile also waits loginDelay ("scanning")
+  if (!cfg.loginDelay || localStorage.getItem('last-wid-md')) {
+    later(cfg.bootDelay, unlock);
+  } else {
+    setTimeout(() => { localStorage.setItem('last-wid-md', '"fake@c.us"'); unlock(); },
+               cfg.bootDelay + cfg.loginDelay);
+  }
+})();
+</script>
+</body></html>
+"""
+
+
+# page defaults; every key can be overridden through make_html()
+DEFAULT_CONFIG = {
+    'sentDelay': 50,        # ms from Enter to the single tick
+    'deliveredDelay': 200,  # ms from Enter to the double tick
+    'openDelay': 0,         # ms from search / page load to the chat being open
+    'loginDelay': 0,        # ms the QR gate takes on a profile's first load (0: already logged in)
+    'failRate': 0.0,        # share of messages stuck on the clock icon
+    'openFailRate': 0.0,    # share of in-app searches that find nothing
+    'avatars': 0,           # chat list rows, each loading a profile picture from AVATAR_ORIGIN
+    'bootDelay': 0,         # ms every page load takes before the app is usable
+    'uploadMsPerMB': 0,     # extra ms an attachment stays on the clock icon per MB uploaded
+    'readDelay': 0,         # ms from Enter to the read receipt (0: never read)
+    'invalidNumbers': [],   # numbers without WhatsApp: send?phone= shows the invalid-number dialog
+}
+
+
+def make_html(**config):
+    """FAKE_HTML with `config` (see DEFAULT_CONFIG) baked in as window.FAKE_WA."""
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f'unknown fake WhatsApp settings: {sorted(unknown)}')
+    script = f'<script>window.FAKE_WA = {json.dumps(dict(DEFAULT_CONFIG, **config))};</script>'
+    return FAKE_HTML.replace('</head>', script + '</head>', 1)
+
+
+def _path(url):
+    return url[len(WHATSAPP_ORIGIN):] or '/'
+
+
+@functools.lru_cache(maxsize=4)
+def avatar_image(size=192):
+    """A real (uncompressed, so deliberately heavy) 24-bit BMP standing in for a profile picture."""
+    row = b''.join(bytes((x * 7 % 256, x * 3 % 256, 160)) for x in range(size))
+    pixels = row * size
+    header = struct.pack('<2sIHHI', b'BM', 54 + len(pixels), 0, 0, 54)
+    info = struct.pack('<IiiHHIIiiII', 40, size, size, 1, 24, 0, len(pixels), 2835, 2835, 0, 0)
+    return header + info + pixels
+
+
+def install_route(context, html=FAKE_HTML, server_url=None):
+    """
+    Answer every web.whatsapp.com request in a Playwright context with the fake
+    page: inline, or fetched from the loopback server at `server_url`.
+    """
+    def handle(route):
+        if server_url:
+            route.fulfill(response=route.fetch(url=server_url + _path(route.request.url)))
+        else:
+            route.fulfill(status=200, content_type='text/html; charset=utf-8', body=html)
+    context.route(WHATSAPP_ORIGIN + '/**', handle)
+    context.route(AVATAR_ORIGIN + '/**', lambda route: route.fulfill(status=200, content_type='image/bmp',
+                                                                     body=avatar_image()))
+
+
+async def install_route_async(context, html=FAKE_HTML, server_url=None):
+    async def handle(route):
+        if server_url:
+            await route.fulfill(response=await route.fetch(url=server_url + _path(route.request.url)))
+        else:
+            await route.fulfill(status=200, content_type='text/html; charset=utf-8', body=html)
+
+    async def avatar(route):
+        await route.fulfill(status=200, content_type='image/bmp', body=avatar_image())
+    await context.route(WHATSAPP_ORIGIN + '/**', handle)
+    await context.route(AVATAR_ORIGIN + '/**', avatar)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    html = FAKE_HTML
+
+    def do_GET(self):
+        self.server.hits += 1
+        body = self.html.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(port=0, html=FAKE_HTML):
+    """Loopback HTTP server for the fake page; port 0 picks a free port."""
+    handler = type('FakeHandler', (_Handler,), {'html': html})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.hits = 0  # page loads served, i.e. full navigations
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local fake WhatsApp Web page.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--login-delay', type=int, default=0, help='ms the QR gate takes on first load')
+    parser.add_argument('--open-delay', type=int, default=0, help='ms before a chat opens')
+    parser.add_argument('--sent-delay', type=int, default=50, help='ms until the single tick')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of messages that never tick')
+    args = parser.parse_args()
+    server = make_server(args.port, make_html(loginDelay=args.login_delay, openDelay=args.open_delay,
+                                              sentDelay=args.sent_delay, failRate=args.fail_rate))
+    print(f'Fake WhatsApp Web on http://127.0.0.1:{server.server_address[1]}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Negative cache of phone numbers that are not on WhatsApp.
+
+When `send?phone=` points at a number without an account, WhatsApp Web shows
+an "invalid phone number" dialog instead of a chat. The senders race that
+dialog against the composer, so a dead number fails in milliseconds. The
+number is then recorded here, and later sends skip it before any navigation
+until its entry is older than the TTL (people do join WhatsApp eventually).
+
+    cache = InvalidNumberCache().attach(profile_dir)
+    cache.get('15551234567')       # -> None, or the reason it was recorded
+    cache.add('15551234567')
+    cache.save()
+
+Entries are kept in `<profile-dir>/invalid_numbers.json` (or --invalid-cache,
+which lets several profiles share one list) as {digits: [first_seen,
+last_seen, reason]}.
+"""
+import json
+import os
+import threading
+import time
+
+CACHE_FILENAME = 'invalid_numbers.json'
+DEFAULT_TTL_DAYS = 30.0
+NOT_ON_WHATSAPP = 'not on WhatsApp'
+
+
+def _digits(phone):
+    return ''.join(ch for ch in str(phone) if ch.isdigit())
+
+
+class InvalidNumberCache:
+    """Thread-safe; in memory until attach() gives it a file. ttl=0 records numbers but never skips them."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL_DAYS * 86400):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}  # digits -> [first_seen, last_seen, reason]
+        self.stats = {'skipped': 0, 'added': 0, 'expired': 0}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._discarded = set()
+
+    def attach(self, profile_dir=None, path=None, ttl=None):
+        """Load (and later save) `path`, or invalid_numbers.json in `profile_dir`."""
+        self.path = path or os.path.join(profile_dir, CACHE_FILENAME)
+        if ttl is not None:
+            self.ttl = ttl
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with self._lock:
+                self.entries.update({str(k): list(v) for k, v in data.items()})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f'Warning: ignoring unreadable invalid-number cache {self.path}: {e}')
+        return self
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        try:
+            # another process sharing the file may have added numbers since we loaded it
+            with open(self.path, 'r', encoding='utf-8') as f:
+                theirs = json.load(f)
+        except Exception:
+            theirs = {}
+        with self._lock:
+            for key, entry in theirs.items():
+                if key not in self.entries and key not in self._discarded:
+                    self.entries[key] = list(entry)
+            now = time.time()
+            # expired entries are dropped on the way out so the file doesn't only ever grow
+            keep = self.ttl * 2 if self.ttl > 0 else DEFAULT_TTL_DAYS * 86400
+            data = {k: v for k, v in self.entries.items() if now - v[1] < keep}
+            self._dirty = False
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f'Warning: could not save invalid-number cache: {e}')
+
+    def get(self, phone):
+        """Why `phone` is known to be undeliverable, or None (unknown, expired, or skipping disabled)."""
+        if self.ttl <= 0 or not self.entries:
+            return None
+        with self._lock:
+            entry = self.entries.get(_digits(phone))
+            if entry is None:
+                return None
+            if time.time() - entry[1] >= self.ttl:
+                self.stats['expired'] += 1
+                return None
+            self.stats['skipped'] += 1
+            return entry[2]
+
+    def add(self, phone, reason=NOT_ON_WHATSAPP):
+        key, now = _digits(phone), int(time.time())
+        with self._lock:
+            entry = self.entries.get(key)
+            self.entries[key] = [entry[0] if entry else now, now, reason]
+            self._discarded.discard(key)
+            self.stats['added'] += 1
+            self._dirty = True
+
+    def discard(self, phone):
+        """Forget `phone` (a send to it just worked)."""
+        if not self.entries:
+            return
+        with self._lock:
+            if self.entries.pop(_digits(phone), None) is not None:
+                self._discarded.add(_digits(phone))
+                self._dirty = True
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def add_arguments(parser):
+    parser.add_argument('--invalid-cache', metavar='PATH',
+                        help=f'Numbers found not to be on WhatsApp (default: <profile-dir>/{CACHE_FILENAME})')
+    parser.add_argument('--invalid-ttl', type=float, default=DEFAULT_TTL_DAYS, metavar='DAYS',
+                        help=f'Skip numbers recorded as not on WhatsApp within this many days (0: always try; default {DEFAULT_TTL_DAYS:g})')
+
+
+def attach_from_args(cache, args):
+    """Point `cache` at --invalid-cache (or the profile dir) with --invalid-ttl."""
+    return cache.attach(args.profile_dir, path=getattr(args, 'invalid_cache', None),
+                        ttl=getattr(args, 'invalid_ttl', DEFAULT_TTL_DAYS) * 86400)
+
+
+def cli_flags(args):
+    """The flags above, for forwarding to a send_whatsapp.py subprocess."""
+    flags = []
+    if getattr(args, 'invalid_cache', None):
+        flags += ['--invalid-cache', args.invalid_cache]
+    if getattr(args, 'invalid_ttl', DEFAULT_TTL_DAYS) != DEFAULT_TTL_DAYS:
+        flags += ['--invalid-ttl', str(args.invalid_ttl)]
+    return flags
@@ -0,0 +1,127 @@
+"""
+Attachments for the web senders.
+
+A broadcast usually sends the same PDF or voice note to every recipient, so
+files are read, hashed and preprocessed once per run and then handed to
+Playwright's set_input_files as in-memory buffers:
+
+    cache = MediaCache()
+    payload = cache.get('brochure.pdf')          # read + sha256 once
+    page.set_input_files('input[type=file]', files=[payload.as_file()])
+
+Entries are keyed by (path, size, mtime), then by content hash, so a file
+that is renamed or copied is still only processed once. Voice notes
+(`kind='voice'`) are converted to Ogg/Opus with ffmpeg when it is installed
+and the file is not Opus already. Otherwise the file is sent as it is.
+"""
+import os
+import threading
+
+KINDS = ('auto', 'document', 'media', 'voice')
+VOICE_MIME = 'audio/ogg; codecs=opus'
+
+
+class MediaPayload:
+    """One preprocessed attachment; `kind` is document, media (photo/video) or voice."""
+
+    __slots__ = ('digest', 'name', 'mime', 'buffer', 'kind')
+
+    def __init__(self, digest, name, mime, buffer, kind):
+        self.digest = digest
+        self.name = name
+        self.mime = mime
+        self.buffer = buffer
+        self.kind = kind
+
+    def as_file(self):
+        """The FilePayload dict Playwright's set_input_files takes."""
+        return {'name': self.name, 'mimeType': self.mime, 'buffer': self.buffer}
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __repr__(self):
+        return f'MediaPayload({self.name!r}, {self.kind}, {len(self.buffer)} bytes, {self.digest[:12]})'
+
+
+def guess_kind(mime):
+    if mime.startswith(('image/', 'video/')):
+        return 'media'
+    return 'document'
+
+
+def _is_opus(data):
+    # an Ogg stream whose first page carries the OpusHead header
+    return data[:4] == b'OggS' and b'OpusHead' in data[:64]
+
+
+def guess_mime(name):
+    import mimetypes
+
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def to_voice_note(data, name):
+    """(bytes, name, mime) as Ogg/Opus; unchanged when already Opus or when ffmpeg isn't available."""
+    import shutil
+    import subprocess
+
+    base = os.path.splitext(name)[0]
+    if _is_opus(data):
+        return data, base + '.ogg', VOICE_MIME
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        print(f'Warning: ffmpeg not found; sending {name} as a plain audio file.')
+        return data, name, guess_mime(name)
+    proc = subprocess.run([ffmpeg, '-loglevel', 'error', '-i', 'pipe:0', '-vn', '-c:a', 'libopus', '-b:a', '32k',
+                           '-f', 'ogg', 'pipe:1'], input=data, capture_output=True)
+    if proc.returncode or not proc.stdout:
+        print(f"Warning: could not convert {name} to a voice note: {proc.stderr.decode(errors='replace').strip()}")
+        return data, name, guess_mime(name)
+    return proc.stdout, base + '.ogg', VOICE_MIME
+
+
+class MediaCache:
+    """Per-run attachment cache; safe to share between threads."""
+
+    def __init__(self):
+        self._by_stat = {}    # (abspath, size, mtime_ns) -> digest
+        self._by_digest = {}  # (digest, kind) -> MediaPayload
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'loads': 0, 'bytes_read': 0}
+
+    def get(self, path, kind='auto'):
+        """The MediaPayload for `path`; reads and preprocesses the file only the first time."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stat_key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._by_stat.get(stat_key)
+            payload = self._by_digest.get((digest, kind)) if digest else None
+            if payload is not None:
+                self.stats['hits'] += 1
+                return payload
+        with open(path, 'rb') as f:
+            data = f.read()
+        # imported here: every sender start imports this module, and most runs attach nothing
+        import hashlib
+
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self.stats['bytes_read'] += len(data)
+            self._by_stat[stat_key] = digest
+            payload = self._by_digest.get((digest, kind))
+            if payload is not None:
+                # same content under another name or path
+                self.stats['hits'] += 1
+                return payload
+        name = os.path.basename(path)
+        if kind == 'voice':
+            data, name, mime = to_voice_note(data, name)
+        else:
+            mime = guess_mime(name)
+        payload = MediaPayload(digest, name, mime, data, guess_kind(mime) if kind == 'auto' else kind)
+        with self._lock:
+            self.stats['loads'] += 1
+            self._by_digest[(digest, kind)] = payload
+        return payload
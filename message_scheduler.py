@@ -0,0 +1,346 @@
+"""
+Timed and recurring message scheduling for send_whatsapp_auto.py.
+
+Jobs come from a JSONL or CSV file, one per row:
+
+    {"id": "rent-alice", "phone": "15550001111", "message": "Rent is due", "at": "2026-11-01 09:00"}
+    {"id": "standup",    "name": "Team",         "message": "Standup!",    "cron": "0 9 * * 1-5"}
+
+`at` is a one-shot local time (YYYY-MM-DD HH:MM[:SS] or ISO); `cron` is a
+5-field cron expression (minute hour day-of-month month day-of-week, with
+`*`, lists, ranges and `/step`). Due times live in a heap, and the loop
+sleeps until the earliest one instead of polling. Everything already due
+when it wakes is handed to the sender as one batch, so one warm browser
+session sends them back-to-back. A `batch_window` (off by default) also pulls
+in jobs due that many seconds later, which then go out early.
+
+Fire times are recorded in `<jobs file>.state.json`. After downtime the
+catch-up policy decides what happens to occurrences that were missed:
+  skip - drop them, wait for the next occurrence
+  once - send once now (several missed recurrences collapse into one)
+  all  - send every missed occurrence (one-shots: same as once)
+Occurrences older than `max_late` seconds are always dropped.
+"""
+import csv
+import gc
+import heapq
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+_FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 6))
+_NAMES = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9,
+          'oct': 10, 'nov': 11, 'dec': 12, 'sun': 0, 'mon': 1, 'tue': 2, 'wed': 3, 'thu': 4, 'fri': 5, 'sat': 6}
+
+
+def _parse_field(text, lo, hi):
+    values = set()
+    for part in text.lower().split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+        if part in ('*', ''):
+            start, end = lo, hi
+        elif '-' in part:
+            a, b = part.split('-', 1)
+            start, end = int(_NAMES.get(a, a)), int(_NAMES.get(b, b))
+        else:
+            start = int(_NAMES.get(part, part))
+            end = hi if step > 1 else start
+        if start < lo or end > hi + (1 if hi == 6 else 0) or start > end or step < 1:
+            raise ValueError(f'cron field {text!r} out of range {lo}-{hi}')
+        values.update(v % 7 if hi == 6 else v for v in range(start, end + 1, step))
+    return frozenset(values)
+
+
+class Cron:
+    """Compiled 5-field cron expression."""
+
+    def __init__(self, expr):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f'cron needs 5 fields, got {expr!r}')
+        self.expr = expr
+        self.minute, self.hour, self.day, self.month, self.weekday = (
+            _parse_field(p, lo, hi) for p, (_, lo, hi) in zip(parts, _FIELDS))
+        # classic cron: if both day fields are restricted, either may match
+        self._day_any = parts[2] == '*'
+        self._weekday_any = parts[4] == '*'
+
+    def _day_matches(self, dt):
+        dom = dt.day in self.day
+        dow = (dt.isoweekday() % 7) in self.weekday
+        if self._day_any and self._weekday_any:
+            return True
+        if self._day_any:
+            return dow
+        if self._weekday_any:
+            return dom
+        return dom or dow
+
+    def next_after(self, dt):
+        """First matching minute strictly after `dt` (naive local datetime)."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            # skip a whole month / day / hour at a time when that field can't match
+            if dt.month not in self.month:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hour:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minute:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f'cron {self.expr!r} never fires')
+
+
+def parse_at(text):
+    """Local time from 'YYYY-MM-DD HH:MM[:SS]' / ISO 8601 (fromisoformat is C; strptime is ~20x slower)."""
+    return datetime.fromisoformat(text.strip())
+
+
+class ScheduledJob:
+    __slots__ = ('id', 'phone', 'name', 'message', 'at', 'cron')
+
+    def __init__(self, id, phone=None, name=None, message='', at=None, cron=None):
+        self.id = id
+        self.phone = phone
+        self.name = name
+        self.message = message
+        self.at = at
+        self.cron = cron
+
+    def as_send_job(self):
+        return {'id': self.id, 'phone': self.phone, 'name': self.name, 'message': self.message}
+
+
+@contextmanager
+def _gc_paused():
+    """Bulk loads allocate one long-lived object per row; the cyclic GC would rescan them all every few
+    hundred rows for nothing (a third of the load time at 100k jobs)."""
+    if not gc.isenabled():
+        yield
+        return
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def _iter_rows(path):
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            yield from enumerate(csv.DictReader(f), 2)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [(line_no, line) for line_no, line in enumerate(f, 1) if line.strip()]
+    try:
+        # one C-level decode for the whole file instead of a json.loads() call per line
+        rows = json.loads('[' + ','.join(line for _, line in lines) + ']')
+    except ValueError:
+        rows = None
+    if rows is None or len(rows) != len(lines):
+        # a bad line (or one holding two values): decode line by line so the error names it
+        rows = []
+        for line_no, line in lines:
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f'{path}:{line_no}: {e}') from None
+    for (line_no, _), row in zip(lines, rows):
+        yield line_no, row
+
+
+def load_jobs(path):
+    """Parse a schedule file into ScheduledJobs; cron expressions are compiled once and shared."""
+    crons = {}
+    ats = {}  # many jobs share a send minute: parse each distinct `at` once
+    jobs = []
+    append = jobs.append
+    with _gc_paused():
+        for line_no, row in _iter_rows(path):
+            get = row.get
+            message = get('message')
+            phone = get('phone') or None
+            name = get('name') or None
+            if not message or not (phone or name):
+                raise ValueError(f'{path}:{line_no}: needs message and phone or name')
+            expr = get('cron')
+            cron = None
+            at = None
+            if expr and expr.strip():
+                expr = expr.strip()
+                cron = crons.get(expr)
+                if cron is None:
+                    cron = crons[expr] = Cron(expr)
+            else:
+                text = get('at')
+                if not text:
+                    raise ValueError(f'{path}:{line_no}: needs "at" or "cron"')
+                at = ats.get(text)
+                if at is None:
+                    at = ats[text] = parse_at(text)
+            append(ScheduledJob(str(get('id') or f'line{line_no}'), phone, name, message, at, cron))
+    return jobs
+
+
+class Scheduler:
+    """
+    Heap of (due time, seq, job). `run()` sleeps until the earliest due time
+    and calls `sender(batch)` with every job that is due (or due within the
+    opt-in `batch_window`).
+    `sender` returns the ids that were sent (anything else is retried on the
+    next start under the catch-up policy).
+    """
+
+    def __init__(self, jobs, sender, state_path=None, catch_up='once', max_late=3600.0,
+                 batch_window=0.0, now=None):
+        self.sender = sender
+        self.state_path = state_path
+        self.catch_up = catch_up
+        self.max_late = max_late
+        self.batch_window = batch_window
+        self.state = self._load_state()   # id -> last fired time (epoch seconds)
+        self._wake = threading.Event()
+        self._stopped = False
+        self._seq = 0
+        self._heap = []
+        self._cron_next = {}  # (expr, minute) -> next fire, shared by jobs on the same schedule
+        now = now or datetime.now()
+        state = self.state
+        heap = self._heap
+        upcoming = {}  # Cron -> next fire (epoch seconds) for jobs that never fired: once per schedule
+        seq = 0
+        with _gc_paused():
+            for job in jobs:
+                at = job.at
+                if job.id in state or (at is not None and at < now):
+                    due = self._first_due(job, now)
+                    if due is None:
+                        continue
+                    ts = due.timestamp()
+                elif at is not None:
+                    ts = at.timestamp()  # the common case: a one-shot still ahead of us
+                else:
+                    ts = upcoming.get(job.cron)
+                    if ts is None:
+                        ts = upcoming[job.cron] = self._cron_after(job.cron, now).timestamp()
+                seq += 1
+                heap.append((ts, seq, job))
+        self._seq = seq
+        heapq.heapify(heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _next_seq(self):
+        self._seq += 1
+        return self._seq
+
+    def _load_state(self):
+        if not self.state_path:
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def _cron_after(self, cron, dt):
+        key = (cron.expr, dt.replace(second=0, microsecond=0))
+        nxt = self._cron_next.get(key)
+        if nxt is None:
+            nxt = self._cron_next[key] = cron.next_after(dt)
+        return nxt
+
+    def _first_due(self, job, now):
+        last = self.state.get(job.id)
+        if job.at is not None:
+            if last is not None:
+                return None  # one-shot already sent
+            if job.at >= now:
+                return job.at
+            return self._missed(now, job.at)
+        upcoming = self._cron_after(job.cron, now)
+        if last is None:
+            return upcoming  # never fired: nothing was missed
+        missed = self._cron_after(job.cron, datetime.fromtimestamp(last))
+        if missed >= now:
+            return missed
+        if self.catch_up == 'all' and (now - missed).total_seconds() > self.max_late:
+            # replay only the occurrences that are still inside max_late
+            missed = self._cron_after(job.cron, now - timedelta(seconds=self.max_late, minutes=1))
+        return self._missed(now, missed) or upcoming
+
+    def _missed(self, now, due):
+        """When to send an occurrence that should already have fired (None = drop it)."""
+        if self.catch_up == 'skip' or (now - due).total_seconds() > self.max_late:
+            return None
+        # 'once' collapses any number of missed recurrences into one send now; 'all' replays from the oldest
+        return due if self.catch_up == 'all' else now
+
+    def _reschedule(self, job, occurrence):
+        if job.cron is None:
+            return
+        nxt = self._cron_after(job.cron, occurrence)
+        if self.catch_up != 'all':
+            # never queue a backlog of past recurrences
+            nxt = max(nxt, self._cron_after(job.cron, datetime.now()))
+        heapq.heappush(self._heap, (nxt.timestamp(), self._next_seq(), job))
+        self._wake.set()
+
+    def add(self, job, now=None):
+        due = self._first_due(job, now or datetime.now())
+        if due is not None:
+            heapq.heappush(self._heap, (due.timestamp(), self._next_seq(), job))
+            self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def due_batch(self, now_ts):
+        """Pop every job due by `now_ts` (plus, if batch_window is set, the ones due within it)."""
+        batch = []
+        while self._heap and self._heap[0][0] <= now_ts + self.batch_window:
+            due_ts, _, job = heapq.heappop(self._heap)
+            batch.append((due_ts, job))
+        return batch
+
+    def run(self, once=False):
+        """Serve until stop() (or until the heap is empty / one batch ran with once=True)."""
+        while not self._stopped and self._heap:
+            wait = self._heap[0][0] - time.time()
+            if wait > 0:
+                # event-driven sleep: woken early only by add()/stop()
+                self._wake.clear()
+                self._wake.wait(wait)
+                continue
+            batch = self.due_batch(time.time())
+            sent = set(self.sender([job.as_send_job() for _, job in batch]) or ())
+            for due_ts, job in batch:
+                if job.id in sent:
+                    self.state[job.id] = due_ts
+                self._reschedule(job, datetime.fromtimestamp(due_ts))
+            self.save_state()
+            if once:
+                break
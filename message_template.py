@@ -0,0 +1,169 @@
+"""
+Per-recipient message templates for bulk sends.
+
+    tpl = compile_template('Hi {first_name|title?there}, invoice {id} is due {due|date:%d %b}.')
+    tpl.render({'first_name': 'ada', 'id': '42', 'due': '2026-11-01'})
+    # -> 'Hi Ada, invoice 42 is due 01 Nov.'
+
+A placeholder is `{field}`, optionally followed by filters (`|name`, or
+`|name:arg`) and a default (`?text`). The default is used as is when the
+field is missing or empty. A field with no default that is missing or empty
+is an error (`{field?}` makes it optional). `{{` and `}}` are literal braces.
+
+Templates are parsed once into a str.format string plus one getter per
+placeholder (compile_template caches them by text), so rendering a row is a
+single format call. Templates with only plain placeholders skip the
+per-field Python calls altogether.
+"""
+import functools
+import operator
+import re
+from datetime import datetime
+
+_TOKEN = re.compile(r'\{\{|\}\}|\{([^{}]*)\}|[{}]')
+_FIELD = re.compile(r'^\s*([A-Za-z_][\w.\- ]*?)\s*$')
+
+
+class TemplateError(ValueError):
+    """Bad template syntax, or a row that can't fill the template."""
+
+
+@functools.lru_cache(maxsize=1024)  # campaigns tend to repeat the same few dates
+def _date(value, fmt='%Y-%m-%d'):
+    return datetime.fromisoformat(value.strip()).strftime(fmt)
+
+
+def _number(value, spec=',.2f'):
+    return format(float(value.replace(',', '')), spec)
+
+
+def _truncate(value, length='40'):
+    length = int(length)
+    return value if len(value) <= length else value[:max(0, length - 1)].rstrip() + '…'
+
+
+FILTERS = {
+    'upper': str.upper,
+    'lower': str.lower,
+    'title': str.title,
+    'capitalize': str.capitalize,
+    'strip': str.strip,
+    'first': lambda v: v.split()[0] if v.split() else v,   # first word, e.g. first name from a full name
+    'last': lambda v: v.split()[-1] if v.split() else v,
+    'digits': lambda v: ''.join(ch for ch in v if ch.isdigit()),
+    'date': _date,          # ISO date/datetime -> strftime, e.g. {due|date:%d %b %Y}
+    'number': _number,      # format spec, e.g. {amount|number:,.0f}
+    'truncate': _truncate,  # {note|truncate:30}
+}
+
+
+class Template:
+    """One parsed template: `fields` it needs, `optional` ones with defaults, render(row) -> str."""
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = []    # required, in order of first use
+        self.optional = []
+        fmt = []
+        getters = []
+        plain = True
+        pos = 0
+        for m in _TOKEN.finditer(text):
+            fmt.append(text[pos:m.start()])
+            pos = m.end()
+            token = m.group(0)
+            if token in ('{{', '}}'):
+                fmt.append(token)
+                continue
+            if m.group(1) is None:
+                raise TemplateError(f'unmatched {token!r} at position {m.start()} (use {token * 2} for a literal brace)')
+            field, filters, default = self._parse_slot(m.group(1))
+            if default is None:
+                if field not in self.fields:
+                    self.fields.append(field)
+            elif field not in self.optional:
+                self.optional.append(field)
+            plain = plain and not filters and default is None
+            getters.append((field, filters, default))
+            fmt.append('{%d}' % (len(getters) - 1))
+        fmt.append(text[pos:])
+        self._format = ''.join(fmt).format
+        self._getters = getters
+        self._plain = plain and bool(getters)
+        if self._plain:
+            names = [field for field, _, _ in getters]
+            getter = operator.itemgetter(*names)
+            self._values = getter if len(names) > 1 else (lambda row: (getter(row),))
+        else:
+            self._values = self._slow_values
+
+    @staticmethod
+    def _parse_slot(body):
+        default = None
+        if '?' in body:
+            body, default = body.split('?', 1)
+        parts = body.split('|')
+        m = _FIELD.match(parts[0])
+        if not m:
+            raise TemplateError(f'bad placeholder {{{body}}}: expected {{field}}, {{field|filter}} or {{field?default}}')
+        filters = []
+        for part in parts[1:]:
+            name, _, arg = part.strip().partition(':')
+            func = FILTERS.get(name)
+            if func is None:
+                raise TemplateError(f"unknown filter {name!r} (known: {', '.join(sorted(FILTERS))})")
+            filters.append((lambda value, _f=func, _arg=arg: _f(value, _arg)) if arg else func)
+        return m.group(1), filters, default
+
+    def _slow_values(self, row):
+        values = []
+        for field, filters, default in self._getters:
+            value = row.get(field)
+            if not value:
+                if default is None:
+                    raise TemplateError(f'missing value for {{{field}}}')
+                values.append(default)
+                continue
+            for f in filters:
+                value = f(value)
+            values.append(value)
+        return values
+
+    def missing(self, row):
+        """Required fields `row` has no (non-empty) value for."""
+        return [field for field in self.fields if not row.get(field)]
+
+    def check(self, row):
+        """Raise TemplateError unless `row` renders (missing fields, or a filter that can't take the value)."""
+        missing = self.missing(row)
+        if missing:
+            raise TemplateError('missing ' + ', '.join('{%s}' % f for f in missing))
+        try:
+            self._slow_values(row)
+        except (TypeError, ValueError, IndexError) as e:
+            if isinstance(e, TemplateError):
+                raise
+            raise TemplateError(f'cannot format row: {e}')
+
+    def render(self, row):
+        try:
+            values = self._values(row)
+        except KeyError as e:
+            raise TemplateError(f'missing value for {{{e.args[0]}}}')
+        except TemplateError:
+            raise
+        except (TypeError, ValueError, IndexError) as e:
+            # a filter that can't take the value: one bad row, same as check() reports it
+            raise TemplateError(f'cannot format row: {e}')
+        if self._plain and not all(values):
+            raise TemplateError('missing ' + ', '.join('{%s}' % f for f in self.missing(row)))
+        return self._format(*values)
+
+    def __repr__(self):
+        return f'Template({self.text!r})'
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(text):
+    """Parse `text` once; the same template text hands back the same Template."""
+    return Template(text)
@@ -0,0 +1,262 @@
+"""
+Per-stage send timings: spans around each step of a send, aggregated into
+histograms and exported as JSONL and a Prometheus textfile.
+
+    import metrics
+    with metrics.span('open_chat'):
+        open_chat(page, phone, message)
+
+    @metrics.timed('send_by_phone')
+    def send_by_phone(...): ...
+
+Off by default: span() then hands back one shared no-op context manager, so
+the instrumentation can stay in the send paths at essentially no cost.
+`--metrics` prints a p50/p95/p99 table at the end of a run, `--metrics-jsonl`
+appends one line per span and `--metrics-prom` writes a textfile for the
+node_exporter textfile collector.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+# bucket bounds grow by 4%, so reported percentiles are within ~2% of the true value
+_GROWTH = 1.04
+_LOG_GROWTH = math.log(_GROWTH)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Log-bucketed latency histogram (ms); memory is bounded by the value range, not the sample count."""
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max', 'errors')
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.errors = 0
+
+    def add(self, ms, error=False):
+        idx = int(math.log(ms) / _LOG_GROWTH) if ms > 0.001 else -200
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        self.count += 1
+        self.total += ms
+        if ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+        if error:
+            self.errors += 1
+
+    def merge(self, other):
+        """Fold another histogram (e.g. from a worker process) into this one."""
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.errors += other.errors
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen >= rank:
+                # geometric middle of the bucket, clamped to what was actually observed
+                return min(self.max, max(self.min, _GROWTH ** (idx + 0.5)))
+        return self.max
+
+    def as_dict(self):
+        d = {'count': self.count, 'errors': self.errors, 'sum_ms': round(self.total, 3),
+             'min_ms': round(self.min, 3) if self.count else None, 'max_ms': round(self.max, 3)}
+        for q in QUANTILES:
+            value = self.percentile(q)
+            d[f'p{int(q * 100)}_ms'] = round(value, 3) if value is not None else None
+        return d
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('metrics', 'stage', 't0')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.stage, (time.perf_counter() - self.t0) * 1000, error=exc_type is not None)
+        return False
+
+
+class Metrics:
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}  # stage -> Histogram, in first-seen order
+        self.jsonl_path = None
+        self.prom_path = None
+        self._jsonl = None
+        self._lock = threading.Lock()
+
+    def enable(self, jsonl_path=None, prom_path=None):
+        self.enabled = True
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        if jsonl_path and self._jsonl is None:
+            self._jsonl = open(jsonl_path, 'a', encoding='utf-8')
+        return self
+
+    def reset(self):
+        """Forget every histogram (e.g. between benchmark runs)."""
+        with self._lock:
+            self.histograms = {}
+
+    def span(self, stage):
+        """Context manager timing one stage; a shared no-op while disabled."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def record(self, stage, ms, error=False):
+        """Add an externally measured duration (e.g. a time-to-sent reported by the page)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram()
+            hist.add(ms, error)
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps({'ts': round(time.time(), 3), 'stage': stage, 'ms': round(ms, 3),
+                                              'error': error}) + '\n')
+
+    def merge(self, histograms):
+        """Add {stage: Histogram} collected elsewhere (another process) to this instance's stages."""
+        with self._lock:
+            for stage, other in histograms.items():
+                hist = self.histograms.get(stage)
+                if hist is None:
+                    hist = self.histograms[stage] = Histogram()
+                hist.merge(other)
+
+    def timed(self, stage):
+        """Decorator form of span(); checks `enabled` per call, so it can be toggled at runtime."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: hist.as_dict() for stage, hist in self.histograms.items()}
+
+    def summary(self):
+        rows = self.snapshot()
+        if not rows:
+            return 'No timings recorded.'
+        width = max(len(stage) for stage in rows)
+        lines = [f"{'stage':<{width}} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for stage, d in rows.items():
+            lines.append(f"{stage:<{width}} {d['count']:>7} {d['p50_ms']:>9.1f} {d['p95_ms']:>9.1f} "
+                         f"{d['p99_ms']:>9.1f} {d['max_ms']:>9.1f}")
+        return '\n'.join(lines)
+
+    def prometheus_text(self, prefix='whatsapp_send_stage'):
+        lines = [f'# HELP {prefix}_seconds Duration of each send stage.', f'# TYPE {prefix}_seconds summary']
+        for stage, d in self.snapshot().items():
+            label = stage.replace('\\', '\\\\').replace('"', '\\"')
+            for q in QUANTILES:
+                value = d[f'p{int(q * 100)}_ms']
+                lines.append(f'{prefix}_seconds{{stage="{label}",quantile="{q}"}} {value / 1000:.6f}')
+            lines.append(f'{prefix}_seconds_sum{{stage="{label}"}} {d["sum_ms"] / 1000:.6f}')
+            lines.append(f'{prefix}_seconds_count{{stage="{label}"}} {d["count"]}')
+            lines.append(f'{prefix}_errors_total{{stage="{label}"}} {d["errors"]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """Flush the JSONL and (re)write the Prometheus textfile atomically."""
+        if self._jsonl is not None:
+            self._jsonl.flush()
+        if self.prom_path:
+            tmp = self.prom_path + '.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(self.prometheus_text())
+                os.replace(tmp, self.prom_path)
+            except Exception as e:
+                print(f'Warning: could not write metrics textfile: {e}')
+
+    def close(self):
+        self.export()
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+# process-wide instance used by the send paths
+METRICS = Metrics()
+span = METRICS.span
+record = METRICS.record
+timed = METRICS.timed
+
+
+def add_arguments(parser):
+    parser.add_argument('--metrics', action='store_true', help='Time every send stage and print p50/p95/p99 at the end')
+    parser.add_argument('--metrics-jsonl', help='Append one JSON line per timed stage to this file (implies --metrics)')
+    parser.add_argument('--metrics-prom', help='Write stage percentiles as a Prometheus textfile (implies --metrics)')
+
+
+def from_args(args):
+    jsonl, prom = getattr(args, 'metrics_jsonl', None), getattr(args, 'metrics_prom', None)
+    if getattr(args, 'metrics', False) or jsonl or prom:
+        METRICS.enable(jsonl_path=jsonl, prom_path=prom)
+    return METRICS
+
+
+def report(args):
+    """End of run: write the exports and, with --metrics, print the summary table."""
+    if not METRICS.enabled:
+        return
+    METRICS.close()
+    if getattr(args, 'metrics', False):
+        print('Stage timings:')
+        print(METRICS.summary())
+
+
+def cli_flags(args):
+    """The metrics flags set on `args`, as argv for a child script."""
+    flags = ['--metrics'] if getattr(args, 'metrics', False) else []
+    for name in ('metrics_jsonl', 'metrics_prom'):
+        if getattr(args, name, None):
+            flags += ['--' + name.replace('_', '-'), getattr(args, name)]
+    return flags
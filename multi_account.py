@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Send one campaign from several WhatsApp accounts at once.
+
+Each --profiles directory is one logged-in account. Every account gets its
+own worker process with its own Chromium, pacing budget and selector cache.
+The coordinator (this process) reads the recipients file as a stream and
+shards rows across the workers on a consistent-hash ring keyed by recipient.
+The same number or name always goes out through the same account, and
+adding or losing an account only moves that account's share:
+
+    python multi_account.py --profiles ./acc1 ./acc2 ./acc3 --recipients list.csv --message "Hi {name}"
+
+Each worker has at most --window jobs handed to it at a time. When a worker
+dies or its session logs out, it leaves the ring and its queued jobs go to
+the next account on the ring. A job it was in the middle of sending is
+recorded as failed ('interrupted') rather than resent, because it may already
+have gone out. --retry-interrupted resends it anyway. Results from all
+accounts go to one JSONL file with an `account` column, and the workers'
+stage timings are merged into one --metrics / --metrics-prom report
+(--metrics-jsonl span lines are written per worker, as <name>.<n>.jsonl).
+--receipts works the same way: each worker tags its own sends and logs
+their receipts to <name>.<n>.log, and the coordinator prints one summary.
+"""
+import argparse
+import bisect
+import collections
+import os
+import queue
+import sys
+import time
+
+import browser_session
+import invalid_numbers
+import media
+import metrics
+import phone_numbers
+import rate_limiter
+import send_whatsapp
+from recipients import ResultWriter
+
+# ring points per account; more points spread the load more evenly
+REPLICAS = 100
+# how often the coordinator checks that worker processes are still alive (s)
+LIVENESS_INTERVAL = 1.0
+
+
+class HashRing:
+    """Consistent-hash ring of account names."""
+
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        self.replicas = replicas
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key):
+        import hashlib  # ~5 ms at import time; only a multi-account run builds a ring
+
+        return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = self._hash(f'{node}#{i}')
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node):
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: n for p, n in self._owners.items() if n != node}
+
+    def owner(self, key):
+        """The account `key` belongs to, or None once the ring is empty."""
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[self._points[i]]
+
+    def __len__(self):
+        return len(set(self._owners.values()))
+
+
+def shard_key(job):
+    """Digits of the phone number (so formatting doesn't matter), else the lower-cased name."""
+    if job.get('phone'):
+        return ''.join(ch for ch in str(job['phone']) if ch.isdigit())
+    return (job.get('name') or '').strip().lower()
+
+
+def _worker(account, args, setup_context, inbox, outbox):
+    """Worker process: one browser on `args.profile_dir`, sending the jobs the coordinator hands it."""
+    from playwright.sync_api import sync_playwright
+
+    metrics.from_args(args)
+    profile_dir = args.profile_dir
+    try:
+        with sync_playwright() as pw:
+            launch_kwargs = {}
+            if args.lean:
+                launch_kwargs = browser_session.lean_launch_kwargs(profile_dir)
+            launch_kwargs['headless'] = args.headless or browser_session.headless_ok(profile_dir)
+            with metrics.span('launch'):
+                context = pw.chromium.launch_persistent_context(user_data_dir=profile_dir, **launch_kwargs)
+            if setup_context:
+                setup_context(context)
+            if args.lean:
+                browser_session.block_heavy_resources(context)
+            page = context.new_page()
+            send_whatsapp.SELECTORS.attach(profile_dir)
+            invalid_numbers.attach_from_args(send_whatsapp.INVALID_NUMBERS, args)
+            if not send_whatsapp.ensure_logged_in(page, timeout=args.login_timeout, profile_dir=profile_dir):
+                browser_session.mark_logged_out(profile_dir)
+                outbox.put(('logged_out', account, None))
+                return
+            outbox.put(('ready', account, None))
+            tracker = None
+            if args.receipts and not args.dry_run:
+                import receipts
+                tracker = receipts.ReceiptTracker(args.receipts)
+                tracker.attach(context)
+
+            pace = rate_limiter.from_args(args).load_state(send_whatsapp.rate_state_path(args))
+            try:
+                while True:
+                    job = inbox.get()
+                    if job is None:
+                        break
+                    with metrics.span('pace'):
+                        pace.next_slot(profile_dir, job['phone'] or job['name'])
+                    outbox.put(('started', account, job['job_id']))
+                    start = time.perf_counter()
+                    try:
+                        result = send_whatsapp.send_job(page, job, args)
+                    except Exception as e:
+                        result = send_whatsapp.SendResult(send_whatsapp.SendResult.FAILED, error=str(e))
+                    if not result and page.locator(send_whatsapp.QR_SELECTOR).count():
+                        # the session was logged out under us; this job never went out
+                        browser_session.mark_logged_out(profile_dir)
+                        outbox.put(('logged_out', account, job['job_id']))
+                        return
+                    send_whatsapp.track_receipt(tracker, page, job, result, args)
+                    record = send_whatsapp.job_record(job, result, (time.perf_counter() - start) * 1000)
+                    outbox.put(('result', account, dict(record, job_id=job['job_id'])))
+                if tracker:
+                    tracker.drain(page, timeout=args.receipts_wait, until=args.receipts_until)
+            finally:
+                send_whatsapp.SELECTORS.save()
+                send_whatsapp.INVALID_NUMBERS.save()
+                pace.save_state(send_whatsapp.rate_state_path(args))
+                if tracker:
+                    outbox.put(('receipts', account, tracker.counts()))
+                    tracker.close()
+                context.close()
+    except Exception as e:
+        outbox.put(('error', account, str(e)))
+    finally:
+        outbox.put(('metrics', account, metrics.METRICS.histograms if metrics.METRICS.enabled else {}))
+        outbox.put(('done', account, dict(send_whatsapp.NAV_STATS)))
+
+
+class _Worker:
+    __slots__ = ('account', 'process', 'inbox', 'backlog', 'inflight', 'started', 'live', 'finished', 'stats')
+
+    def __init__(self, account, process, inbox):
+        self.account = account
+        self.process = process
+        self.inbox = inbox
+        self.backlog = collections.deque()  # assigned, not yet handed to the process
+        self.inflight = {}                  # job_id -> job handed to the process
+        self.started = None                 # job_id the process said it is sending right now
+        self.live = True                    # still on the ring
+        self.finished = False               # process said 'done' (or was found dead)
+        self.stats = {'ok': 0, 'failed': 0, 'moved_out': 0, 'moved_in': 0, 'status': 'starting'}
+
+
+class Coordinator:
+    """
+    Shard a stream of send jobs across one worker process per profile directory.
+
+    `setup_context`, if given, is called with each worker's browser context
+    right after launch (it must be picklable, e.g. a module-level function or
+    functools.partial of one); the benchmark uses it to install the fake page.
+    """
+
+    def __init__(self, profiles, args, setup_context=None, window=2, max_backlog=None):
+        self.args = args
+        self.setup_context = setup_context
+        self.window = max(1, window)
+        self.accounts = [os.path.normpath(p) for p in profiles]
+        self.max_backlog = max_backlog or self.window * len(self.accounts) * 8
+        self.ring = HashRing(self.accounts)
+        self.workers = {}
+        import multiprocessing
+        self._mp = multiprocessing.get_context('spawn')  # a fresh interpreter per browser, on every OS
+        self._outbox = self._mp.Queue()
+        self._next_id = 0
+        self._checked = time.monotonic()
+        self.on_result = None
+        self.receipts = {}  # status -> count, summed over the workers
+
+    def start(self):
+        for i, account in enumerate(self.accounts):
+            os.makedirs(account, exist_ok=True)
+            worker_args = argparse.Namespace(**vars(self.args))
+            worker_args.profile_dir = account
+            # histograms come back to the coordinator; span lines go to one file per worker
+            worker_args.metrics = metrics.METRICS.enabled
+            worker_args.metrics_prom = None
+            if getattr(self.args, 'metrics_jsonl', None):
+                root, ext = os.path.splitext(self.args.metrics_jsonl)
+                worker_args.metrics_jsonl = f'{root}.{i}{ext}'
+            if getattr(self.args, 'receipts', None):
+                root, ext = os.path.splitext(self.args.receipts)
+                worker_args.receipts = f'{root}.{i}{ext}'
+            inbox = self._mp.Queue()
+            process = self._mp.Process(target=_worker, name=f'sender:{account}', daemon=True,
+                                       args=(account, worker_args, self.setup_context, inbox, self._outbox))
+            process.start()
+            self.workers[account] = _Worker(account, process, inbox)
+
+    def run(self, jobs, on_result):
+        """Send every job; `on_result(result_dict)` gets each outcome (with an `account` key) as it arrives."""
+        self.on_result = on_result
+        jobs = iter(jobs)
+        exhausted = False
+        while True:
+            while not exhausted and self._pending() < self.max_backlog:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                job['job_id'] = self._next_id
+                self._next_id += 1
+                self._assign(job)
+            self._feed()
+            if exhausted and not self._pending():
+                break
+            self._poll()
+
+    def close(self):
+        """Tell the workers to finish, collect their metrics and wait for them to exit."""
+        for worker in self.workers.values():
+            if worker.live:
+                worker.inbox.put(None)
+        deadline = time.monotonic() + 30
+        while not all(w.finished for w in self.workers.values()) and time.monotonic() < deadline:
+            self._poll()
+        for worker in self.workers.values():
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def _pending(self):
+        return sum(len(w.backlog) + len(w.inflight) for w in self.workers.values() if w.live)
+
+    def _assign(self, job):
+        account = self.ring.owner(shard_key(job))
+        if account is None:
+            self._emit(None, job, 'failed', 'no account left to send from')
+            return None
+        self.workers[account].backlog.append(job)
+        return account
+
+    def _feed(self):
+        for worker in self.workers.values():
+            while worker.live and worker.backlog and len(worker.inflight) < self.window:
+                job = worker.backlog.popleft()
+                worker.inflight[job['job_id']] = job
+                worker.inbox.put(job)
+
+    def _emit(self, account, job, status, error=None, **extra):
+        result = {'row': job.get('row'), 'phone': job.get('phone'), 'name': job.get('name'),
+                  'kind': send_whatsapp.job_kind(job), 'status': status,
+                  'latency_ms': 0.0, 'time_to_sent_ms': None, 'error': error}
+        result.update(extra)
+        result.pop('job_id', None)
+        if account:
+            self.workers[account].stats['ok' if send_whatsapp.SendResult(status) else 'failed'] += 1
+        self.on_result(dict(result, account=account))
+
+    def _poll(self, timeout=LIVENESS_INTERVAL):
+        try:
+            self._handle(*self._outbox.get(timeout=timeout))
+        except queue.Empty:
+            pass
+        if time.monotonic() - self._checked >= LIVENESS_INTERVAL:
+            self._checked = time.monotonic()
+            self._reap()
+
+    def _handle(self, kind, account, payload):
+        worker = self.workers[account]
+        if kind == 'ready':
+            worker.stats['status'] = 'ready'
+        elif kind == 'started':
+            worker.started = payload
+        elif kind == 'result':
+            worker.started = None
+            job = worker.inflight.pop(payload['job_id'], None)
+            if job is not None:
+                self._emit(account, job, payload['status'], payload['error'], kind=payload['kind'],
+                           latency_ms=payload['latency_ms'], time_to_sent_ms=payload['time_to_sent_ms'])
+        elif kind == 'logged_out':
+            print(f'{account}: WhatsApp Web is logged out; moving its recipients to the other accounts.')
+            # the job it reports was not sent (the app showed the QR), so it moves too
+            worker.started = None
+            self._retire(worker, 'logged out')
+        elif kind == 'error':
+            print(f'{account}: worker failed: {payload}')
+            self._retire(worker, 'error')
+        elif kind == 'metrics':
+            metrics.METRICS.merge(payload)
+        elif kind == 'receipts':
+            for status, n in payload.items():
+                self.receipts[status] = self.receipts.get(status, 0) + n
+        elif kind == 'done':
+            worker.finished = True
+            if worker.live and worker.stats['status'] == 'ready':
+                worker.stats['status'] = 'done'
+            if worker.live and (worker.backlog or worker.inflight):
+                self._retire(worker, 'exited')
+
+    def _reap(self):
+        for worker in self.workers.values():
+            if worker.finished or worker.process.is_alive():
+                continue
+            # read whatever it managed to report before deciding it died
+            while True:
+                try:
+                    self._handle(*self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            if not worker.finished:
+                print(f'{worker.account}: worker process died (exit code {worker.process.exitcode}).')
+                worker.finished = True
+                self._retire(worker, 'died')
+
+    def _retire(self, worker, reason):
+        """Take `worker` off the ring and hand its unfinished jobs to the accounts that remain."""
+        if not worker.live:
+            return
+        worker.live = False
+        worker.stats['status'] = reason
+        self.ring.remove(worker.account)
+        if reason == 'died' and worker.started is None and worker.inflight:
+            # a crash can lose the 'started' note; the process works in order, so the oldest job may be out
+            worker.started = min(worker.inflight)
+        jobs = list(worker.inflight.values()) + list(worker.backlog)
+        worker.inflight.clear()
+        worker.backlog.clear()
+        for job in jobs:
+            if job['job_id'] == worker.started and not getattr(self.args, 'retry_interrupted', False):
+                self._emit(worker.account, job, 'failed', f'interrupted: worker {reason} mid-send')
+                continue
+            owner = self._assign(job)
+            if owner:
+                worker.stats['moved_out'] += 1
+                self.workers[owner].stats['moved_in'] += 1
+        worker.started = None
+
+    def report(self):
+        width = max(len(a) for a in self.accounts)
+        lines = [f"{'account':<{width}} {'status':>10} {'ok':>7} {'failed':>7} {'moved out':>10} {'moved in':>9}"]
+        for account in self.accounts:
+            s = self.workers[account].stats
+            lines.append(f"{account:<{width}} {s['status']:>10} {s['ok']:>7} {s['failed']:>7} "
+                         f"{s['moved_out']:>10} {s['moved_in']:>9}")
+        return '\n'.join(lines)
+
+
+def run(args, setup_context=None):
+    """Run the --recipients campaign across --profiles; returns the Coordinator (for its stats)."""
+    results_path = send_whatsapp.campaign_results_path(args)
+    coordinator = Coordinator(args.profiles, args, setup_context=setup_context, window=args.window)
+    counts = {'ok': 0, 'failed': 0}
+    if args.receipts and args.dry_run:
+        print('Note: --dry-run sends nothing, so --receipts records nothing.')
+    with ResultWriter(results_path) as out:
+
+        def on_result(result):
+            ok = bool(send_whatsapp.SendResult(result['status']))
+            counts['ok' if ok else 'failed'] += 1
+            out.write(**result)
+            if not ok:
+                print(f"Row {result['row']}: {result['status']} ({result['error']})")
+
+        jobs = send_whatsapp.iter_campaign_jobs(args, out)
+        if args.receipts:
+            jobs = send_whatsapp.with_receipt_ids(jobs, args)
+        coordinator.start()
+        try:
+            coordinator.run(jobs, on_result)
+        finally:
+            coordinator.close()
+    print(coordinator.report())
+    if coordinator.receipts:
+        summary = ', '.join(f'{coordinator.receipts[s]} {s}' for s in ('pending', 'sent', 'delivered', 'read', 'failed')
+                            if s in coordinator.receipts)
+        root, ext = os.path.splitext(args.receipts)
+        print(f'Receipts: {summary}. Logs: {root}.<n>{ext}')
+    print(f"Campaign finished: {counts['ok']} ok, {counts['failed']} failed. Results: {results_path}")
+    coordinator.counts = counts
+    return coordinator
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Send one WhatsApp Web campaign from several accounts in parallel.')
+    parser.add_argument('--profiles', nargs='+', required=True, help='One browser profile directory per logged-in account')
+    parser.add_argument('--recipients', required=True, help='CSV/JSONL file of recipients (see send_whatsapp.py --recipients)')
+    parser.add_argument('--message', help='Message template filled per row: {field}, {field|filter}, {field?default} (see message_template.py)')
+    parser.add_argument('--results', help='JSONL file for per-row results (default: <recipients>.results.jsonl)')
+    parser.add_argument('--skip-invalid', action='store_true', help='Send the valid rows and record the others as failed, instead of refusing to start')
+    parser.add_argument('--window', type=int, default=2, help='Jobs handed to each worker ahead of time')
+    parser.add_argument('--headless', action='store_true', help='Run every worker headless (by default only profiles that have logged in before are)')
+    parser.add_argument('--lean', action='store_true', help='Send-only browsers (see send_whatsapp.py --lean)')
+    parser.add_argument('--login-timeout', type=int, default=60, help='Seconds each worker waits for WhatsApp Web to log in')
+    parser.add_argument('--delay', type=float, default=1.0, help='Minimum seconds between sends per account (when --rate-per-minute is not given)')
+    parser.add_argument('--dry-run', action='store_true', help='Open chats and fill messages but do not send')
+    parser.add_argument('--confirm-until', choices=['queued', 'sent', 'delivered'], default='sent')
+    parser.add_argument('--confirm-timeout', type=float, default=send_whatsapp.CONFIRM_TIMEOUT / 1000)
+    parser.add_argument('--typing', choices=send_whatsapp.TYPING_MODES, default='insert')
+    parser.add_argument('--nav', choices=['auto', 'goto'], default='auto')
+    phone_numbers.add_arguments(parser)
+    invalid_numbers.add_arguments(parser)
+    parser.add_argument('--attach', metavar='FILE', help='File sent to every row without its own attachment column (each worker reads it once)')
+    parser.add_argument('--attach-as', choices=media.KINDS, default='auto')
+    parser.add_argument('--media-timeout', type=float, default=send_whatsapp.MEDIA_TIMEOUT / 1000)
+    parser.add_argument('--retry-interrupted', action='store_true', help='Resend a job a worker died in the middle of (may double send)')
+    parser.add_argument('--receipts', metavar='LOG', help='Log delivery/read receipts of the sent messages, one log per worker (<name>.<n>.log; see receipts.py)')
+    parser.add_argument('--receipts-wait', type=float, default=30.0, help='With --receipts: after its last send, each worker waits up to this many seconds for outstanding receipts')
+    parser.add_argument('--receipts-until', choices=['sent', 'delivered', 'read'], default='delivered', help='With --receipts: stop waiting once every message got this far')
+    rate_limiter.add_arguments(parser)
+    metrics.add_arguments(parser)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    metrics.from_args(args)
+    if len(set(os.path.normpath(p) for p in args.profiles)) != len(args.profiles):
+        print('Each --profiles directory can only be given once (one browser per profile).')
+        return 1
+    if not args.skip_invalid:
+        try:
+            bad = send_whatsapp.validate_recipients(args)
+        except (OSError, ValueError) as e:
+            print('Could not read --recipients:', e)
+            return 1
+        if bad:
+            print(f'{bad} row(s) cannot be sent; fix them or pass --skip-invalid.')
+            return 1
+    coordinator = run(args)
+    metrics.report(args)
+    return 0 if coordinator.counts['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Phone-number normalization for contact imports and send paths.
+
+    normalize('+44 7911 123456')          # -> '447911123456'
+    normalize('07911 123456', '44')       # -> '447911123456'
+    normalize('(555) 123-4567', '1')      # -> '15551234567'
+    normalize('12345')                    # PhoneError: too short
+
+Numbers come back as E.164 digits without the leading '+'. That is the
+international format the senders already use (`--phone 15551234567`,
+`wa.me`/`send?phone=` URLs, contacts.json). Input may carry spaces, dashes,
+dots, slashes, brackets, a leading '+', or an international dialling prefix
+(00, or 011 in North America). Numbers written without any of those are
+taken as national when a default country code is given, or as international
+when none is. The country code must be an assigned one. The national part is
+checked against loose length bounds, and North American numbers also against
+the area-code rule, so typos are rejected before anything is
+sent.
+"""
+
+# formatting characters people put in numbers; deleted in one str.translate pass
+_SEPARATORS = str.maketrans('', '', ' -.()/\t\u00a0\u2010\u2011\u2012\u2013\u2212')
+
+# assigned country calling codes (ITU-T E.164; non-geographic codes left out).
+# They are prefix-free, so the first 1-3 digits identify at most one country.
+_CC1 = frozenset('17')
+_CC2 = frozenset((
+    '20 27 30 31 32 33 34 36 39 40 41 43 44 45 46 47 48 49 51 52 53 54 55 56 57 58 '
+    '60 61 62 63 64 65 66 81 82 84 86 90 91 92 93 94 95 98').split())
+_CC3 = frozenset(
+    ['211', '212', '213', '216', '218']
+    + [str(cc) for cc in range(220, 259)]
+    + [str(cc) for cc in range(260, 270)]
+    + ['290', '291', '297', '298', '299']
+    + [str(cc) for cc in range(350, 360)]
+    + [str(cc) for cc in range(370, 379)]
+    + ['380', '381', '382', '383', '385', '386', '387', '389', '420', '421', '423']
+    + [str(cc) for cc in range(500, 510)]
+    + [str(cc) for cc in range(590, 600)]
+    + ['670', '672', '673', '674', '675', '676', '677', '678', '679',
+       '680', '681', '682', '683', '685', '686', '687', '688', '689', '690', '691', '692',
+       '850', '852', '853', '855', '856', '880', '886']
+    + [str(cc) for cc in range(960, 969)]
+    + ['970', '971', '972', '973', '974', '975', '976', '977', '992', '993', '994', '995', '996', '998'])
+
+# (min, max) national-number digits where the plan is fixed or well known; anything else gets
+# (MIN_NATIONAL, 15 - len(cc))
+NATIONAL_LENGTHS = {
+    '1': (10, 10), '7': (10, 10), '27': (9, 9), '33': (9, 9), '34': (9, 9), '44': (9, 10),
+    '49': (6, 13), '55': (10, 11), '61': (9, 9), '62': (8, 12), '81': (9, 10), '86': (7, 11),
+    '91': (10, 10), '92': (9, 10),
+}
+MIN_NATIONAL = 4
+MAX_DIGITS = 15
+
+
+class PhoneError(ValueError):
+    """A number that can't be turned into a valid international number."""
+
+
+def country_code(digits):
+    """The calling code `digits` (international, no '+') starts with, or None."""
+    if digits[:1] in _CC1:
+        return digits[:1]
+    if digits[:2] in _CC2:
+        return digits[:2]
+    if digits[:3] in _CC3:
+        return digits[:3]
+    return None
+
+
+def _check(digits):
+    """`digits` if it is a plausible international number, else the reason it isn't."""
+    cc = country_code(digits)
+    if cc is None:
+        return None, f'unknown country code in +{digits[:3]}'
+    national = len(digits) - len(cc)
+    low, high = NATIONAL_LENGTHS.get(cc, (MIN_NATIONAL, MAX_DIGITS - len(cc)))
+    if national < low:
+        return None, f'too short for +{cc} ({national} digits after the country code, need {low})'
+    if national > high:
+        return None, f'too long for +{cc} ({national} digits after the country code, at most {high})'
+    if cc == '1' and digits[1] in '01':
+        return None, f'invalid North American area code {digits[1:4]}'
+    return digits, None
+
+
+def looks_like_phone(text):
+    """True when `text` is written like a phone number (digits, separators, a leading '+') rather than a name."""
+    text = str(text).strip().translate(_SEPARATORS)
+    if text.startswith('+'):
+        text = text[1:]
+    return len(text) >= 3 and text.isdigit()
+
+
+def normalize(raw, default_cc=None):
+    """
+    International digits (E.164 without '+') for `raw`; raises PhoneError.
+    `default_cc` (e.g. '44') is the country assumed for numbers written
+    without '+' or a dialling prefix.
+    """
+    text = str(raw).strip().translate(_SEPARATORS)
+    plus = text.startswith('+')
+    digits = text[1:] if plus else text
+    if not (digits.isdigit() and digits.isascii()):
+        raise PhoneError('has characters other than digits and separators' if digits else 'empty phone number')
+    if len(digits) > MAX_DIGITS + 3:
+        raise PhoneError(f'too long ({len(digits)} digits)')
+    if plus:
+        candidates = (digits,)
+    elif digits.startswith('00'):
+        candidates = (digits[2:],)
+    elif default_cc == '1' and digits.startswith('011'):
+        candidates = (digits[3:],)
+    elif default_cc:
+        if digits.startswith('0'):
+            # national trunk prefix: 07911 123456 -> 44 7911 123456
+            candidates = (default_cc + digits[1:],)
+        else:
+            # national first; lists often hold international numbers without the '+' as well
+            candidates = (default_cc + digits, digits)
+    elif digits.startswith('0'):
+        raise PhoneError('national number (leading 0) but no default country code given')
+    else:
+        candidates = (digits,)
+    error = None
+    for candidate in candidates:
+        number, reason = _check(candidate)
+        if number:
+            return number
+        error = error or reason
+    raise PhoneError(error)
+
+
+def normalize_or_none(raw, default_cc=None):
+    """normalize() for callers that just want to skip bad numbers."""
+    try:
+        return normalize(raw, default_cc)
+    except PhoneError:
+        return None
+
+
+def add_arguments(parser):
+    parser.add_argument('--country-code', metavar='CC', type=_country_code_arg,
+                        help='Country calling code assumed for numbers without +/00, e.g. 44 or 1 (default: numbers must be international)')
+
+
+def _country_code_arg(value):
+    value = value.strip().lstrip('+')
+    if not value.isdigit() or value not in _CC1 | _CC2 | _CC3:
+        raise ValueError(value)
+    return value
+
+
+_country_code_arg.__name__ = 'country code'  # argparse names the type in its error message
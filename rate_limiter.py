@@ -0,0 +1,268 @@
+"""
+Send pacing: token buckets per account and per recipient plus rolling
+hourly/daily caps, shared by every send path through `next_slot()`.
+
+Buckets use GCRA-style bookkeeping (a "theoretical arrival time" per bucket),
+so a reservation is O(1) and sends go out as soon as every budget allows -
+never faster. Jitter only ever delays a slot, so it can't break a ceiling.
+
+    sched = RateScheduler(per_minute=20, burst=3, per_recipient_per_hour=5, hourly_cap=300)
+    for job in jobs:
+        sched.next_slot(account=profile_dir, recipient=job['phone'])   # sleeps as needed
+        send(job)
+
+Pass `clock=SimulatedClock()` to run the same logic without real waiting
+(for tests and `python benchmark.py rate`).
+"""
+import bisect
+import json
+import os
+import random
+import threading
+import time
+
+HOUR = 3600.0
+DAY = 86400.0
+STATE_FILENAME = 'rate_state.json'
+
+
+class RealClock:
+    now = staticmethod(time.monotonic)
+    sleep = staticmethod(time.sleep)
+    wall = staticmethod(time.time)
+
+
+class SimulatedClock:
+    """Clock whose sleep() just advances time; lets you run a day of pacing in milliseconds."""
+
+    def __init__(self, start=0.0):
+        self.t = start
+
+    def now(self):
+        return self.t
+
+    def wall(self):
+        return self.t
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.t += seconds
+
+
+class _Bucket:
+    """`rate` tokens per second, up to `burst` at once."""
+
+    __slots__ = ('interval', 'tolerance', 'tat')
+
+    def __init__(self, rate, burst):
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (max(1, burst) - 1)
+        self.tat = 0.0
+
+    def prune(self, now):
+        pass
+
+    def earliest(self, now):
+        return max(now, self.tat - self.tolerance)
+
+    def consume(self, slot):
+        self.tat = max(self.tat, slot) + self.interval
+
+    def idle(self, now):
+        return self.tat <= now
+
+
+class _Window:
+    """At most `cap` events in any rolling `period` seconds (an event counts in (t - period, t])."""
+
+    def __init__(self, cap, period):
+        self.cap = cap
+        self.period = period
+        self.events = []  # sorted slot times
+
+    def prune(self, now):
+        """Forget events that can no longer share a window with anything booked from `now` (the real time) on."""
+        drop = bisect.bisect_right(self.events, now - self.period)
+        if drop:
+            del self.events[:drop]
+
+    def earliest(self, now):
+        # read-only: `now` may be a candidate slot in the future, and reservations made
+        # before it still need every event prune() has kept
+        x = now
+        lo = bisect.bisect_right(self.events, x - self.period)
+        while True:
+            # slots booked out of order (a recipient bucket pushed one later) count on both sides
+            hi = bisect.bisect_left(self.events, x + self.period)
+            if hi - lo < self.cap:
+                return x
+            # move just past the event that has to age out; advance by index, not by
+            # re-bisecting, since (t + period) - period can round below t
+            k = lo + (hi - lo - self.cap)
+            x = self.events[k] + self.period
+            lo = k + 1
+
+    def consume(self, slot):
+        bisect.insort(self.events, slot)
+
+    def idle(self, now):
+        return not self.events or self.events[-1] <= now - self.period
+
+
+class RateScheduler:
+
+    def __init__(self, per_minute=None, burst=1, per_recipient_per_hour=None, recipient_burst=1,
+                 hourly_cap=None, daily_cap=None, jitter=0.0, clock=None, seed=None):
+        self.clock = clock or RealClock()
+        self.per_minute = per_minute
+        self.burst = burst
+        self.per_recipient_per_hour = per_recipient_per_hour
+        self.recipient_burst = recipient_burst
+        self.hourly_cap = hourly_cap
+        self.daily_cap = daily_cap
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._accounts = {}    # account -> [bucket/window, ...]
+        self._recipients = {}  # (account, recipient) -> [bucket, window]
+        self.sent = 0
+        self.waited = 0.0
+
+    def _account_limits(self, account):
+        limits = self._accounts.get(account)
+        if limits is None:
+            limits = []
+            if self.per_minute:
+                limits.append(_Bucket(self.per_minute / 60.0, self.burst))
+            if self.hourly_cap:
+                limits.append(_Window(self.hourly_cap, HOUR))
+            if self.daily_cap:
+                limits.append(_Window(self.daily_cap, DAY))
+            self._accounts[account] = limits
+        return limits
+
+    def _recipient_limits(self, account, recipient):
+        if not self.per_recipient_per_hour or recipient is None:
+            return []
+        key = (account, recipient)
+        limits = self._recipients.get(key)
+        if limits is None:
+            if len(self._recipients) > 100000:
+                self._prune()
+            # the bucket spaces sends out; the window keeps a burst from exceeding the hourly count
+            limits = self._recipients[key] = [
+                _Bucket(self.per_recipient_per_hour / HOUR, self.recipient_burst),
+                _Window(max(1, int(self.per_recipient_per_hour)), HOUR)]
+        return limits
+
+    def _prune(self):
+        # a full bucket and an empty window are the same as no limits at all; forgetting them changes nothing
+        now = self.clock.now()
+        for key in [k for k, limits in self._recipients.items() if all(l.idle(now) for l in limits)]:
+            del self._recipients[key]
+
+    @staticmethod
+    def _settle(limits, slot):
+        # a window can push the slot past a point another window then objects to; repeat until all agree
+        while True:
+            later = max([slot] + [limit.earliest(slot) for limit in limits])
+            if later == slot:
+                return slot
+            slot = later
+
+    def reserve(self, account='default', recipient=None):
+        """Book the earliest slot every budget allows; returns seconds to wait for it."""
+        with self._lock:
+            now = self.clock.now()
+            limits = self._account_limits(account) + self._recipient_limits(account, recipient)
+            for limit in limits:
+                limit.prune(now)
+            slot = self._settle(limits, now)
+            if self.jitter:
+                slot = self._settle(limits, slot + self._random.uniform(0, self.jitter))
+            for limit in limits:
+                limit.consume(slot)
+            self.sent += 1
+            self.waited += slot - now
+            return slot - now
+
+    def next_slot(self, account='default', recipient=None):
+        """Block until this send may go out. Returns the seconds waited."""
+        wait = self.reserve(account, recipient)
+        if wait > 0:
+            self.clock.sleep(wait)
+        return wait
+
+    # rolling windows survive restarts so a daily cap means one day, not one run;
+    # every entry point keeps them in <profile-dir>/rate_state.json (state_path())
+
+    def save_state(self, path):
+        now, wall = self.clock.now(), self.clock.wall()
+        data = {}
+        for account, limits in self._accounts.items():
+            data[account] = {str(int(l.period)): [wall - (now - t) for t in l.events]
+                             for l in limits if isinstance(l, _Window)}
+        tmp = path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f'Warning: could not save rate limiter state: {e}')
+
+    def load_state(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        now, wall = self.clock.now(), self.clock.wall()
+        for account, windows in data.items():
+            for limit in self._account_limits(account):
+                if isinstance(limit, _Window):
+                    stamps = windows.get(str(int(limit.period)), [])
+                    for t in stamps:
+                        if wall - t < limit.period:
+                            limit.consume(now - (wall - t))
+        return self
+
+
+def state_path(profile_dir):
+    return os.path.join(profile_dir, STATE_FILENAME)
+
+
+def add_arguments(parser):
+    """Pacing flags shared by the CLI entry points."""
+    parser.add_argument('--rate-per-minute', type=float, help='Account-wide ceiling (default: 60 / --delay)')
+    parser.add_argument('--burst', type=int, default=1, help='Sends allowed back-to-back before the rate applies')
+    parser.add_argument('--per-recipient-per-hour', type=float, help='Ceiling for any single recipient')
+    parser.add_argument('--hourly-cap', type=int, help='Max sends in any rolling hour (per profile, kept across runs)')
+    parser.add_argument('--daily-cap', type=int, help='Max sends in any rolling 24 h (per profile, kept across runs)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random delay of up to this many seconds per send')
+
+
+def from_args(args):
+    per_minute = getattr(args, 'rate_per_minute', None)
+    delay = getattr(args, 'delay', None)
+    if not per_minute and delay:
+        # same spacing the old time.sleep(--delay) gave, minus the time the send itself took
+        per_minute = 60.0 / delay
+    return RateScheduler(per_minute=per_minute, burst=getattr(args, 'burst', 1),
+                         per_recipient_per_hour=getattr(args, 'per_recipient_per_hour', None),
+                         hourly_cap=getattr(args, 'hourly_cap', None), daily_cap=getattr(args, 'daily_cap', None),
+                         jitter=getattr(args, 'jitter', 0.0) or 0.0)
+
+
+def cli_flags(args):
+    """The pacing flags set on `args`, as argv for a child send_whatsapp.py."""
+    flags = []
+    for name in ('rate_per_minute', 'per_recipient_per_hour', 'hourly_cap', 'daily_cap'):
+        value = getattr(args, name, None)
+        if value:
+            flags += ['--' + name.replace('_', '-'), str(value)]
+    if getattr(args, 'burst', 1) not in (None, 1):
+        flags += ['--burst', str(args.burst)]
+    if getattr(args, 'jitter', 0):
+        flags += ['--jitter', str(args.jitter)]
+    return flags
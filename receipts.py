@@ -0,0 +1,294 @@
+"""
+Delivery/read receipts pushed from the page instead of polled.
+
+    tracker = ReceiptTracker('receipts.log')
+    tracker.attach(context)                    # once per browser context
+    ...
+    result = send_by_phone(page, phone, text)
+    tracker.track(page, job_id, phone)         # right after each send
+    ...
+    tracker.drain(page, timeout=30)            # let late ticks arrive
+    tracker.close()
+
+attach() installs one MutationObserver in every page (RECEIPT_JS, also as an
+init script so it survives reloads). track() tags the newest outgoing
+bubble, and the chat's row in the chat list, with the job id. The row keeps
+reporting after the sender has moved on to another chat. When the tick
+icon of a tagged element changes, the observer records the new status
+(pending -> sent -> delivered -> read, or failed). The changes are pushed to
+Python in one batch per `batch_ms` through a binding exposed with
+expose_binding. Untagged mutations cost one closest() lookup, so thousands
+of tracked messages add next to nothing per mutation.
+
+Events are appended to a compact log, one JSON array per line:
+    [unix_time, job_id, status]            status changes
+    [unix_time, job_id, "tracked", recipient]
+load_receipts(path) replays the log into the latest status per job.
+"""
+import json
+import threading
+import time
+
+BINDING = '__waReceipts'
+STATUSES = ('pending', 'sent', 'delivered', 'read', 'failed')
+
+# chat list rows; the row for the open chat is the one whose title matches the chat header
+CHAT_ROW_SELECTOR = '#pane-side div[role="listitem"], div[aria-label="Chat list"] div[role="listitem"]'
+CHAT_TITLE_SELECTOR = '#main header span[title], #main header span[dir="auto"], #chat-title'
+
+RECEIPT_JS = """
+(batchMs) => {
+    if (window.__waReceiptObserver) return;
+    const rank = {pending: 0, sent: 1, delivered: 2, read: 3, failed: 4};
+    const statusOf = (el) => {
+        const icons = el.querySelectorAll('[data-icon^="msg-"], [data-icon^="status-"], [data-icon*="error"], [data-icon*="alert"]');
+        const icon = icons[icons.length - 1];
+        if (!icon) return null;
+        const kind = icon.getAttribute('data-icon');
+        const label = (icon.getAttribute('aria-label') || '').toLowerCase();
+        if (kind.includes('error') || kind.includes('alert')) return 'failed';
+        if (kind.endsWith('dblcheck-ack') || label.includes('read')) return 'read';
+        if (kind.endsWith('dblcheck')) return 'delivered';
+        if (kind.endsWith('check')) return 'sent';
+        return 'pending';
+    };
+    const dirty = new Set();
+    let timer = null;
+    const flush = () => {
+        timer = null;
+        const batch = [];
+        for (const el of dirty) {
+            const job = el.getAttribute('data-wa-job');
+            const status = job && statusOf(el);
+            const last = el.getAttribute('data-wa-status');
+            // only forward moves; failed can only follow pending
+            if (!status || status === last) continue;
+            if (last && (rank[status] < rank[last] || (status === 'failed' && last !== 'pending'))) continue;
+            el.setAttribute('data-wa-status', status);
+            batch.push([job, status, Date.now() / 1000]);
+        }
+        dirty.clear();
+        if (batch.length) window.__waReceipts(batch);
+    };
+    const mark = (el) => {
+        dirty.add(el);
+        if (timer === null) timer = setTimeout(flush, batchMs);
+    };
+    window.__waReceiptMark = mark;
+    window.__waReceiptObserver = new MutationObserver((records) => {
+        for (const r of records) {
+            const node = r.target.nodeType === 1 ? r.target : r.target.parentElement;
+            const el = node && node.closest('[data-wa-job]');
+            if (el) mark(el);
+        }
+    });
+    const start = () => window.__waReceiptObserver.observe(document.body, {
+        childList: true, subtree: true, attributes: true, attributeFilter: ['data-icon', 'aria-label']});
+    if (document.body) start(); else document.addEventListener('DOMContentLoaded', start);
+}
+"""
+
+TAG_JS = """
+([job, bubbleSelector, rowSelector, titleSelector]) => {
+    const bubbles = document.querySelectorAll(bubbleSelector);
+    const bubble = bubbles[bubbles.length - 1];
+    if (!bubble) return false;
+    bubble.setAttribute('data-wa-job', job);
+    bubble.removeAttribute('data-wa-status');
+    const header = document.querySelector(titleSelector);
+    const title = header ? (header.getAttribute('title') || header.textContent || '').trim() : '';
+    let row = null;
+    for (const candidate of document.querySelectorAll(rowSelector)) {
+        const t = candidate.querySelector('[title]');
+        if (title && t && t.getAttribute('title').trim() === title) { row = candidate; break; }
+    }
+    if (row) {
+        // the row follows the chat's latest message, so it now reports this job
+        row.setAttribute('data-wa-job', job);
+        row.removeAttribute('data-wa-status');
+    }
+    if (window.__waReceiptMark) {
+        window.__waReceiptMark(bubble);
+        if (row) window.__waReceiptMark(row);
+    }
+    return true;
+}
+"""
+
+
+def _advances(last, status):
+    if status == 'failed':
+        return last == 'pending'
+    return last != 'failed' and STATUSES.index(status) > STATUSES.index(last)
+
+
+class ReceiptLog:
+    """Append-only event log; one write per batch."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write_many(self, events):
+        if not events:
+            return
+        data = ''.join(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n' for event in events)
+        with self._lock:
+            self._f.write(data)
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def load_receipts(path):
+    """{job_id: {'status', 'at', 'recipient'}} from a receipt log; the latest status wins."""
+    jobs = {}
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return jobs
+    with f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # a torn last line after a crash
+            at, job, status = event[:3]
+            entry = jobs.setdefault(job, {'status': 'pending', 'at': at, 'recipient': None})
+            if status == 'tracked':
+                entry['recipient'] = event[3] if len(event) > 3 else None
+            else:
+                entry['status'], entry['at'] = status, at
+    return jobs
+
+
+class ReceiptTracker:
+    """
+    Collects receipt events for tagged messages. Events arrive on the
+    Playwright dispatcher (sync API: while the script is inside a Playwright
+    call), so drain() waits on the page rather than sleeping.
+    """
+
+    def __init__(self, log_path=None, batch_ms=250, on_event=None, bubble_selector=None):
+        from send_whatsapp import OUTGOING_SELECTOR
+
+        self.log = ReceiptLog(log_path) if log_path else None
+        self.batch_ms = batch_ms
+        self.on_event = on_event
+        self.bubble_selector = bubble_selector or OUTGOING_SELECTOR
+        self.jobs = {}   # job_id -> latest status
+        self.stats = {'events': 0, 'batches': 0}
+        self._lock = threading.Lock()
+        self._attached = set()
+
+    def _on_batch(self, source, batch):
+        events = []
+        with self._lock:
+            self.stats['batches'] += 1
+            for job, status, at in batch:
+                last = self.jobs.get(job)
+                if last is None or status not in STATUSES or not _advances(last, status):
+                    continue  # not ours, or the bubble and the chat row both reporting the same tick
+                self.jobs[job] = status
+                events.append([round(at, 3), job, status])
+            self.stats['events'] += len(events)
+        if self.log:
+            self.log.write_many(events)
+        if self.on_event:
+            for event in events:
+                self.on_event(*event)
+
+    def attach(self, target):
+        """Install the binding and observer on a context (every page, now and later) or a single page."""
+        if id(target) in self._attached:
+            return
+        self._attached.add(id(target))
+        target.expose_binding(BINDING, self._on_batch)
+        target.add_init_script(script=f'({RECEIPT_JS})({int(self.batch_ms)})')
+        pages = target.pages if hasattr(target, 'pages') else [target]
+        for page in pages:
+            try:
+                page.evaluate(RECEIPT_JS, self.batch_ms)
+            except Exception as e:
+                print(f'Warning: receipt observer not installed on {page.url}: {e}')
+
+    async def attach_async(self, target):
+        """attach() for playwright.async_api contexts and pages."""
+        if id(target) in self._attached:
+            return
+        self._attached.add(id(target))
+        await target.expose_binding(BINDING, self._on_batch)
+        await target.add_init_script(script=f'({RECEIPT_JS})({int(self.batch_ms)})')
+        pages = target.pages if hasattr(target, 'pages') else [target]
+        for page in pages:
+            try:
+                await page.evaluate(RECEIPT_JS, self.batch_ms)
+            except Exception as e:
+                print(f'Warning: receipt observer not installed on {page.url}: {e}')
+
+    def _tracked(self, job_id, recipient):
+        job_id = str(job_id)
+        with self._lock:
+            self.jobs[job_id] = 'pending'
+        if self.log:
+            self.log.write_many([[round(time.time(), 3), job_id, 'tracked', recipient]])
+        return job_id
+
+    def _tag_args(self, job_id):
+        return [job_id, self.bubble_selector, CHAT_ROW_SELECTOR, CHAT_TITLE_SELECTOR]
+
+    def track(self, page, job_id, recipient=None):
+        """Tag the newest outgoing message on `page` (call right after the send); False if none was found."""
+        job_id = self._tracked(job_id, recipient)
+        try:
+            return bool(page.evaluate(TAG_JS, self._tag_args(job_id)))
+        except Exception as e:
+            print(f'Warning: could not tag job {job_id} for receipts: {e}')
+            return False
+
+    async def track_async(self, page, job_id, recipient=None):
+        job_id = self._tracked(job_id, recipient)
+        try:
+            return bool(await page.evaluate(TAG_JS, self._tag_args(job_id)))
+        except Exception as e:
+            print(f'Warning: could not tag job {job_id} for receipts: {e}')
+            return False
+
+    def waiting(self, until='delivered'):
+        """Job ids that have not reached `until` (or failed) yet."""
+        level = STATUSES.index(until)
+        with self._lock:
+            return [job for job, status in self.jobs.items()
+                    if status != 'failed' and STATUSES.index(status) < level]
+
+    def drain(self, page, timeout=30.0, until='delivered', poll_ms=250):
+        """Keep the page serviced until every tracked job reached `until` (or failed), at most `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        while self.waiting(until) and time.monotonic() < deadline:
+            try:
+                page.wait_for_timeout(poll_ms)
+            except Exception:
+                break
+        return self.counts()
+
+    async def drain_async(self, timeout=30.0, until='delivered', poll_ms=250):
+        """drain() for the async API, where bindings are serviced by the event loop."""
+        import asyncio
+
+        deadline = time.monotonic() + timeout
+        while self.waiting(until) and time.monotonic() < deadline:
+            await asyncio.sleep(poll_ms / 1000)
+        return self.counts()
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for status in self.jobs.values():
+                counts[status] = counts.get(status, 0) + 1
+            return counts
+
+    def close(self):
+        if self.log:
+            self.log.close()
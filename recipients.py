@@ -0,0 +1,69 @@
+"""
+Streaming readers for bulk recipient files.
+
+Rows are yielded one at a time so a campaign file with hundreds of thousands
+of lines never has to fit in memory. Supported formats:
+  - .csv   header row with `phone` and/or `name`, optional `message`, any
+           extra columns are kept as template variables
+  - .jsonl one JSON object per line with the same keys
+"""
+import csv
+import json
+import os
+
+
+def iter_recipients(path):
+    """Yield (line_no, row_dict) for every recipient row in `path`."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        yield from _iter_csv(path)
+    elif ext in ('.jsonl', '.ndjson'):
+        yield from _iter_jsonl(path)
+    else:
+        raise ValueError(f'Unsupported recipients file (use .csv or .jsonl): {path}')
+
+
+def _iter_csv(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            # strip whitespace around header names and values
+            yield reader.line_num, {(k or '').strip(): (v or '').strip() for k, v in row.items()}
+
+
+def _iter_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, {'_error': f'invalid JSON: {e}'}
+                continue
+            if not isinstance(row, dict):
+                yield line_no, {'_error': 'row is not a JSON object'}
+                continue
+            yield line_no, {str(k): '' if v is None else str(v) for k, v in row.items()}
+
+
+class ResultWriter:
+    """Append one JSON line per send result; flushed per row so a crash loses nothing."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'a', encoding='utf-8')
+
+    def write(self, **result):
+        self._f.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,140 @@
+"""
+Learned selector resolution for WhatsApp Web UI lookups.
+
+Each UI role (search box, compose box, send button) has a list of candidate
+CSS selectors. Instead of trying them one by one with a timeout each, the
+registry waits once for *any* of them (a combined comma selector), then picks
+the best-ranked candidate that is actually visible. Per-selector hit/miss
+counts are kept and saved in the browser profile directory, so the next run
+tries the last winner first and selectors that keep missing sink to the end.
+Only a lookup that found the element counts against anything: the
+candidates ranked ahead of the one that matched missed, and a lookup where
+nothing matched says nothing about the selectors.
+"""
+import json
+import os
+import threading
+
+CACHE_FILENAME = 'selector_cache.json'
+# consecutive misses before a selector is ranked behind every healthy one
+DEMOTE_AFTER = 3
+
+
+class SelectorRegistry:
+
+    def __init__(self, roles, path=None):
+        self.roles = {role: list(cands) for role, cands in roles.items()}
+        self.path = path
+        self.stats = {}    # role -> {selector: {'hits', 'misses', 'streak'}}
+        self.winners = {}  # role -> selector that resolved last time
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    # -- persistence ---------------------------------------------------------
+
+    def attach(self, profile_dir):
+        """Load (and later save) learned stats from `profile_dir`."""
+        self.path = os.path.join(profile_dir, CACHE_FILENAME)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.stats = data.get('stats', {})
+            self.winners = data.get('winners', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f'Warning: ignoring unreadable selector cache {self.path}: {e}')
+        return self
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {'winners': self.winners, 'stats': self.stats}
+            self._dirty = False
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f'Warning: could not save selector cache: {e}')
+
+    # -- ranking -------------------------------------------------------------
+
+    def ranked(self, role):
+        """Candidates for `role`, best first: last winner, then by hits; demoted last."""
+        cands = self.roles[role]
+        stats = self.stats.get(role, {})
+        winner = self.winners.get(role)
+
+        def key(item):
+            pos, sel = item
+            st = stats.get(sel, {})
+            demoted = st.get('streak', 0) >= DEMOTE_AFTER
+            return (demoted, sel != winner, -st.get('hits', 0), pos)
+
+        return [sel for _, sel in sorted(enumerate(cands), key=key)]
+
+    def record(self, role, winner, tried):
+        """`winner` matched; every candidate ranked ahead of it in `tried` missed."""
+        with self._lock:
+            stats = self.stats.setdefault(role, {})
+            for sel in tried:
+                st = stats.setdefault(sel, {'hits': 0, 'misses': 0, 'streak': 0})
+                if sel == winner:
+                    st['hits'] += 1
+                    st['streak'] = 0
+                    break
+                st['misses'] += 1
+                st['streak'] += 1
+            if winner and self.winners.get(role) != winner:
+                self.winners[role] = winner
+            self._dirty = True
+
+    # -- resolution ----------------------------------------------------------
+
+    def resolve(self, page, role, timeout=3000):
+        """Wait (once) for any candidate of `role`; return the best visible selector or None."""
+        ranked = self.ranked(role)
+        try:
+            page.wait_for_selector(', '.join(ranked), state='visible', timeout=timeout)
+        except Exception:
+            # nothing of this role on the page (chat never opened, invalid number): no selector's fault
+            return None
+        for sel in ranked:
+            try:
+                handle = page.query_selector(sel)
+                if handle and handle.is_visible():
+                    self.record(role, sel, ranked)
+                    return sel
+            except Exception:
+                continue
+        return None
+
+    async def resolve_async(self, page, role, timeout=3000):
+        """playwright.async_api version of resolve()."""
+        ranked = self.ranked(role)
+        try:
+            await page.wait_for_selector(', '.join(ranked), state='visible', timeout=timeout)
+        except Exception:
+            # nothing of this role on the page (chat never opened, invalid number): no selector's fault
+            return None
+        for sel in ranked:
+            try:
+                handle = await page.query_selector(sel)
+                if handle and await handle.is_visible():
+                    self.record(role, sel, ranked)
+                    return sel
+            except Exception:
+                continue
+        return None
+
+    def summary(self):
+        """Per-role hit/miss counts, for debugging drifting markup."""
+        lines = []
+        for role in self.roles:
+            for sel in self.ranked(role):
+                st = self.stats.get(role, {}).get(sel, {})
+                lines.append(f"{role:8} {st.get('hits', 0):>6} hit {st.get('misses', 0):>6} miss  {sel}")
+        return '\n'.join(lines)
@@ -0,0 +1,206 @@
+"""
+Warm-browser sender daemon and its client.
+
+`python send_whatsapp.py --daemon` keeps one logged-in WhatsApp Web page open
+and serves send jobs on a loopback HTTP port. The port and a random token are
+written to `<profile-dir>/daemon.json`, so any client that knows the profile
+directory can find it:
+
+    from send_daemon import submit, DaemonUnavailable
+    try:
+        reply = submit({'phone': '15551234567', 'message': 'Hi'}, './playwright_userdata')
+    except DaemonUnavailable:
+        ...  # no daemon running: launch send_whatsapp.py as before
+    except DaemonError:
+        ...  # the daemon took the job but never answered: don't send it again
+
+Playwright's sync API is single-threaded, so HTTP handler threads only queue
+jobs; the thread that owns the page runs them one at a time. The HTTP client
+and server modules are imported where they are used: every send_whatsapp.py
+start imports this module, most of them only to find no daemon.json.
+"""
+import json
+import os
+import queue
+import threading
+
+DAEMON_FILE = 'daemon.json'
+DEFAULT_PORT = 8741
+
+
+class DaemonUnavailable(Exception):
+    """No daemon is serving this profile directory; nothing was sent, so it's safe to send another way."""
+
+
+class DaemonError(Exception):
+    """The request reached the daemon but no usable reply came back; the job may already have gone out."""
+
+
+def _info_path(profile_dir):
+    return os.path.join(profile_dir, DAEMON_FILE)
+
+
+def read_daemon_info(profile_dir):
+    try:
+        with open(_info_path(profile_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _request(info, path, payload=None, timeout=5.0):
+    import urllib.error
+    import urllib.request
+
+    url = f"http://127.0.0.1:{info['port']}{path}"
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=data, method='POST' if data is not None else 'GET',
+                                 headers={'Content-Type': 'application/json', 'X-Token': info['token']})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        try:
+            return json.loads(e.read().decode('utf-8'))
+        except Exception:
+            return {'ok': False, 'error': f'daemon HTTP {e.code}'}
+    except urllib.error.URLError as e:
+        # a refused connect is the only failure that proves the request never left;
+        # anything else (timeout, reset, broken pipe) may have happened after it was written
+        if isinstance(e.reason, ConnectionRefusedError):
+            raise DaemonUnavailable(str(e.reason))
+        raise DaemonError(str(e.reason))
+    except ConnectionRefusedError as e:
+        raise DaemonUnavailable(str(e))
+    except (OSError, ValueError) as e:
+        raise DaemonError(str(e) or type(e).__name__)
+
+
+def is_running(profile_dir):
+    info = read_daemon_info(profile_dir)
+    if not info:
+        return False
+    try:
+        return bool(_request(info, '/health', timeout=1.0).get('ok'))
+    except (DaemonUnavailable, DaemonError):
+        return False
+
+
+def submit(job, profile_dir, timeout=600.0):
+    """Send one job to the daemon for `profile_dir` and wait for its reply dict."""
+    info = read_daemon_info(profile_dir)
+    if not info:
+        raise DaemonUnavailable(f'no {DAEMON_FILE} in {profile_dir}')
+    return _request(info, '/send', job, timeout=timeout)
+
+
+def stop(profile_dir):
+    info = read_daemon_info(profile_dir)
+    if not info:
+        raise DaemonUnavailable(f'no {DAEMON_FILE} in {profile_dir}')
+    return _request(info, '/shutdown', {})
+
+
+class _Pending:
+    def __init__(self, job):
+        self.job = job
+        self.result = None
+        self.done = threading.Event()
+
+
+def serve(handle_job, profile_dir, port=DEFAULT_PORT, idle=None, idle_interval=1.0):
+    """
+    Run the daemon until /shutdown or Ctrl+C. `handle_job(job)` is called on
+    this thread for every submitted job and returns a JSON-able dict; `idle()`
+    (optional) is called about every `idle_interval` seconds with no work.
+    """
+    import secrets
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    token = secrets.token_hex(16)
+    jobs = queue.Queue()
+    stopping = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self):
+            if self.headers.get('X-Token') != token:
+                self._reply(403, {'ok': False, 'error': 'bad token'})
+                return False
+            return True
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            if self.path == '/health':
+                self._reply(200, {'ok': True, 'pid': os.getpid(), 'queued': jobs.qsize()})
+            else:
+                self._reply(404, {'ok': False, 'error': 'not found'})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            if self.path == '/shutdown':
+                stopping.set()
+                self._reply(200, {'ok': True})
+                return
+            if self.path != '/send':
+                self._reply(404, {'ok': False, 'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                job = json.loads(self.rfile.read(length).decode('utf-8'))
+            except Exception as e:
+                self._reply(400, {'ok': False, 'error': f'bad job: {e}'})
+                return
+            pending = _Pending(job)
+            jobs.put(pending)
+            pending.done.wait()
+            self._reply(200, pending.result)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    info_path = _info_path(profile_dir)
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump({'port': server.server_address[1], 'token': token, 'pid': os.getpid()}, f)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'Sender daemon listening on 127.0.0.1:{server.server_address[1]} (profile {profile_dir}). Ctrl+C to stop.')
+
+    try:
+        while not stopping.is_set():
+            try:
+                pending = jobs.get(timeout=idle_interval)
+            except queue.Empty:
+                if idle:
+                    idle()
+                continue
+            try:
+                pending.result = handle_job(pending.job)
+            except Exception as e:
+                pending.result = {'ok': False, 'error': str(e)}
+            finally:
+                pending.done.set()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        # fail anything still waiting so clients don't hang
+        while not jobs.empty():
+            pending = jobs.get_nowait()
+            pending.result = {'ok': False, 'error': 'daemon stopped'}
+            pending.done.set()
+        try:
+            os.remove(info_path)
+        except OSError:
+            pass
+        print('Sender daemon stopped.')
@@ -0,0 +1,203 @@
+"""
+Durable SQLite job store for sends, so a crashed or interrupted run can
+resume without double-sending.
+
+Each job has an idempotency key (enqueueing the same key twice is a no-op),
+a state, an attempt count and timestamps:
+
+    pending -> in_flight -> sent
+                         -> failed        (may have gone out, permanent, after max attempts,
+                                           or interrupted mid-send)
+                         -> pending       (failed before the message could go out; next run)
+
+Claims are batched (one transaction hands out many jobs) and results are
+written in small transactions, with the database in WAL mode so readers
+never block the sender.
+
+A failed job only goes back to pending when the caller knows the message
+never left (finish(..., retry=True)), and a run never claims the same job
+twice, so a retry happens in the next run rather than straight away.
+
+Crash recovery: a job is marked `started` right before its send begins.
+Jobs that were claimed but never started go back to pending; jobs that
+were mid-send when the process died are marked failed ('interrupted') rather
+than retried, because the message may already have gone out. Pass
+`retry_interrupted=True` to resend those anyway.
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+
+PENDING, IN_FLIGHT, SENT, FAILED = 'pending', 'in_flight', 'sent', 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY,
+    idem_key    TEXT NOT NULL UNIQUE,
+    campaign    TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    last_error  TEXT,
+    claimed_by  TEXT,
+    started_at  REAL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (campaign, state, id);
+"""
+
+
+def make_key(*parts):
+    """Stable idempotency key from the parts that identify one send."""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(str(part if part is not None else '').encode('utf-8'))
+        h.update(b'\x1f')
+    return h.hexdigest()
+
+
+class SendQueue:
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _tx(self):
+        # BEGIN IMMEDIATE takes the write lock up front so two runners can't claim the same rows
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def enqueue_many(self, campaign, jobs, batch=1000):
+        """
+        Insert (idem_key, payload_dict) pairs; keys that already exist are
+        skipped. Streams `jobs` in batches. Returns the number of new jobs.
+        """
+        added = 0
+        rows = []
+
+        def flush():
+            nonlocal added
+            now = time.time()
+            self._tx()
+            before = self.db.total_changes
+            self.db.executemany(
+                'INSERT OR IGNORE INTO jobs (idem_key, campaign, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(key, campaign, json.dumps(payload, ensure_ascii=False), now, now) for key, payload in rows])
+            added += self.db.total_changes - before
+            self.db.execute('COMMIT')
+            rows.clear()
+
+        for key, payload in jobs:
+            rows.append((key, payload))
+            if len(rows) >= batch:
+                flush()
+        if rows:
+            flush()
+        return added
+
+    def recover(self, campaign, retry_interrupted=False):
+        """Put jobs left in_flight by a dead run back in order. Returns (requeued, interrupted)."""
+        now = time.time()
+        self._tx()
+        requeued = self.db.execute(
+            "UPDATE jobs SET state=?, claimed_by=NULL, updated_at=? "
+            "WHERE campaign=? AND state=? AND started_at IS NULL",
+            (PENDING, now, campaign, IN_FLIGHT)).rowcount
+        if retry_interrupted:
+            interrupted = self.db.execute(
+                "UPDATE jobs SET state=?, claimed_by=NULL, started_at=NULL, updated_at=? "
+                "WHERE campaign=? AND state=?", (PENDING, now, campaign, IN_FLIGHT)).rowcount
+        else:
+            interrupted = self.db.execute(
+                "UPDATE jobs SET state=?, last_error=?, updated_at=? WHERE campaign=? AND state=?",
+                (FAILED, 'interrupted mid-send; may or may not have been delivered', now, campaign,
+                 IN_FLIGHT)).rowcount
+        self.db.execute('COMMIT')
+        return requeued, interrupted
+
+    def claim(self, campaign, limit=50, after_id=0):
+        """Move up to `limit` pending jobs (with ids above `after_id`) to in_flight in one transaction."""
+        now = time.time()
+        self._tx()
+        rows = self.db.execute(
+            'SELECT id, idem_key, payload, attempts FROM jobs WHERE campaign=? AND state=? AND id>? '
+            'ORDER BY id LIMIT ?', (campaign, PENDING, after_id, limit)).fetchall()
+        if rows:
+            self.db.executemany(
+                'UPDATE jobs SET state=?, claimed_by=?, updated_at=? WHERE id=?',
+                [(IN_FLIGHT, self.worker, now, row['id']) for row in rows])
+        self.db.execute('COMMIT')
+        jobs = []
+        for row in rows:
+            job = json.loads(row['payload'])
+            job.update(job_id=row['id'], idem_key=row['idem_key'], attempts=row['attempts'])
+            jobs.append(job)
+        return jobs
+
+    def iter_claimed(self, campaign, batch=50):
+        """
+        Yield jobs one at a time, claiming them `batch` at a time until none
+        are pending. Ids only move forward, so a job put back to pending by
+        finish() during this pass waits for the next run.
+        """
+        last = 0
+        while True:
+            jobs = self.claim(campaign, batch, after_id=last)
+            if not jobs:
+                return
+            last = jobs[-1]['job_id']
+            yield from jobs
+
+    def start(self, job_id):
+        """Record that the send is about to happen (the point of no return for retries)."""
+        self.db.execute('UPDATE jobs SET started_at=?, attempts=attempts+1, updated_at=? WHERE id=?',
+                        (time.time(), time.time(), job_id))
+
+    def finish(self, job_id, ok, error=None, retry=False):
+        """
+        Mark a started job sent or failed. retry=True is only for failures
+        known to have happened before the message could go out; those go back
+        to pending (for the next run) while attempts are left.
+        """
+        now = time.time()
+        if ok:
+            self.db.execute('UPDATE jobs SET state=?, last_error=NULL, updated_at=? WHERE id=?',
+                            (SENT, now, job_id))
+            return SENT
+        row = self.db.execute('SELECT attempts FROM jobs WHERE id=?', (job_id,)).fetchone()
+        state = PENDING if retry and row and row['attempts'] < self.max_attempts else FAILED
+        self.db.execute('UPDATE jobs SET state=?, last_error=?, started_at=NULL, claimed_by=NULL, updated_at=? '
+                        'WHERE id=?', (state, error, now, job_id))
+        return state
+
+    def release(self, job_ids):
+        """Hand claimed-but-unstarted jobs back (e.g. on Ctrl+C)."""
+        self.db.executemany("UPDATE jobs SET state=?, claimed_by=NULL WHERE id=? AND started_at IS NULL AND state=?",
+                            [(PENDING, job_id, IN_FLIGHT) for job_id in job_ids])
+
+    def get_state(self, idem_key):
+        row = self.db.execute('SELECT state FROM jobs WHERE idem_key=?', (idem_key,)).fetchone()
+        return row['state'] if row else None
+
+    def counts(self, campaign):
+        rows = self.db.execute('SELECT state, COUNT(*) AS n FROM jobs WHERE campaign=? GROUP BY state',
+                               (campaign,)).fetchall()
+        return {row['state']: row['n'] for row in rows}
@@ -1,166 +1,1056 @@
-from playwright.sync_api import sync_playwright
 from urllib.parse import quote
 import argparse
 import time
 import os
+import sys
 
+from recipients import iter_recipients, ResultWriter
+from selector_cache import SelectorRegistry
+import send_daemon
+import rate_limiter
+import metrics
+import browser_session
+import media
+import invalid_numbers
 
-def send_by_phone(page, phone, message, dry_run=False):
-    url = f"https://web.whatsapp.com/send?phone={phone}&text={quote(message)}"
-    page.goto(url)
-    # give WhatsApp Web time to load the chat
+WHATSAPP_URL = "https://web.whatsapp.com"
+
+# Candidate selectors, most specific first (WhatsApp markup drifts over time)
+MSG_SELECTORS = [
+    '#main footer div[contenteditable="true"]', # composer lives in the chat footer
+    'div[contenteditable="true"][data-tab]',
+    'div[contenteditable="true"]',
+    'div[role="textbox"]'
+]
+SEARCH_SELECTORS = [
+    'div[contenteditable="true"][data-tab="3"]', # Search box often has data-tab 3
+    'div[title="Search input textbox"]',
+    'div[role="textbox"]'
+]
+SEND_SELECTORS = [
+    'button[aria-label="Send"]',
+    'span[data-icon="send"]'
+]
+ATTACH_SELECTORS = [
+    'button[title="Attach"]',
+    'div[title="Attach"]',
+    'span[data-icon="plus"]',
+    'span[data-icon="attach-menu-plus"]',
+    'span[data-icon="clip"]'
+]
+# caption box of the attachment preview; it showing up means the file was accepted
+CAPTION_SELECTORS = [
+    'div[aria-label="Add a caption"][contenteditable="true"]',
+    'div[contenteditable="true"][aria-placeholder="Add a caption"]',
+    'div[role="textbox"][aria-label*="caption" i]'
+]
+# hidden inputs behind the attach menu: documents take anything, photos/videos only media types
+DOCUMENT_INPUT = 'input[type="file"][accept="*"]'
+MEDIA_INPUT = 'input[type="file"][accept*="image"]'
+# "chat is open" signal: waiting on this first keeps the search box from passing as the composer
+COMPOSER_SELECTOR = '#main footer div[contenteditable="true"], #main div[role="textbox"]'
+LOGGED_IN_SELECTOR = 'div[title="Search input textbox"], div[aria-label="Chat list"], div[role="textbox"]'
+QR_SELECTOR = 'canvas[aria-label="Scan me!"], div[data-ref] canvas'
+# WhatsApp Web keeps one tab per session active; any other tab gets "WhatsApp is open in another window"
+USE_HERE_SELECTOR = 'div[role="button"]:has-text("Use here"), button:has-text("Use here")'
+# what send?phone= shows instead of a chat for a number without WhatsApp ("Phone number shared via url is invalid.");
+# matched by shape, a modal with a button (the "Starting chat" popup has none), since the text is localized
+INVALID_NUMBER_SELECTOR = ('div[data-animate-modal-popup="true"]:has(button, div[role="button"]), '
+                           'div[role="dialog"]:has(button, div[role="button"])')
+OUTGOING_SELECTOR = 'div.message-out'
+# raced after a send?phone= load: whichever shows first says whether the number has WhatsApp
+CHAT_OR_INVALID_SELECTOR = f'{COMPOSER_SELECTOR}, {INVALID_NUMBER_SELECTOR}'
+
+# Learned per-role selector order; main() attaches it to --profile-dir so it persists
+SELECTORS = SelectorRegistry({
+    'search': SEARCH_SELECTORS,
+    'compose': MSG_SELECTORS,
+    'send': SEND_SELECTORS,
+    'attach': ATTACH_SELECTORS,
+    'caption': CAPTION_SELECTORS,
+})
+
+# Upper bounds for the event-driven waits (ms); fast sends return well before these
+CHAT_OPEN_TIMEOUT = 15000
+CONFIRM_TIMEOUT = 10000
+INAPP_NAV_TIMEOUT = 3000
+PREVIEW_TIMEOUT = 10000
+MEDIA_TIMEOUT = 120000  # an upload's single tick only comes once the whole file is up
+
+# How chats were opened this run: reused (already open), inapp (search), goto (full reload)
+NAV_STATS = {'reused': 0, 'inapp': 0, 'goto': 0}
+_open_chat = {}  # id(page) -> phone whose chat is currently open in that page
+# attachments are read, hashed and preprocessed once per run, whatever the number of recipients
+MEDIA = media.MediaCache()
+# numbers that turned out not to be on WhatsApp; main() attaches it to --profile-dir so later runs skip them
+INVALID_NUMBERS = invalid_numbers.InvalidNumberCache()
+_unverified = {}  # id(page) -> profile dir whose login was taken on trust (fresh stamp), until a page load confirms it
+
+# The open chat's title: the first title in the header (a group's member list comes after it)
+CHAT_TITLE_SELECTOR = '#main header span[title], #chat-title'
+CHAT_TITLE_JS = """
+(selector) => {
+    const el = document.querySelector(selector);
+    return el ? (el.getAttribute('title') || el.textContent || '').trim() : null;
+}
+"""
+# True once the open chat is a different one than `before` and its title is exactly the
+# number (formatting aside) or the known contact name - never a title that merely contains them
+CHAT_HEADER_JS = """
+([selector, digits, name, before]) => {
+    const el = document.querySelector(selector);
+    if (!el) return false;
+    const title = (el.getAttribute('title') || el.textContent || '').trim();
+    if (before !== null && title === before) return false;
+    if (/^\\+?[\\d\\s().-]+$/.test(title) && title.replace(/\\D/g, '') === digits) return true;
+    return !!name && title.toLowerCase() === name;
+}
+"""
+
+# How message text gets into the composer:
+#   insert - one input event per line (keyboard.insert_text), Shift+Enter between lines
+#   paste  - one synthetic paste event carrying the whole text
+#   type   - one key event per character (slow; the old behaviour)
+TYPING_MODES = ('insert', 'paste', 'type')
+
+# Select whatever is already in the composer (e.g. a draft prefilled by ?text=) so it gets replaced
+SELECT_ALL_JS = """
+(el) => {
+    el.focus();
+    const range = document.createRange();
+    range.selectNodeContents(el);
+    const sel = window.getSelection();
+    sel.removeAllRanges();
+    sel.addRange(range);
+    return (el.innerText || '').trim().length;
+}
+"""
+
+PASTE_JS = """
+([el, text]) => {
+    el.focus();
+    const data = new DataTransfer();
+    data.setData('text/plain', text);
+    el.dispatchEvent(new ClipboardEvent('paste', {clipboardData: data, bubbles: true, cancelable: true}));
+}
+"""
+
+# Resolves once the newest outgoing bubble reaches `until` (queued < sent < delivered)
+# or the timeout fires. Driven by a MutationObserver, so no polling or fixed sleeps.
+CONFIRM_JS = """
+([selector, before, until, timeoutMs]) => new Promise((resolve) => {
+    const levels = {queued: 1, sent: 2, delivered: 3};
+    const t0 = performance.now();
+    let best = null, queuedMs = null, sentMs = null, obs = null, timer = null;
+    const state = () => {
+        const out = document.querySelectorAll(selector);
+        if (out.length <= before) return null;
+        const icon = out[out.length - 1].querySelector('span[data-icon^="msg-"]');
+        const kind = icon ? icon.getAttribute('data-icon') : '';
+        if (kind.startsWith('msg-dblcheck')) return 'delivered';
+        if (kind === 'msg-check') return 'sent';
+        return 'queued';
+    };
+    const finish = () => {
+        if (obs) obs.disconnect();
+        clearTimeout(timer);
+        resolve({status: best || 'timeout', queued_ms: queuedMs, sent_ms: sentMs});
+    };
+    const check = () => {
+        const s = state();
+        if (!s) return false;
+        const now = performance.now() - t0;
+        if (queuedMs === null) queuedMs = now;
+        if (levels[s] >= levels.sent && sentMs === null) sentMs = now;
+        if (!best || levels[s] > levels[best]) best = s;
+        return levels[best] >= levels[until];
+    };
+    if (check()) return finish();
+    obs = new MutationObserver(() => { if (check()) finish(); });
+    obs.observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['data-icon']});
+    timer = setTimeout(finish, timeoutMs);
+})
+"""
+
+
+class SendResult:
+    """
+    Outcome of one send. Truthy when the message left the composer
+    (queued, sent, delivered or dry_run), so `if send_by_phone(...)` still works.
+    """
+    QUEUED, SENT, DELIVERED = 'queued', 'sent', 'delivered'
+    TIMEOUT, FAILED, DRY_RUN = 'timeout', 'failed', 'dry_run'
+    INVALID = 'invalid'  # the number is not on WhatsApp
+
+    def __init__(self, status, time_to_sent_ms=None, error=None):
+        self.status = status
+        self.time_to_sent_ms = time_to_sent_ms
+        self.error = error
+
+    def __bool__(self):
+        return self.status in (self.QUEUED, self.SENT, self.DELIVERED, self.DRY_RUN)
+
+    @property
+    def retryable(self):
+        """Failed before Enter, so the message can't have gone out; a timeout after Enter may have sent."""
+        return self.status == self.FAILED
+
+    def __repr__(self):
+        return f'SendResult({self.status!r}, time_to_sent_ms={self.time_to_sent_ms!r})'
+
+    def as_dict(self):
+        return {'status': self.status, 'time_to_sent_ms': self.time_to_sent_ms, 'error': self.error}
+
+
+def chat_url(phone, message):
+    return f"{WHATSAPP_URL}/send?phone={phone}&text={quote(message)}"
+
+
+def on_app(page):
+    """Whether `page` is on WhatsApp Web at all (no waiting; a trusted login may not have loaded it yet)."""
+    return page.url.startswith(WHATSAPP_URL)
+
+
+def confirm_args(before, until, timeout):
+    return [OUTGOING_SELECTOR, before, until, timeout]
+
+
+def confirm_result(state, error=None):
+    """SendResult from CONFIRM_JS's final state, or from the error that cut the wait short."""
+    if error is not None:
+        return SendResult(SendResult.TIMEOUT, error=f'confirmation failed: {error}')
+    ms = state.get('sent_ms') if state.get('sent_ms') is not None else state.get('queued_ms')
+    return SendResult(state['status'], time_to_sent_ms=round(ms, 1) if ms is not None else None)
+
+
+def outgoing_count(page):
+    try:
+        return page.locator(OUTGOING_SELECTOR).count()
+    except Exception:
+        return 0
+
+
+def confirm_send(page, before, until='sent', timeout=CONFIRM_TIMEOUT):
+    """
+    Wait for the outgoing bubble that appeared after `before` bubbles, then for
+    its tick state. Returns a SendResult with the measured time-to-sent.
+    """
+    try:
+        return confirm_result(page.evaluate(CONFIRM_JS, confirm_args(before, until, timeout)))
+    except Exception as e:
+        return confirm_result(None, e)
+
+
+def insert_message(page, selector, message, typing='insert'):
+    """Put `message` into the composer, replacing any draft. Newlines never send."""
+    box = page.query_selector(selector)
+    if box is None:
+        raise RuntimeError(f'composer {selector!r} disappeared')
+    box.click()
+    if box.evaluate(SELECT_ALL_JS):
+        page.keyboard.press("Backspace")
+    if typing == 'paste':
+        page.evaluate(PASTE_JS, [box, message])
+        return
+    lines = message.replace('\r\n', '\n').split('\n')
+    for i, line in enumerate(lines):
+        if i:
+            # Shift+Enter is a line break in WhatsApp; plain Enter would send
+            page.keyboard.press("Shift+Enter")
+        if not line:
+            continue
+        if typing == 'type':
+            page.keyboard.type(line)
+        else:
+            page.keyboard.insert_text(line)
+
+
+def _type_and_send(page, selector, message, dry_run, until, confirm_timeout, typing='insert'):
+    with metrics.span('type'):
+        insert_message(page, selector, message, typing)
+    if dry_run:
+        return SendResult(SendResult.DRY_RUN)
+    before = outgoing_count(page)
+    page.keyboard.press("Enter")
+    with metrics.span('confirm'):
+        result = confirm_send(page, before, until=until, timeout=confirm_timeout)
+    if result.time_to_sent_ms is not None:
+        metrics.record('time_to_sent', result.time_to_sent_ms)
+    return result
+
+
+def wait_for_chat_open(page, timeout=CHAT_OPEN_TIMEOUT):
+    # returns as soon as the chat pane's composer shows up
+    try:
+        page.wait_for_selector(COMPOSER_SELECTOR, state='visible', timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+def wait_for_chat_or_invalid(page, timeout=CHAT_OPEN_TIMEOUT):
+    """
+    Race the chat's composer against the invalid-number dialog, so a dead
+    number fails as soon as the dialog shows. Returns 'open', 'invalid', or
+    None when neither appeared within `timeout`.
+    """
+    try:
+        page.wait_for_selector(CHAT_OR_INVALID_SELECTOR, state='visible', timeout=timeout)
+    except Exception:
+        return None
+    try:
+        # any other popup over an open chat is not the invalid-number dialog
+        return 'open' if page.locator(COMPOSER_SELECTOR).count() else 'invalid'
+    except Exception:
+        return 'open'
+
+
+def invalid_result(phone):
+    """Remember `phone` as not on WhatsApp, so later sends skip it, and say so."""
+    INVALID_NUMBERS.add(phone)
+    return SendResult(SendResult.INVALID, error=f'+{phone} is {invalid_numbers.NOT_ON_WHATSAPP}')
+
+
+def invalid_number(page, phone):
+    """Dismiss the invalid-number dialog and remember `phone` so later sends skip it."""
+    try:
+        page.keyboard.press('Escape')
+    except Exception:
+        pass
+    return invalid_result(phone)
+
+
+def cached_invalid(phone):
+    """A SendResult for a number recorded as not on WhatsApp (no navigation needed), else None."""
+    reason = INVALID_NUMBERS.get(phone)
+    if reason is None:
+        return None
+    return SendResult(SendResult.INVALID, error=f'skipped: +{phone} was {reason} (--invalid-ttl)')
+
+
+def chat_match(phone):
+    """CHAT_HEADER_JS's idea of `phone`: its digits, and its lowercased name from contacts.json (or None)."""
+    digits = ''.join(ch for ch in str(phone) if ch.isdigit())
+    name = None
+    try:
+        import contacts_manager
+        name = contacts_manager.get_name_by_phone(digits)
+    except Exception:
+        pass
+    return digits, name.strip().lower() if name else None
+
+
+def chat_is_open(page, phone):
+    """Whether the last navigation on `page` left `phone`'s chat open (the caller still checks the composer)."""
+    return _open_chat.get(id(page)) == phone
+
+
+def record_chat(page, phone, path):
+    """Count how `phone`'s chat was reached and remember it as `page`'s open chat; returns `path`."""
+    NAV_STATS['goto' if path == 'invalid' else path] += 1
+    if path == 'invalid':
+        _open_chat.pop(id(page), None)
+    else:
+        _open_chat[id(page)] = phone
+    return path
+
+
+def forget_chat(page):
+    """A by-name search opened some chat; it is no longer one we know by number."""
+    _open_chat.pop(id(page), None)
+
+
+def open_chat_inapp(page, phone):
+    """
+    Switch chats inside the already loaded app via the search box, without
+    reloading WhatsApp Web. Only accepted when the chat's title is exactly
+    the number (or its name from contacts.json) and the open chat changed, so
+    neither a wrong search hit, a group listing the number, nor the previous
+    chat left open by an empty search ever gets the message.
+    """
+    if not on_app(page):
+        return False
+    search = SELECTORS.resolve(page, 'search', timeout=1000)
+    if not search:
+        return False
+    digits, name = chat_match(phone)
     try:
-        page.wait_for_selector('div[role="textbox"], div[contenteditable="true"]', timeout=15000)
+        if page.evaluate(CHAT_HEADER_JS, [CHAT_TITLE_SELECTOR, digits, name, None]):
+            return True  # already the open chat
+        before = page.evaluate(CHAT_TITLE_JS, CHAT_TITLE_SELECTOR)
+        page.click(search)
+        page.fill(search, digits)
+        page.keyboard.press("Enter")
+        page.wait_for_function(CHAT_HEADER_JS, arg=[CHAT_TITLE_SELECTOR, digits, name, before],
+                               timeout=INAPP_NAV_TIMEOUT)
+        return True
     except Exception:
-        # fallback short wait
-        page.wait_for_timeout(3000)
-
-    # Try to find the editable message box and send the message
-    msg_selectors = [
-        'div[contenteditable="true"][data-tab]',
-        'div[contenteditable="true"]',
-        'div[role="textbox"]'
-    ]
-    
-    # helper to find any of the selectors
-    msg_box = None
-    for sel in msg_selectors:
+        # leave the search box clean for the goto fallback / next send
         try:
-            # reduced timeout for each check
-            page.wait_for_selector(sel, state='visible', timeout=2000)
-            msg_box = sel
-            break
+            page.keyboard.press("Escape")
         except Exception:
-            continue
-            
+            pass
+        return False
+
+
+def open_chat(page, phone, message, nav='auto'):
+    """
+    Make `phone`'s chat the open one. nav='auto' reuses an already open chat,
+    then tries in-app search, and only falls back to a full page.goto.
+    nav='goto' always reloads (the old behaviour). Returns the path used, or
+    'invalid' when the page load showed the invalid-number dialog.
+    """
+    if nav != 'goto':
+        if chat_is_open(page, phone) and wait_for_chat_open(page, timeout=1000):
+            return record_chat(page, phone, 'reused')
+        with metrics.span('inapp_search'):
+            found = open_chat_inapp(page, phone)
+        if found:
+            return record_chat(page, phone, 'inapp')
+    with metrics.span('goto'):
+        page.goto(chat_url(phone, message))
+        opened = wait_for_chat_or_invalid(page)
+    # the dialog only shows in a loaded, logged-in app
+    settle_login(page, opened is not None)
+    return record_chat(page, phone, 'invalid' if opened == 'invalid' else 'goto')
+
+
+@metrics.timed('send_by_phone')
+def send_by_phone(page, phone, message, dry_run=False, until='sent', confirm_timeout=CONFIRM_TIMEOUT, nav='auto',
+                  typing='insert'):
+    cached = cached_invalid(phone)
+    if cached is not None:
+        return cached
+    with metrics.span('open_chat'):
+        if open_chat(page, phone, message, nav=nav) == 'invalid':
+            return invalid_number(page, phone)
+
+    # all compose candidates raced at once, learned winner first
+    with metrics.span('compose_wait'):
+        msg_box = SELECTORS.resolve(page, 'compose', timeout=2000)
     if msg_box:
         try:
-            page.click(msg_box)
-            try:
-                page.focus(msg_box)
-            except Exception:
-                pass
-            
-            # Type message
-            page.keyboard.type(message)
-            
-            if dry_run:
-                return True
-                
-            # press Enter to send
-            page.keyboard.press("Enter")
-            # wait for send tick or just a small buffer
-            page.wait_for_timeout(1000)
-            return True
+            return _type_and_send(page, msg_box, message, dry_run, until, confirm_timeout, typing)
         except Exception as e:
             print(f"Error interacting with message box: {e}")
-            pass
 
     # Try clicking the send button if available (fallback)
     try:
-        btn = page.query_selector('button[aria-label="Send"], span[data-icon="send"]')
+        btn = SELECTORS.resolve(page, 'send', timeout=1000)
         if btn:
-            btn.click()
-            page.wait_for_timeout(1000)
-            return True
+            before = outgoing_count(page)
+            page.click(btn)
+            return confirm_send(page, before, until=until, timeout=confirm_timeout)
     except Exception:
         pass
 
     print("Error: could not send message by phone; UI selectors not found.")
-    return False
+    return SendResult(SendResult.FAILED, error='UI selectors not found')
+
+
+@metrics.timed('send_by_name')
+def send_by_name(page, name, message, dry_run=False, until='sent', confirm_timeout=CONFIRM_TIMEOUT, typing='insert'):
+    if not open_chat_by_name(page, name):
+        return SendResult(SendResult.FAILED, error='search box not found')
+
+    with metrics.span('compose_wait'):
+        ms = SELECTORS.resolve(page, 'compose', timeout=3000)
+    if ms:
+        try:
+            return _type_and_send(page, ms, message, dry_run, until, confirm_timeout, typing)
+        except Exception as e:
+            print(f"Error interacting with message box: {e}")
+    print("Error: message box not found; message not sent.")
+    return SendResult(SendResult.FAILED, error='message box not found')
 
 
-def send_by_name(page, name, message, dry_run=False):
+def open_chat_by_name(page, name):
+    """Search for `name` and wait for its chat to open; False when the search box can't be found."""
+    if not on_app(page):
+        # login was taken on trust and nothing has loaded the app yet
+        settle_login(page, load_app(page))
     # open search, type name, press Enter
-    search_selectors = [
-        'div[contenteditable="true"][data-tab="3"]', # Search box often has data-tab 3
-        'div[title="Search input textbox"]',
-        'div[role="textbox"]'
-    ]
-    
-    found_search = False
-    for sel in search_selectors:
+    with metrics.span('search'):
+        search = SELECTORS.resolve(page, 'search', timeout=2000)
         try:
-            page.wait_for_selector(sel, state='visible', timeout=2000)
-            page.click(sel)
-            # clear it first if needed, but usually it's empty or selects all on click
-            page.fill(sel, name)
-            page.keyboard.press("Enter")
-            found_search = True
-            # Wait for chat to load
-            page.wait_for_timeout(1500) 
-            break
-        except Exception:
-            continue
-            
-    if not found_search:
+            if search:
+                page.click(search)
+                # clear it first if needed, but usually it's empty or selects all on click
+                page.fill(search, name)
+                page.keyboard.press("Enter")
+        except Exception as e:
+            print(f"Error using search box: {e}")
+            search = None
+
+    if not search:
         print("Error: see search box not found; cannot select contact by name.")
         return False
 
-    # wait for message box and send
-    # Reuse the same logic as send_by_phone basically
-    msg_selectors = [
-        'div[contenteditable="true"][data-tab]',
-        'div[contenteditable="true"]',
-        'div[role="textbox"]'
-    ]
-    
-    for ms in msg_selectors:
-        try:
-            page.wait_for_selector(ms, state='visible', timeout=3000)
-            page.click(ms)
-            try:
-                page.focus(ms)
-            except Exception:
-                pass
-            page.keyboard.type(message)
-            if dry_run:
-                return True
-            page.keyboard.press("Enter")
-            page.wait_for_timeout(1000)
-            return True
-        except Exception:
-            continue
-    print("Error: message box not found; message not sent.")
-    return False
+    # Wait for the chat to open (its composer appears) instead of a fixed sleep
+    forget_chat(page)
+    with metrics.span('open_chat'):
+        wait_for_chat_open(page)
+    return True
 
 
-def ensure_logged_in(page, timeout=60):
-    page.goto("https://web.whatsapp.com")
+def attach_file(page, payload):
+    """Hand `payload` (a media.MediaPayload) to the chat's hidden file input, opening the attach menu if needed."""
+    selector = MEDIA_INPUT if payload.kind == 'media' else DOCUMENT_INPUT
+    try:
+        if page.query_selector(selector) is None:
+            # the inputs only exist once the attach menu has been opened
+            button = SELECTORS.resolve(page, 'attach', timeout=2000)
+            if not button:
+                print("Error: attach button not found.")
+                return False
+            page.click(button)
+            page.wait_for_selector(selector, state='attached', timeout=3000)
+        page.set_input_files(selector, files=[payload.as_file()])
+        return True
+    except Exception as e:
+        print(f"Error attaching {payload.name}: {e}")
+        return False
+
+
+@metrics.timed('send_media')
+def send_media(page, payload, phone=None, name=None, caption='', dry_run=False, until='sent',
+               confirm_timeout=MEDIA_TIMEOUT, nav='auto', typing='insert'):
+    """
+    Send an attachment (with an optional caption) to `phone` or `name`. The
+    upload is over when the new bubble's clock turns into a tick; that wait is
+    the same MutationObserver-driven confirm_send as for text, just with a
+    longer bound.
+    """
+    if phone:
+        cached = cached_invalid(phone)
+        if cached is not None:
+            return cached
+        with metrics.span('open_chat'):
+            if open_chat(page, phone, '', nav=nav) == 'invalid':
+                return invalid_number(page, phone)
+    elif not open_chat_by_name(page, name):
+        return SendResult(SendResult.FAILED, error='search box not found')
+    with metrics.span('media.attach'):
+        attached = attach_file(page, payload)
+    if not attached:
+        return SendResult(SendResult.FAILED, error='could not attach file')
+    with metrics.span('media.preview'):
+        caption_box = SELECTORS.resolve(page, 'caption', timeout=PREVIEW_TIMEOUT)
+    if not caption_box:
+        return SendResult(SendResult.FAILED, error='attachment preview did not open')
+    try:
+        if caption:
+            with metrics.span('media.caption'):
+                insert_message(page, caption_box, caption, typing)
+        if dry_run:
+            page.keyboard.press('Escape')
+            return SendResult(SendResult.DRY_RUN)
+        before = outgoing_count(page)
+        page.keyboard.press('Enter')
+    except Exception as e:
+        return SendResult(SendResult.FAILED, error=f'preview: {e}')
+    with metrics.span('media.upload'):
+        result = confirm_send(page, before, until=until, timeout=confirm_timeout)
+    if result.time_to_sent_ms is not None:
+        metrics.record('media.time_to_sent', result.time_to_sent_ms)
+    return result
+
+
+def shows_app(page):
+    """True when `page` already has WhatsApp Web loaded and logged in (no waiting)."""
+    if not on_app(page):
+        return False
+    try:
+        return page.locator(LOGGED_IN_SELECTOR).first.is_visible()
+    except Exception:
+        return False
+
+
+def load_app(page, timeout=60):
+    """Full boot: load WhatsApp Web and wait for the chat list (or for the QR scan)."""
+    with metrics.span('login.goto'):
+        page.goto(WHATSAPP_URL)
     print("If not logged in, please scan the QR code in the opened browser window.")
     try:
         # wait until chat/search UI appears (logged in)
-        page.wait_for_selector('div[title="Search input textbox"], div[aria-label="Chat list"], div[role="textbox"]', timeout=timeout*1000)
+        with metrics.span('login.wait'):
+            page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=timeout*1000)
         return True
     except Exception:
         print("Warning: login not detected after waiting.")
         return False
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Send WhatsApp messages via WhatsApp Web (needs manual QR scan once).")
-    parser.add_argument('--phone', help='Phone number in international format, e.g. 15551234567')
-    parser.add_argument('--name', help='Contact name as it appears in WhatsApp')
-    parser.add_argument('--message', required=True, help='Message text to send')
-    parser.add_argument('--repeat', type=int, default=1, help='How many times to send the message')
-    parser.add_argument('--delay', type=float, default=1.0, help='Seconds between repeated messages')
-    parser.add_argument('--profile-dir', default='./playwright_userdata', help='Directory to store browser profile (keep you logged in)')
-    parser.add_argument('--browser-exe', help='Path to Chrome/Edge executable to use for Playwright (optional)')
-    parser.add_argument('--browser-lnk', help='Path to a .lnk shortcut pointing to the browser to use (optional)')
-    parser.add_argument('--dry-run', action='store_true', help='Open chat and fill message but do not press Enter / send')
-    args = parser.parse_args()
+def trust_login(page, profile_dir, trust_stamp=True):
+    """
+    Take `profile_dir`'s login on trust when its session stamp is fresh
+    (browser_session.session_fresh); `page` stays unverified until its
+    first real page load reaches settle_login().
+    """
+    if profile_dir and trust_stamp and browser_session.session_fresh(profile_dir):
+        _unverified[id(page)] = profile_dir
+        return True
+    return False
 
-    if not args.phone and not args.name:
-        print('Provide either --phone or --name to choose the recipient.')
-        return
 
-    os.makedirs(args.profile_dir, exist_ok=True)
-    # resolve browser executable if provided
-    browser_launch_kwargs = {}
-    browser_exe = None
+def unverified_profile(page):
+    """The profile `page`'s login was taken on trust for (None if verified); it is settled from here on."""
+    return _unverified.pop(id(page), None)
+
+
+def record_login(profile_dir, app_loaded, qr_shown=False):
+    """Stamp the profile once the app loaded; drop the stamp when the page showed the QR instead."""
+    if app_loaded:
+        browser_session.mark_logged_in(profile_dir)
+    elif qr_shown:
+        browser_session.mark_logged_out(profile_dir)
+        print('WhatsApp Web is logged out for this profile; run again to scan the QR code.')
+
+
+def settle_login(page, app_loaded):
+    """After the first real page load of a trusted session: refresh the stamp, or drop it if the QR shows."""
+    profile_dir = unverified_profile(page)
+    if profile_dir:
+        record_login(profile_dir, app_loaded, not app_loaded and bool(page.locator(QR_SELECTOR).count()))
+
+
+@metrics.timed('ensure_logged_in')
+def ensure_logged_in(page, timeout=60, profile_dir=None, trust_stamp=True):
+    """
+    Cheapest check first. A page that already shows the app (warm daemon,
+    attached browser) is used as is. With `profile_dir`, a login verified
+    within browser_session.SESSION_TTL whose keys are still in the profile is
+    trusted without booting the app here - the first send loads it anyway and
+    settle_login() confirms or revokes the stamp. Otherwise load the app and
+    wait for the chat list.
+    """
+    if shows_app(page) or trust_login(page, profile_dir, trust_stamp):
+        return True
+    logged = load_app(page, timeout)
+    if profile_dir:
+        record_login(profile_dir, logged)
+    return logged
+
+
+def row_template(row, default_message):
+    """The compiled template for a row: its own `message` column wins over --message."""
+    text = row.get('message') or default_message
+    if not text:
+        raise ValueError('no message for this row (add a message column or pass --message)')
+    import message_template  # only campaigns fill templates
+
+    return message_template.compile_template(text)
+
+
+def render_row_message(row, default_message):
+    """Fill the row's template (see message_template) from the row's fields."""
+    return row_template(row, default_message).render(row)
+
+
+def row_attachment(row, args):
+    """The file to send with a row: its `attachment` column, else --attach (None for text only)."""
+    return row.get('attachment') or getattr(args, 'attach', None)
+
+
+def row_phone(row, args):
+    """The row's phone as international digits (None when it has none); raises PhoneError for a bad number."""
+    raw = row.get('phone')
+    if not raw:
+        return None
+    import phone_numbers
+
+    try:
+        return phone_numbers.normalize(raw, getattr(args, 'country_code', None))
+    except phone_numbers.PhoneError as e:
+        raise phone_numbers.PhoneError(f'invalid phone {raw!r}: {e}')
+
+
+def row_message(row, args):
+    """The row's rendered text; an attachment may go without a caption."""
+    if not (row.get('message') or args.message) and row_attachment(row, args):
+        return ''
+    return render_row_message(row, args.message)
+
+
+def validate_recipients(args, show=10):
+    """
+    Check every --recipients row against its template before anything is
+    sent (one streaming pass). Prints the first `show` problems and returns
+    how many rows can't be sent.
+    """
+    bad = 0
+    for line_no, row in iter_recipients(args.recipients):
+        try:
+            if row.get('_error'):
+                raise ValueError(row['_error'])
+            if not row.get('phone') and not row.get('name'):
+                raise ValueError('row has neither phone nor name')
+            # a malformed number would otherwise cost a full chat-open timeout mid-run
+            row_phone(row, args)
+            attachment = row_attachment(row, args)
+            if attachment and not os.path.isfile(attachment):
+                raise ValueError(f'attachment not found: {attachment}')
+            if row.get('message') or args.message or not attachment:
+                row_template(row, args.message).check(row)
+        except ValueError as e:
+            bad += 1
+            if bad <= show:
+                print(f'Row {line_no}: {e}')
+    if bad > show:
+        print(f'... and {bad - show} more.')
+    return bad
+
+
+def campaign_results_path(args):
+    return args.results or os.path.splitext(args.recipients)[0] + '.results.jsonl'
+
+
+def iter_campaign_jobs(args, out):
+    """
+    Turn --recipients rows into send jobs. Rows that can't be sent (no
+    recipient, bad JSON, no message) are written to `out` as failures here.
+    """
+    for line_no, row in iter_recipients(args.recipients):
+        phone, name = row.get('phone'), row.get('name')
+        try:
+            if row.get('_error'):
+                raise ValueError(row['_error'])
+            if not phone and not name:
+                raise ValueError('row has neither phone nor name')
+            phone = row_phone(row, args)
+            message = row_message(row, args)
+        except Exception as e:
+            out.write(row=line_no, phone=phone, name=name, status='failed', latency_ms=0.0, error=str(e))
+            print(f'Row {line_no}: failed ({e})')
+            continue
+        job = {'row': line_no, 'phone': phone, 'name': name, 'message': message}
+        attachment = row_attachment(row, args)
+        if attachment:
+            job['attachment'] = attachment
+        yield job
+
+
+def send_options(dry_run=False, until='sent', confirm_timeout=CONFIRM_TIMEOUT, typing='insert', nav='auto',
+                 attach_as='auto', media_timeout=MEDIA_TIMEOUT):
+    """The settings every send takes, timeouts in ms; send_job() and send_whatsapp_async's pool share them."""
+    return {'dry_run': dry_run, 'until': until, 'confirm_timeout': confirm_timeout, 'typing': typing, 'nav': nav,
+            'attach_as': attach_as, 'media_timeout': media_timeout}
+
+
+def args_send_options(args):
+    """send_options() from a run's flags (which give the timeouts in seconds)."""
+    return send_options(dry_run=getattr(args, 'dry_run', False),
+                        until=getattr(args, 'confirm_until', 'sent'),
+                        confirm_timeout=int(getattr(args, 'confirm_timeout', CONFIRM_TIMEOUT / 1000) * 1000),
+                        typing=getattr(args, 'typing', 'insert'),
+                        nav=getattr(args, 'nav', 'auto'),
+                        attach_as=getattr(args, 'attach_as', 'auto'),
+                        media_timeout=int(getattr(args, 'media_timeout', MEDIA_TIMEOUT / 1000) * 1000))
+
+
+def job_kind(job):
+    return 'media' if job.get('attachment') else 'text'
+
+
+def send_name(job):
+    """The send a job needs, which is also its metrics timer: 'send_media', 'send_by_phone' or 'send_by_name'."""
+    if job.get('attachment'):
+        return 'send_media'
+    return 'send_by_phone' if job.get('phone') else 'send_by_name'
+
+
+def job_send(job, opts):
+    """send_name(job) and its keyword arguments under `opts` (for send_media the caller adds `payload`)."""
+    send = send_name(job)
+    common = dict(dry_run=opts['dry_run'], until=opts['until'], confirm_timeout=opts['confirm_timeout'],
+                  typing=opts['typing'])
+    if send == 'send_media':
+        common['confirm_timeout'] = opts['media_timeout']
+        return send, dict(common, phone=job.get('phone'), name=job.get('name'), caption=job['message'],
+                          nav=opts['nav'])
+    if send == 'send_by_phone':
+        return send, dict(common, phone=job['phone'], message=job['message'], nav=opts['nav'])
+    return send, dict(common, name=job['name'], message=job['message'])
+
+
+def attachment_failed(e):
+    return SendResult(SendResult.FAILED, error=f'attachment: {e}')
+
+
+def finish_job(job, result):
+    if result and job.get('phone'):
+        # it joined WhatsApp since it was recorded (a run with --invalid-ttl 0 tried it again)
+        INVALID_NUMBERS.discard(job['phone'])
+    return result
+
+
+def job_record(job, result, latency_ms):
+    """One results-file line for a finished job."""
+    return {'row': job.get('row'), 'phone': job.get('phone'), 'name': job.get('name'), 'kind': job_kind(job),
+            'status': result.status, 'latency_ms': round(latency_ms, 1), 'time_to_sent_ms': result.time_to_sent_ms,
+            'error': result.error}
+
+
+def send_job(page, job, args):
+    """Send one {'phone'|'name', 'message', optional 'attachment'} job with the run's confirmation settings."""
+    opts = args_send_options(args)
+    send, kwargs = job_send(job, opts)
+    if send == 'send_media':
+        try:
+            kwargs['payload'] = MEDIA.get(job['attachment'], opts['attach_as'])
+        except OSError as e:
+            return attachment_failed(e)
+    sender = {'send_media': send_media, 'send_by_phone': send_by_phone, 'send_by_name': send_by_name}[send]
+    return finish_job(job, sender(page, **kwargs))
+
+
+def queue_campaign_id(args):
+    """--campaign, or a stable id derived from what is being sent."""
+    from send_queue import make_key
+
+    if getattr(args, 'campaign', None):
+        return args.campaign
+    # the attachment only joins the key when there is one, so text-only ids stay as they were
+    extra = [args.attach] if getattr(args, 'attach', None) else []
+    if args.recipients:
+        return 'file:' + make_key(os.path.abspath(args.recipients), args.message, *extra)[:16]
+    return 'single:' + make_key(args.phone, args.name, args.message, args.repeat, *extra)[:16]
+
+
+def claim_from_queue(queue, campaign, jobs, args):
+    """
+    Record `jobs` in the durable queue (already-known idempotency keys are
+    skipped), recover anything a crashed run left in flight, then hand back
+    only the jobs still pending, claimed in batches.
+    """
+    from send_queue import make_key
+
+    def key(job):
+        extra = [job['attachment']] if job.get('attachment') else []
+        return make_key(campaign, job.get('row'), job.get('phone'), job.get('name'), job['message'], *extra)
+
+    added = queue.enqueue_many(campaign, ((key(job), job) for job in jobs))
+    requeued, interrupted = queue.recover(campaign, retry_interrupted=getattr(args, 'retry_interrupted', False))
+    counts = queue.counts(campaign)
+    print(f"Queue {campaign}: {added} new, {requeued} resumed, {interrupted} interrupted mid-send; "
+          f"{counts.get('sent', 0)} already sent, {counts.get('pending', 0)} to send.")
+    return queue.iter_claimed(campaign)
+
+
+def rate_state_path(args):
+    return rate_limiter.state_path(args.profile_dir)
+
+
+def with_receipt_ids(jobs, args):
+    """
+    Give each job the id its receipts are logged under: the queue's job id,
+    else campaign id + a per-run nonce + row (so a rerun of the same file
+    doesn't log under the ids of the last run).
+    """
+    campaign = queue_campaign_id(args)
+    run = os.urandom(4).hex()
+    for job in jobs:
+        job['receipt_id'] = f"job:{job['job_id']}" if 'job_id' in job else f"{campaign}:{run}:{job['row']}"
+        yield job
+
+
+def tracks_receipt(tracker, job, result, dry_run):
+    """Whether `job`'s send left a message worth tracking receipts for."""
+    return bool(tracker and result and not dry_run and job.get('receipt_id'))
+
+
+def track_receipt(tracker, page, job, result, args):
+    if tracks_receipt(tracker, job, result, getattr(args, 'dry_run', False)):
+        tracker.track(page, job['receipt_id'], job.get('phone') or job.get('name'))
+
+
+def run_campaign(page, args, queue=None, scheduler=None, tracker=None):
+    """Send to every row of --recipients using the already logged-in page."""
+    results_path = campaign_results_path(args)
+    pace = scheduler or rate_limiter.from_args(args)
+    sent = failed = 0
+    with ResultWriter(results_path) as out:
+        jobs = iter_campaign_jobs(args, out)
+        if queue:
+            jobs = claim_from_queue(queue, queue_campaign_id(args), jobs, args)
+        if tracker:
+            jobs = with_receipt_ids(jobs, args)
+        for job in jobs:
+            with metrics.span('pace'):
+                pace.next_slot(args.profile_dir, job['phone'] or job['name'])
+            if queue:
+                queue.start(job['job_id'])
+            start = time.perf_counter()
+            try:
+                result = send_job(page, job, args)
+            except Exception as e:
+                result = SendResult(SendResult.FAILED, error=str(e))
+            if queue:
+                queue.finish(job['job_id'], bool(result), result.error, retry=result.retryable)
+            latency_ms = (time.perf_counter() - start) * 1000
+            track_receipt(tracker, page, job, result, args)
+            out.write(**job_record(job, result, latency_ms))
+            if not result:
+                failed += 1
+                print(f"Row {job['row']}: {result.status} ({result.error})")
+            else:
+                sent += 1
+    print(f'Campaign finished: {sent} ok, {failed} failed. Results: {results_path}')
+    return failed == 0
+
+
+def run_campaign_pool(args, launch_kwargs, queue=None, scheduler=None, headless=False, tracker=None):
+    """--pages N: same campaign through send_whatsapp_async's tab pool (see its caveat on real WhatsApp Web)."""
+    from send_whatsapp_async import send_many
+
+    results_path = campaign_results_path(args)
+    counts = {'ok': 0, 'failed': 0}
+    with ResultWriter(results_path) as out:
+        jobs = iter_campaign_jobs(args, out)
+        if queue:
+            # the pool marks a job started when a tab begins its send, not when it is buffered
+            jobs = claim_from_queue(queue, queue_campaign_id(args), jobs, args)
+        if tracker:
+            jobs = with_receipt_ids(jobs, args)
+
+        def on_result(result):
+            status = SendResult(result['status'])
+            ok = bool(status)
+            counts['ok' if ok else 'failed'] += 1
+            job_id = result.pop('job_id', None)
+            if queue and job_id is not None:
+                queue.finish(job_id, ok, result.get('error'), retry=status.retryable)
+            out.write(**result)
+
+        try:
+            send_many(jobs, profile_dir=args.profile_dir, pages=args.pages,
+                      scheduler=scheduler or rate_limiter.from_args(args), account=args.profile_dir,
+                      on_result=on_result, on_start=queue.start if queue else None, headless=headless,
+                      setup_context=browser_session.block_heavy_resources_async if args.lean else None,
+                      tracker=tracker, receipts_wait=args.receipts_wait, receipts_until=args.receipts_until,
+                      trust_stamp=not args.verify_login, **args_send_options(args), **launch_kwargs)
+        except RuntimeError as e:
+            # raised from SenderPool.start, before any job was claimed
+            print('Could not start the tab pool:', e)
+            return False
+    print(f"Campaign finished: {counts['ok']} ok, {counts['failed']} failed. Results: {results_path}")
+    return counts['failed'] == 0
+
+
+def run_single(page, args, queue=None, scheduler=None, tracker=None):
+    """Send --message --repeat times; returns the SendResult of every attempt."""
+    pace = scheduler or rate_limiter.from_args(args)
+    results = []
+    jobs = [{'row': i + 1, 'phone': args.phone, 'name': args.name, 'message': args.message or ''}
+            for i in range(args.repeat)]
+    if getattr(args, 'attach', None):
+        for job in jobs:
+            job['attachment'] = args.attach
+    if queue:
+        # only the repeats a previous (crashed) run didn't get to
+        jobs = list(claim_from_queue(queue, queue_campaign_id(args), jobs, args))
+    if tracker:
+        jobs = with_receipt_ids(jobs, args)
+    for job in jobs:
+        with metrics.span('pace'):
+            pace.next_slot(args.profile_dir, args.phone or args.name)
+        if queue:
+            queue.start(job['job_id'])
+        success = send_job(page, job, args)
+        if queue:
+            queue.finish(job['job_id'], bool(success), success.error, retry=success.retryable)
+        track_receipt(tracker, page, job, success, args)
+        results.append(success)
+        if not success:
+            print('Failed to send message on attempt', job['row'], f'({success.status})')
+        else:
+            print(f"Message sent (attempt {job['row']}): {success.status}, time-to-sent {success.time_to_sent_ms} ms")
+    return results
+
+
+def report_invalid_numbers():
+    stats = INVALID_NUMBERS.stats
+    if stats['added'] or stats['skipped']:
+        print(f"Numbers not on WhatsApp: {stats['added']} found this run, {stats['skipped']} skipped from "
+              f"{INVALID_NUMBERS.path or 'the cache'} without opening a chat.")
+
+
+def report_receipts(tracker, args):
+    counts = tracker.counts()
+    summary = ', '.join(f'{counts[s]} {s}' for s in ('pending', 'sent', 'delivered', 'read', 'failed') if s in counts)
+    print(f"Receipts: {summary or 'nothing tracked'} ({tracker.stats['events']} events). Log: {args.receipts}")
+    tracker.close()
+
+
+# Per-job fields a daemon client may set; everything else comes from the daemon's own flags
+DAEMON_JOB_FIELDS = ('phone', 'name', 'message', 'repeat', 'delay', 'dry_run',
+                     'confirm_until', 'confirm_timeout', 'typing', 'nav', 'attach', 'attach_as')
+
+
+def serve_daemon(context, page, args, scheduler=None, tracker=None):
+    """--daemon: keep this logged-in page warm and run jobs from send_daemon clients."""
+    state = {'page': page}
+    # one pacing budget for the account across every client's jobs
+    scheduler = scheduler or rate_limiter.from_args(args)
+
+    import phone_numbers
+
+    def handle_job(job):
+        if not (job.get('message') or job.get('attach')) or not (job.get('phone') or job.get('name')):
+            return {'ok': False, 'error': 'job needs message or attach, and phone or name'}
+        if job.get('phone'):
+            try:
+                job['phone'] = phone_numbers.normalize(job['phone'], args.country_code)
+            except phone_numbers.PhoneError as e:
+                return {'ok': False, 'error': f'invalid phone: {e}'}
+        if state['page'].is_closed():
+            state['page'] = context.new_page()
+            ensure_logged_in(state['page'])
+        job_args = argparse.Namespace(**vars(args))
+        job_args.phone = job_args.name = None
+        for field in DAEMON_JOB_FIELDS:
+            if job.get(field) is not None:
+                setattr(job_args, field, job[field])
+        results = run_single(state['page'], job_args, scheduler=scheduler, tracker=tracker)
+        SELECTORS.save()
+        scheduler.save_state(rate_state_path(args))
+        metrics.METRICS.export()
+        return {'ok': all(results), 'results': [r.as_dict() for r in results]}
+
+    def idle():
+        # receipts only reach Python while Playwright is servicing the page
+        if not state['page'].is_closed():
+            state['page'].wait_for_timeout(1)
+
+    send_daemon.serve(handle_job, args.profile_dir, port=args.daemon_port, idle=idle if tracker else None)
+    return state['page']
+
+
+def submit_to_daemon(args):
+    """
+    Hand a single send to a running daemon for --profile-dir.
+    Returns the exit status, or None when no daemon is running (the only
+    case where sending it here instead can't double-send).
+    """
+    job = {field: getattr(args, field, None) for field in DAEMON_JOB_FIELDS}
+    try:
+        reply = send_daemon.submit(job, args.profile_dir)
+    except send_daemon.DaemonUnavailable:
+        return None
+    except send_daemon.DaemonError as e:
+        print(f'Daemon took the job but did not answer ({e}); it may have been sent, so not sending it again.')
+        return 1
+    for i, result in enumerate(reply.get('results', []), 1):
+        print(f"Attempt {i}: {result['status']}" + (f" ({result['error']})" if result.get('error') else ''))
+    if not reply.get('ok') and reply.get('error'):
+        print('Daemon error:', reply['error'])
+    return 0 if reply.get('ok') else 1
+
+
+def resolve_browser_exe(args):
     if getattr(args, 'browser_exe', None):
-        browser_exe = args.browser_exe
-    elif getattr(args, 'browser_lnk', None):
+        return args.browser_exe
+    if getattr(args, 'browser_lnk', None):
         # try to resolve .lnk to its target on Windows
         lnk = args.browser_lnk
         try:
@@ -169,44 +1059,219 @@ def main():
             shortcut = shell.CreateShortcut(lnk)
             target = shortcut.Targetpath
             if target:
-                browser_exe = target
+                return target
         except Exception as e:
             print('Warning: could not resolve .lnk file to executable:', e)
+    return None
 
+
+def main():
+    import phone_numbers
+
+    parser = argparse.ArgumentParser(description="Send WhatsApp messages via WhatsApp Web (needs manual QR scan once).")
+    parser.add_argument('--phone', help='Phone number in international format, e.g. 15551234567')
+    parser.add_argument('--name', help='Contact name as it appears in WhatsApp')
+    parser.add_argument('--recipients', help='CSV/JSONL file of recipients (phone/name, optional message and template fields) for a bulk campaign')
+    parser.add_argument('--results', help='JSONL file for per-row campaign results (default: <recipients>.results.jsonl)')
+    parser.add_argument('--skip-invalid', action='store_true', help='With --recipients: send the valid rows and record the others as failed, instead of refusing to start')
+    parser.add_argument('--pages', type=int, default=1, help='With --recipients: number of browser tabs sending concurrently. WhatsApp Web serves one active tab per session, so on the real site anything above 1 stops with an error; use multi_account.py for parallel sends')
+    parser.add_argument('--message', help='Message text to send; with --recipients a template filled per row: {field}, {field|filter}, {field?default} (see message_template.py)')
+    parser.add_argument('--attach', metavar='FILE', help='File to send (as the caption, --message is optional); with --recipients sent to every row without its own attachment column')
+    parser.add_argument('--attach-as', choices=media.KINDS, default='auto', help='auto: photos/videos as media, anything else as a document; voice: convert to an Ogg/Opus voice message (needs ffmpeg)')
+    parser.add_argument('--media-timeout', type=float, default=MEDIA_TIMEOUT / 1000, help='Upper bound in seconds for an attachment upload to be confirmed')
+    phone_numbers.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=1, help='How many times to send the message')
+    parser.add_argument('--delay', type=float, default=1.0, help='Minimum seconds between sends (the default pacing when --rate-per-minute is not given)')
+    parser.add_argument('--profile-dir', default='./playwright_userdata', help='Directory to store browser profile (keep you logged in)')
+    parser.add_argument('--browser-exe', help='Path to Chrome/Edge executable to use for Playwright (optional)')
+    parser.add_argument('--browser-lnk', help='Path to a .lnk shortcut pointing to the browser to use (optional)')
+    parser.add_argument('--dry-run', action='store_true', help='Open chat and fill message but do not press Enter / send')
+    parser.add_argument('--confirm-until', choices=['queued', 'sent', 'delivered'], default='sent', help='How far to wait after pressing Enter: bubble shown, single tick, or double tick')
+    parser.add_argument('--typing', choices=TYPING_MODES, default='insert', help='How text enters the composer: insert (per line), paste (one synthetic paste) or type (per key, slow)')
+    parser.add_argument('--nav', choices=['auto', 'goto'], default='auto', help='auto: switch chats inside the loaded app (search), falling back to a full page load; goto: always reload')
+    parser.add_argument('--confirm-timeout', type=float, default=CONFIRM_TIMEOUT / 1000, help='Upper bound in seconds for the send confirmation wait')
+    parser.add_argument('--daemon', action='store_true', help='Keep a logged-in browser warm and serve send jobs on a loopback port')
+    parser.add_argument('--daemon-port', type=int, default=send_daemon.DEFAULT_PORT, help='Port for --daemon (0 picks a free one)')
+    parser.add_argument('--no-daemon', action='store_true', help='Launch a browser even if a daemon is running for --profile-dir')
+    parser.add_argument('--cdp', metavar='URL', help='Attach to a running Chromium started with --remote-debugging-port (e.g. http://127.0.0.1:9222) instead of launching one')
+    parser.add_argument('--verify-login', action='store_true', help='Always load WhatsApp Web to check the login instead of trusting a recent check')
+    parser.add_argument('--lean', action='store_true', help='Send-only browser: headless once the profile is logged in, no images/media/fonts/avatars, background features off')
+    invalid_numbers.add_arguments(parser)
+    parser.add_argument('--receipts', metavar='LOG', help='Append delivery/read receipts of the sent messages to this log (see receipts.py); a --daemon logs every job it sends')
+    parser.add_argument('--receipts-wait', type=float, default=30.0, help='With --receipts: after the last send, wait up to this many seconds for outstanding receipts')
+    parser.add_argument('--receipts-until', choices=['sent', 'delivered', 'read'], default='delivered', help='With --receipts: stop waiting once every message got this far')
+    rate_limiter.add_arguments(parser)
+    parser.add_argument('--queue', help='SQLite job store; records every send so an interrupted run resumes without double sends')
+    parser.add_argument('--campaign', help='With --queue: id grouping these jobs (default: derived from recipients/message)')
+    parser.add_argument('--retry-interrupted', action='store_true', help='With --queue: resend jobs a crashed run left mid-send (may double send)')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.from_args(args)
+
+    if args.daemon:
+        args.recipients = None
+    elif not args.phone and not args.name and not args.recipients:
+        print('Provide either --phone, --name or --recipients to choose the recipient.')
+        return 1
+    elif not args.recipients and not args.message and not args.attach:
+        print('--message or --attach is required unless --recipients rows carry their own message.')
+        return 1
+    if args.phone:
+        try:
+            args.phone = phone_numbers.normalize(args.phone, args.country_code)
+        except phone_numbers.PhoneError as e:
+            print(f'--phone: {e}')
+            return 1
+    if args.attach:
+        if not os.path.isfile(args.attach):
+            print('--attach: file not found:', args.attach)
+            return 1
+        # a daemon resolves paths from its own working directory
+        args.attach = os.path.abspath(args.attach)
+
+    # fail before the browser starts, not halfway through the campaign
+    if args.recipients and not args.skip_invalid:
+        try:
+            bad = validate_recipients(args)
+        except (OSError, ValueError) as e:
+            print('Could not read --recipients:', e)
+            return 1
+        if bad:
+            print(f'{bad} row(s) cannot be sent; fix them or pass --skip-invalid.')
+            return 1
+
+    # a warm daemon for this profile answers in well under a second; no browser launch needed
+    # (not with --queue or --receipts: the daemon would not record this send where this run asked)
+    if not args.daemon and not args.recipients and not args.no_daemon and not args.queue and not args.receipts:
+        status = submit_to_daemon(args)
+        if status is not None:
+            return status
+
+    os.makedirs(args.profile_dir, exist_ok=True)
+    SELECTORS.attach(args.profile_dir)
+    invalid_numbers.attach_from_args(INVALID_NUMBERS, args)
+    browser_launch_kwargs = {}
+    browser_exe = resolve_browser_exe(args)
     if browser_exe:
         browser_launch_kwargs['executable_path'] = browser_exe
+    headless = False
+    if args.lean:
+        browser_launch_kwargs = browser_session.lean_launch_kwargs(args.profile_dir, browser_launch_kwargs)
+        headless = browser_launch_kwargs.pop('headless')
+        if not headless:
+            print('--lean: this profile has not logged in yet; showing the browser once for the QR scan.')
+
+    scheduler = rate_limiter.from_args(args).load_state(rate_state_path(args))
+    queue = None
+    if args.queue and not args.daemon:
+        if args.dry_run:
+            print('Note: --dry-run does not record anything in --queue.')
+        else:
+            from send_queue import SendQueue
+            queue = SendQueue(args.queue)
+    tracker = None
+    if args.receipts:
+        if args.dry_run:
+            print('Note: --dry-run sends nothing, so --receipts records nothing.')
+        else:
+            import receipts
+            tracker = receipts.ReceiptTracker(args.receipts)
+
+    if args.recipients and args.pages > 1:
+        try:
+            ok = run_campaign_pool(args, browser_launch_kwargs, queue=queue, scheduler=scheduler, headless=headless,
+                                   tracker=tracker)
+        finally:
+            SELECTORS.save()
+            INVALID_NUMBERS.save()
+            scheduler.save_state(rate_state_path(args))
+            if queue:
+                queue.close()
+            if tracker:
+                report_receipts(tracker, args)
+            metrics.report(args)
+            report_invalid_numbers()
+        return 0 if ok else 1
+
+    # Playwright is the slowest import by far; --help, argument errors and daemon hand-offs never need it
+    from playwright.sync_api import sync_playwright
 
+    # one browser + one logged-in page for the whole run, single send or campaign
     with sync_playwright() as pw:
-        browser = pw.chromium.launch_persistent_context(user_data_dir=args.profile_dir, headless=False, **browser_launch_kwargs)
-        page = browser.new_page()
-        logged = ensure_logged_in(page)
-        if not logged:
+        attached = None
+        if args.cdp:
+            try:
+                with metrics.span('attach'):
+                    attached = browser_session.attach_over_cdp(pw, args.cdp)
+            except Exception as e:
+                print(f'Could not attach to {args.cdp} ({e}); launching a browser instead.')
+        if attached:
+            _, browser, page = attached
+            headless = False
+        else:
+            with metrics.span('launch'):
+                browser = pw.chromium.launch_persistent_context(user_data_dir=args.profile_dir, headless=headless, **browser_launch_kwargs)
+            page = browser.new_page()
+        blocked = browser_session.block_heavy_resources(browser) if args.lean else None
+        # a daemon warms up front so its first job doesn't pay the app boot
+        # (an attached browser has its own profile, so this profile's stamp says nothing about it)
+        logged = ensure_logged_in(page, profile_dir=None if attached else args.profile_dir,
+                                  trust_stamp=not (args.verify_login or args.daemon))
+        if not logged and headless:
+            # nobody can scan a QR code in a hidden window
+            browser_session.mark_logged_out(args.profile_dir)
+            print('Session is no longer logged in; run once without --lean to scan the QR code again.')
+            browser.close()
+            return 1
+        elif not logged:
             input('Press Enter after you finish scanning the QR and WhatsApp Web is loaded...')
+            if not attached:
+                browser_session.mark_logged_in(args.profile_dir)
 
-        success = False
-        for i in range(args.repeat):
-            if args.phone:
-                success = send_by_phone(page, args.phone, args.message, dry_run=getattr(args, 'dry_run', False))
-            else:
-                success = send_by_name(page, args.name, args.message, dry_run=getattr(args, 'dry_run', False))
-            if not success:
-                print('Failed to send message on attempt', i+1)
+        ok = True
+        try:
+            if tracker:
+                tracker.attach(browser)
+            if args.daemon:
+                page = serve_daemon(browser, page, args, scheduler=scheduler, tracker=tracker)
+            elif args.recipients:
+                ok = run_campaign(page, args, queue=queue, scheduler=scheduler, tracker=tracker)
             else:
-                print('Message sent (attempt', i+1, ')')
-            if i < args.repeat - 1:
-                time.sleep(args.delay)
+                ok = all(run_single(page, args, queue=queue, scheduler=scheduler, tracker=tracker))
+            if tracker:
+                tracker.drain(page, timeout=args.receipts_wait, until=args.receipts_until)
+        finally:
+            SELECTORS.save()
+            INVALID_NUMBERS.save()
+            scheduler.save_state(rate_state_path(args))
+            if queue:
+                queue.close()
+            if tracker:
+                report_receipts(tracker, args)
+            metrics.report(args)
+        report_invalid_numbers()
+        print('Chat navigation: {reused} reused, {inapp} in-app, {goto} full page loads'.format(**NAV_STATS))
+        if MEDIA.stats['loads']:
+            print('Attachments: {loads} file(s) read ({bytes_read} bytes), {hits} sends from cache'.format(**MEDIA.stats))
+        if blocked:
+            print('Lean mode: {blocked} requests blocked, {allowed} allowed'.format(**blocked))
 
         print('Done. Keep the --profile-dir to stay logged in for future runs.')
-        # give user a moment to verify before closing
-        try:
-            page.wait_for_timeout(1000)
-        except Exception:
-            pass
+        if attached:
+            # leave the user's browser and its WhatsApp tab as they were; leaving the block disconnects
+            return 0 if ok else 1
+        if not headless:
+            # give user a moment to verify before closing
+            try:
+                page.wait_for_timeout(1000)
+            except Exception:
+                pass
         try:
             browser.close()
         except Exception:
             pass
+    return 0 if ok else 1
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
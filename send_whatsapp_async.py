@@ -0,0 +1,531 @@
+"""
+Concurrent WhatsApp Web sender built on playwright.async_api.
+
+A SenderPool keeps N pages (tabs) open in one persistent context. Recipients
+go through a bounded asyncio.Queue; each page works one job at a time, so a
+slow chat only holds up its own tab, and a global semaphore caps how many
+sends are in flight across all tabs.
+
+    results = send_many(jobs, profile_dir='./playwright_userdata', pages=4)
+
+`jobs` is any iterable of dicts with `phone` or `name` and `message`, plus
+an optional `attachment` path (read once per run through send_whatsapp.MEDIA).
+
+Caveat: WhatsApp Web keeps only one tab per session active. Every other tab
+shows "WhatsApp is open in another window - Use here", so against the real
+site only `pages=1` works and start() raises for more. Extra tabs only pay
+off against pages without that rule (the fake page `benchmark.py pool` drives).
+Parallel sends need separate logged-in profiles; see multi_account.py.
+"""
+import asyncio
+import time
+
+import metrics
+from send_whatsapp import (
+    CHAT_HEADER_JS,
+    CHAT_OPEN_TIMEOUT,
+    CHAT_OR_INVALID_SELECTOR,
+    CHAT_TITLE_JS,
+    CHAT_TITLE_SELECTOR,
+    COMPOSER_SELECTOR,
+    CONFIRM_JS,
+    CONFIRM_TIMEOUT,
+    DOCUMENT_INPUT,
+    INAPP_NAV_TIMEOUT,
+    LOGGED_IN_SELECTOR,
+    MEDIA,
+    MEDIA_INPUT,
+    MEDIA_TIMEOUT,
+    OUTGOING_SELECTOR,
+    PASTE_JS,
+    PREVIEW_TIMEOUT,
+    QR_SELECTOR,
+    SELECTORS,
+    SELECT_ALL_JS,
+    WHATSAPP_URL,
+    USE_HERE_SELECTOR,
+    SendResult,
+    attachment_failed,
+    cached_invalid,
+    chat_is_open,
+    chat_match,
+    chat_url,
+    confirm_args,
+    confirm_result,
+    finish_job,
+    forget_chat,
+    invalid_result,
+    job_record,
+    job_send,
+    send_name,
+    on_app,
+    record_chat,
+    record_login,
+    send_options,
+    tracks_receipt,
+    trust_login,
+    unverified_profile,
+)
+
+# Async twins of send_whatsapp's page steps. Everything that doesn't touch the
+# page (options, dispatch, result classification, navigation and login
+# bookkeeping) is send_whatsapp's own helper, so both paths share it.
+
+
+async def _wait_for_chat_open(page, timeout=CHAT_OPEN_TIMEOUT):
+    try:
+        await page.wait_for_selector(COMPOSER_SELECTOR, state='visible', timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+async def _wait_for_chat_or_invalid(page, timeout=CHAT_OPEN_TIMEOUT):
+    """Async twin of send_whatsapp.wait_for_chat_or_invalid."""
+    try:
+        await page.wait_for_selector(CHAT_OR_INVALID_SELECTOR, state='visible', timeout=timeout)
+    except Exception:
+        return None
+    try:
+        return 'open' if await page.locator(COMPOSER_SELECTOR).count() else 'invalid'
+    except Exception:
+        return 'open'
+
+
+async def _invalid_number(page, phone):
+    try:
+        await page.keyboard.press('Escape')
+    except Exception:
+        pass
+    return invalid_result(phone)
+
+
+async def _outgoing_count(page):
+    try:
+        return await page.locator(OUTGOING_SELECTOR).count()
+    except Exception:
+        return 0
+
+
+async def _confirm_send(page, before, until, timeout):
+    try:
+        return confirm_result(await page.evaluate(CONFIRM_JS, confirm_args(before, until, timeout)))
+    except Exception as e:
+        return confirm_result(None, e)
+
+
+async def async_insert_message(page, selector, message, typing='insert'):
+    """Async twin of send_whatsapp.insert_message."""
+    box = await page.query_selector(selector)
+    if box is None:
+        raise RuntimeError(f'composer {selector!r} disappeared')
+    await box.click()
+    if await box.evaluate(SELECT_ALL_JS):
+        await page.keyboard.press('Backspace')
+    if typing == 'paste':
+        await page.evaluate(PASTE_JS, [box, message])
+        return
+    for i, line in enumerate(message.replace('\r\n', '\n').split('\n')):
+        if i:
+            await page.keyboard.press('Shift+Enter')
+        if not line:
+            continue
+        if typing == 'type':
+            await page.keyboard.type(line)
+        else:
+            await page.keyboard.insert_text(line)
+
+
+async def _type_and_send(page, selector, message, dry_run, until, confirm_timeout, typing='insert'):
+    with metrics.span('type'):
+        await async_insert_message(page, selector, message, typing)
+    if dry_run:
+        return SendResult(SendResult.DRY_RUN)
+    before = await _outgoing_count(page)
+    await page.keyboard.press('Enter')
+    with metrics.span('confirm'):
+        result = await _confirm_send(page, before, until, confirm_timeout)
+    if result.time_to_sent_ms is not None:
+        metrics.record('time_to_sent', result.time_to_sent_ms)
+    return result
+
+
+async def async_shows_app(page):
+    """Async twin of send_whatsapp.shows_app."""
+    if not on_app(page):
+        return False
+    try:
+        return await page.locator(LOGGED_IN_SELECTOR).first.is_visible()
+    except Exception:
+        return False
+
+
+async def async_load_app(page, timeout=60):
+    """Async twin of send_whatsapp.load_app."""
+    with metrics.span('login.goto'):
+        await page.goto(WHATSAPP_URL)
+    try:
+        with metrics.span('login.wait'):
+            await page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=timeout * 1000)
+        return True
+    except Exception:
+        print("Warning: login not detected after waiting.")
+        return False
+
+
+async def async_settle_login(page, app_loaded):
+    """Async twin of send_whatsapp.settle_login."""
+    profile_dir = unverified_profile(page)
+    if profile_dir:
+        record_login(profile_dir, app_loaded, not app_loaded and bool(await page.locator(QR_SELECTOR).count()))
+
+
+async def async_ensure_logged_in(page, timeout=60, profile_dir=None, trust_stamp=True):
+    """Async twin of send_whatsapp.ensure_logged_in (same session stamp, settled on the first page load)."""
+    if await async_shows_app(page) or trust_login(page, profile_dir, trust_stamp):
+        return True
+    logged = await async_load_app(page, timeout)
+    if profile_dir:
+        record_login(profile_dir, logged)
+    return logged
+
+
+async def _open_chat_inapp(page, phone):
+    if not on_app(page):
+        return False
+    search = await SELECTORS.resolve_async(page, 'search', timeout=1000)
+    if not search:
+        return False
+    digits, name = chat_match(phone)
+    try:
+        if await page.evaluate(CHAT_HEADER_JS, [CHAT_TITLE_SELECTOR, digits, name, None]):
+            return True
+        before = await page.evaluate(CHAT_TITLE_JS, CHAT_TITLE_SELECTOR)
+        await page.click(search)
+        await page.fill(search, digits)
+        await page.keyboard.press('Enter')
+        await page.wait_for_function(CHAT_HEADER_JS, arg=[CHAT_TITLE_SELECTOR, digits, name, before],
+                                     timeout=INAPP_NAV_TIMEOUT)
+        return True
+    except Exception:
+        try:
+            await page.keyboard.press('Escape')
+        except Exception:
+            pass
+        return False
+
+
+async def async_open_chat(page, phone, message, nav='auto'):
+    """Async twin of send_whatsapp.open_chat (reuse, then in-app search, then goto)."""
+    if nav != 'goto':
+        if chat_is_open(page, phone) and await _wait_for_chat_open(page, timeout=1000):
+            return record_chat(page, phone, 'reused')
+        with metrics.span('inapp_search'):
+            found = await _open_chat_inapp(page, phone)
+        if found:
+            return record_chat(page, phone, 'inapp')
+    with metrics.span('goto'):
+        await page.goto(chat_url(phone, message))
+        opened = await _wait_for_chat_or_invalid(page)
+    await async_settle_login(page, opened is not None)
+    return record_chat(page, phone, 'invalid' if opened == 'invalid' else 'goto')
+
+
+async def async_send_by_phone(page, phone, message, dry_run=False, until='sent', confirm_timeout=CONFIRM_TIMEOUT,
+                              nav='auto', typing='insert'):
+    """Async twin of send_whatsapp.send_by_phone."""
+    cached = cached_invalid(phone)
+    if cached is not None:
+        return cached
+    with metrics.span('open_chat'):
+        if await async_open_chat(page, phone, message, nav=nav) == 'invalid':
+            return await _invalid_number(page, phone)
+    with metrics.span('compose_wait'):
+        msg_box = await SELECTORS.resolve_async(page, 'compose', timeout=2000)
+    if msg_box:
+        try:
+            return await _type_and_send(page, msg_box, message, dry_run, until, confirm_timeout, typing)
+        except Exception as e:
+            print(f"Error interacting with message box: {e}")
+    try:
+        btn = await SELECTORS.resolve_async(page, 'send', timeout=1000)
+        if btn:
+            before = await _outgoing_count(page)
+            await page.click(btn)
+            return await _confirm_send(page, before, until, confirm_timeout)
+    except Exception:
+        pass
+    print("Error: could not send message by phone; UI selectors not found.")
+    return SendResult(SendResult.FAILED, error='UI selectors not found')
+
+
+async def async_send_by_name(page, name, message, dry_run=False, until='sent', confirm_timeout=CONFIRM_TIMEOUT,
+                             typing='insert'):
+    """Async twin of send_whatsapp.send_by_name."""
+    if not await async_open_chat_by_name(page, name):
+        return SendResult(SendResult.FAILED, error='search box not found')
+    with metrics.span('compose_wait'):
+        msg_box = await SELECTORS.resolve_async(page, 'compose', timeout=3000)
+    if msg_box:
+        try:
+            return await _type_and_send(page, msg_box, message, dry_run, until, confirm_timeout, typing)
+        except Exception as e:
+            print(f"Error interacting with message box: {e}")
+    print("Error: message box not found; message not sent.")
+    return SendResult(SendResult.FAILED, error='message box not found')
+
+
+async def async_open_chat_by_name(page, name):
+    """Async twin of send_whatsapp.open_chat_by_name."""
+    if not on_app(page):
+        # login was taken on trust and nothing has loaded the app yet
+        await async_settle_login(page, await async_load_app(page))
+    with metrics.span('search'):
+        search = await SELECTORS.resolve_async(page, 'search', timeout=2000)
+        try:
+            if search:
+                await page.click(search)
+                await page.fill(search, name)
+                await page.keyboard.press('Enter')
+        except Exception as e:
+            print(f"Error using search box: {e}")
+            search = None
+    if not search:
+        print("Error: search box not found; cannot select contact by name.")
+        return False
+    forget_chat(page)
+    with metrics.span('open_chat'):
+        await _wait_for_chat_open(page)
+    return True
+
+
+async def _attach_file(page, payload):
+    selector = MEDIA_INPUT if payload.kind == 'media' else DOCUMENT_INPUT
+    try:
+        if await page.query_selector(selector) is None:
+            button = await SELECTORS.resolve_async(page, 'attach', timeout=2000)
+            if not button:
+                print("Error: attach button not found.")
+                return False
+            await page.click(button)
+            await page.wait_for_selector(selector, state='attached', timeout=3000)
+        await page.set_input_files(selector, files=[payload.as_file()])
+        return True
+    except Exception as e:
+        print(f"Error attaching {payload.name}: {e}")
+        return False
+
+
+async def async_send_media(page, payload, phone=None, name=None, caption='', dry_run=False, until='sent',
+                           confirm_timeout=MEDIA_TIMEOUT, nav='auto', typing='insert'):
+    """Async twin of send_whatsapp.send_media."""
+    if phone:
+        cached = cached_invalid(phone)
+        if cached is not None:
+            return cached
+        with metrics.span('open_chat'):
+            if await async_open_chat(page, phone, '', nav=nav) == 'invalid':
+                return await _invalid_number(page, phone)
+    elif not await async_open_chat_by_name(page, name):
+        return SendResult(SendResult.FAILED, error='search box not found')
+    with metrics.span('media.attach'):
+        attached = await _attach_file(page, payload)
+    if not attached:
+        return SendResult(SendResult.FAILED, error='could not attach file')
+    with metrics.span('media.preview'):
+        caption_box = await SELECTORS.resolve_async(page, 'caption', timeout=PREVIEW_TIMEOUT)
+    if not caption_box:
+        return SendResult(SendResult.FAILED, error='attachment preview did not open')
+    try:
+        if caption:
+            with metrics.span('media.caption'):
+                await async_insert_message(page, caption_box, caption, typing)
+        if dry_run:
+            await page.keyboard.press('Escape')
+            return SendResult(SendResult.DRY_RUN)
+        before = await _outgoing_count(page)
+        await page.keyboard.press('Enter')
+    except Exception as e:
+        return SendResult(SendResult.FAILED, error=f'preview: {e}')
+    with metrics.span('media.upload'):
+        result = await _confirm_send(page, before, until, confirm_timeout)
+    if result.time_to_sent_ms is not None:
+        metrics.record('media.time_to_sent', result.time_to_sent_ms)
+    return result
+
+
+SENDERS = {'send_media': async_send_media, 'send_by_phone': async_send_by_phone, 'send_by_name': async_send_by_name}
+
+
+async def async_send_job(page, job, opts):
+    """Async twin of send_whatsapp.send_job, taking send_options() rather than the run's flags."""
+    send, kwargs = job_send(job, opts)
+    if send == 'send_media':
+        try:
+            # the first tab to need a file reads it off the loop; the rest hit the cache
+            kwargs['payload'] = await asyncio.to_thread(MEDIA.get, job['attachment'], opts['attach_as'])
+        except OSError as e:
+            return attachment_failed(e)
+    return finish_job(job, await SENDERS[send](page, **kwargs))
+
+
+async def _tab_is_active(page, timeout):
+    """Whether an extra tab reached the app rather than WhatsApp's one-active-tab screen."""
+    try:
+        # the English "Use here" text fails fast; in other languages the app never showing up does it
+        await page.wait_for_selector(f'{LOGGED_IN_SELECTOR}, {USE_HERE_SELECTOR}', timeout=timeout * 1000)
+        return await page.locator(USE_HERE_SELECTOR).count() == 0
+    except Exception:
+        return False
+
+
+class SenderPool:
+    """
+    Bounded pool of pages in one browser context.
+
+    `size` tabs each run a worker; `max_in_flight` (default: size) is the
+    global cap on concurrent sends; `queue_size` bounds how far producers can
+    run ahead of the workers.
+    """
+
+    def __init__(self, context, size=4, max_in_flight=None, queue_size=None, dry_run=False,
+                 until='sent', confirm_timeout=CONFIRM_TIMEOUT, typing='insert', nav='auto',
+                 scheduler=None, account='default', attach_as='auto', media_timeout=MEDIA_TIMEOUT, tracker=None,
+                 on_start=None):
+        self.context = context
+        self.size = max(1, size)
+        self.opts = send_options(dry_run=dry_run, until=until, confirm_timeout=confirm_timeout, typing=typing,
+                                 nav=nav, attach_as=attach_as, media_timeout=media_timeout)
+        self.scheduler = scheduler
+        self.account = account
+        self.tracker = tracker
+        self.on_start = on_start  # called with a job's job_id right before its send begins
+        self._queue = asyncio.Queue(maxsize=queue_size or self.size * 2)
+        self._limit = asyncio.Semaphore(max_in_flight or self.size)
+        self._pages = []
+        self._workers = []
+
+    async def start(self, login_timeout=60, profile_dir=None, trust_stamp=True):
+        # the first tab checks login (or trusts the profile's stamp); the others share the profile's session
+        first = self.context.pages[0] if self.context.pages else await self.context.new_page()
+        self._pages.append(first)
+        if not await async_ensure_logged_in(first, timeout=login_timeout, profile_dir=profile_dir,
+                                            trust_stamp=trust_stamp):
+            raise RuntimeError('WhatsApp Web login not detected; scan the QR once without the pool.')
+        while len(self._pages) < self.size:
+            page = await self.context.new_page()
+            self._pages.append(page)
+            await page.goto(WHATSAPP_URL)
+            if not await _tab_is_active(page, login_timeout):
+                raise RuntimeError(f'tab {len(self._pages)} did not get the app: WhatsApp Web keeps one tab per '
+                                   'session active and shows "Use here" in the others. Use --pages 1, or '
+                                   'multi_account.py with one profile per account.')
+        self._workers = [asyncio.create_task(self._worker(page)) for page in self._pages]
+
+    async def submit(self, job):
+        """Queue one job; waits while the queue is full. Returns a future for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, future))
+        return future
+
+    async def _worker(self, page):
+        while True:
+            job, future = await self._queue.get()
+            try:
+                if self.scheduler:
+                    # book the slot first so every tab shares one account budget
+                    wait = self.scheduler.reserve(self.account, job.get('phone') or job.get('name'))
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                async with self._limit:
+                    result = await self._send(page, job)
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, page, job):
+        if self.on_start and job.get('job_id') is not None:
+            self.on_start(job['job_id'])
+        start = time.perf_counter()
+        try:
+            result = await async_send_job(page, job, self.opts)
+        except Exception as e:
+            result = SendResult(SendResult.FAILED, error=str(e))
+        latency_ms = (time.perf_counter() - start) * 1000
+        if tracks_receipt(self.tracker, job, result, self.opts['dry_run']):
+            await self.tracker.track_async(page, job['receipt_id'], job.get('phone') or job.get('name'))
+        # coroutines can't use the metrics.timed decorator; record the twin's total here
+        metrics.record(send_name(job), latency_ms, error=not result)
+        return dict(job_record(job, result, latency_ms), job_id=job.get('job_id'))
+
+    async def run(self, jobs):
+        """Feed `jobs` through the pool; yields results roughly in completion order."""
+        pending = set()
+        for job in jobs:
+            pending.add(await self.submit(job))
+            # harvest finished results as we go so memory stays bounded
+            done = {f for f in pending if f.done()}
+            for f in done:
+                yield f.result()
+            pending -= done
+        for f in asyncio.as_completed(pending):
+            yield await f
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+async def send_many_async(jobs, profile_dir='./playwright_userdata', pages=4, max_in_flight=None,
+                          dry_run=False, until='sent', confirm_timeout=CONFIRM_TIMEOUT, typing='insert',
+                          nav='auto', scheduler=None, account='default', headless=False, on_result=None, on_start=None,
+                          setup_context=None, attach_as='auto', media_timeout=MEDIA_TIMEOUT, tracker=None,
+                          receipts_wait=30.0, receipts_until='delivered', trust_stamp=True, **launch_kwargs):
+    """
+    Launch a persistent context, push every job through a SenderPool, return
+    the results. With a receipts.ReceiptTracker, sent messages are tracked and
+    the context stays open up to `receipts_wait` seconds for late receipts.
+    Login follows send_whatsapp.ensure_logged_in: a fresh session stamp on
+    `profile_dir` is trusted unless `trust_stamp` is False.
+    """
+    from playwright.async_api import async_playwright
+
+    results = []
+    async with async_playwright() as pw:
+        context = await pw.chromium.launch_persistent_context(
+            user_data_dir=profile_dir, headless=headless, **launch_kwargs)
+        try:
+            if setup_context:
+                await setup_context(context)
+            if tracker:
+                await tracker.attach_async(context)
+            pool = SenderPool(context, size=pages, max_in_flight=max_in_flight, dry_run=dry_run,
+                              until=until, confirm_timeout=confirm_timeout, typing=typing, nav=nav,
+                              scheduler=scheduler, account=account, attach_as=attach_as,
+                              media_timeout=media_timeout, tracker=tracker, on_start=on_start)
+            await pool.start(profile_dir=profile_dir, trust_stamp=trust_stamp)
+            try:
+                async for result in pool.run(jobs):
+                    if on_result:
+                        on_result(result)
+                    else:
+                        results.append(result)
+                if tracker:
+                    await tracker.drain_async(timeout=receipts_wait, until=receipts_until)
+            finally:
+                await pool.close()
+        finally:
+            await context.close()
+    return results
+
+
+def send_many(jobs, **kwargs):
+    """Blocking wrapper around send_many_async for sync callers."""
+    return asyncio.run(send_many_async(jobs, **kwargs))
@@ -3,11 +3,17 @@
 Wrapper: if WhatsApp Desktop installed, try to open desktop app via URL scheme; otherwise use web automation.
 """
 import argparse
+import json
 import os
 import subprocess
 import sys
 from urllib.parse import quote
 
+import rate_limiter
+import metrics
+import phone_numbers
+import invalid_numbers
+
 
 def open_desktop_whatsapp(phone, message):
     # Attempt to open via whatsapp:// URL scheme (may open Desktop app if registered)
@@ -23,7 +29,30 @@ def open_desktop_whatsapp(phone, message):
         return False
 
 
+def run_via_daemon(args):
+    """Submit to a warm send_whatsapp.py --daemon if one serves this profile; None if not."""
+    import send_daemon
+    try:
+        reply = send_daemon.submit({
+            'phone': args.phone, 'name': args.name, 'message': args.message,
+            'repeat': args.repeat, 'delay': args.delay, 'dry_run': bool(getattr(args, 'dry_run', False)),
+        }, args.profile_dir)
+    except send_daemon.DaemonUnavailable:
+        return None
+    except send_daemon.DaemonError as e:
+        print(f'Daemon took the job but did not answer ({e}); it may have been sent, so not sending it again.')
+        return 1
+    if not reply.get('ok'):
+        print('Daemon send failed:', reply.get('error') or reply.get('results'))
+        return 1
+    print('Message sent via warm web daemon.')
+    return 0
+
+
 def run_web_script(args):
+    status = run_via_daemon(args)
+    if status is not None:
+        return status
     script = os.path.join(os.path.dirname(__file__), 'send_whatsapp.py')
     if not os.path.isfile(script):
         print('Web automation script not found:', script)
@@ -44,49 +73,110 @@ def run_web_script(args):
         cmd += ['--browser-lnk', args.browser_lnk]
     if getattr(args, 'dry_run', None):
         cmd += ['--dry-run']
+    if getattr(args, 'lean', False):
+        cmd += ['--lean']
+    cmd += invalid_numbers.cli_flags(args)
+    cmd += rate_limiter.cli_flags(args)
+    cmd += metrics.cli_flags(args)
     proc = subprocess.run(cmd)
     return proc.returncode
 
 
-def main():
-    parser = argparse.ArgumentParser(description='Auto-choose Desktop or Web WhatsApp automation.')
-    parser.add_argument('--phone', help='Phone number in international format, e.g. 15551234567')
-    parser.add_argument('--name', help='Contact name as it appears in WhatsApp')
-    parser.add_argument('--message', required=False, help='Message text to send (if omitted, you will be prompted)')
-    parser.add_argument('--repeat', type=int, default=1, help='How many times to send the message')
-    parser.add_argument('--delay', type=float, default=1.0, help='Seconds between repeated messages')
-    parser.add_argument('--profile-dir', dest='profile_dir', default='./playwright_userdata', help='Profile dir (web)')
-    parser.add_argument('--browser-lnk', dest='browser_lnk', help='Path to a .lnk shortcut pointing to the browser to use (optional)')
-    parser.add_argument('--dry-run', dest='dry_run', action='store_true', help='Open chat and fill message but do not send')
-    args = parser.parse_args()
+SENT_STATUSES = ('queued', 'sent', 'delivered', 'dry_run')
 
-    # Prompt for contact if missing
-    if not args.name and not args.phone:
-        try:
-            contact = input('Enter contact name or phone (digits for phone): ').strip()
-        except Exception:
-            print('No contact provided; aborting.')
-            return 1
-        if not contact:
-            print('Empty contact; aborting.')
-            return 1
-        digits = ''.join(ch for ch in contact if ch.isdigit())
-        if digits and len(digits) >= 6:
-            args.phone = digits
-        else:
-            args.name = contact
 
-    # Prompt for message if missing
-    if not args.message:
+def send_batch(jobs, args):
+    """
+    Send a batch of scheduled {'id', 'phone'|'name', 'message'} jobs back-to-back
+    in one warm browser: through the daemon if one is running, otherwise one
+    send_whatsapp.py --recipients run. Returns the ids that went out.
+    """
+    import send_daemon
+    if send_daemon.is_running(args.profile_dir):
+        sent = []
+        for job in jobs:
+            try:
+                reply = send_daemon.submit(dict(job, dry_run=bool(args.dry_run)), args.profile_dir)
+            except send_daemon.DaemonUnavailable as e:
+                print(f'Daemon went away mid-batch: {e}')
+                break
+            except send_daemon.DaemonError as e:
+                # not counted as sent, but not retried here either: it may have gone out
+                print(f"Scheduled job {job['id']}: daemon did not answer ({e}); it may have been sent")
+                continue
+            if reply.get('ok'):
+                sent.append(job['id'])
+            else:
+                print(f"Scheduled job {job['id']} failed: {reply.get('error') or reply.get('results')}")
+        return sent
+
+    import tempfile
+
+    script = os.path.join(os.path.dirname(__file__), 'send_whatsapp.py')
+    with tempfile.TemporaryDirectory(prefix='wa_schedule_') as tmpdir:
+        batch_path = os.path.join(tmpdir, 'batch.jsonl')
+        results_path = os.path.join(tmpdir, 'batch.results.jsonl')
+        rows = {}
+        with open(batch_path, 'w', encoding='utf-8') as f:
+            for line_no, job in enumerate(jobs, 1):
+                rows[line_no] = job['id']
+                # the campaign runner fills {placeholders}; scheduled text is sent as written
+                text = job['message'].replace('{', '{{').replace('}', '}}')
+                f.write(json.dumps({'phone': job.get('phone'), 'name': job.get('name'), 'message': text},
+                                   ensure_ascii=False) + '\n')
+        # one unsendable row must not hold back the rest; it comes back as a failed result
+        cmd = [sys.executable, script, '--recipients', batch_path, '--results', results_path,
+               '--profile-dir', args.profile_dir, '--no-daemon', '--skip-invalid']
+        if args.browser_lnk:
+            cmd += ['--browser-lnk', args.browser_lnk]
+        if args.dry_run:
+            cmd += ['--dry-run']
+        if args.lean:
+            cmd += ['--lean']
+        if args.country_code:
+            cmd += ['--country-code', args.country_code]
+        cmd += invalid_numbers.cli_flags(args)
+        cmd += rate_limiter.cli_flags(args)
+        cmd += metrics.cli_flags(args)
+        subprocess.run(cmd)
+        sent = []
         try:
-            args.message = input('Enter message to send: ').strip()
-        except Exception:
-            print('No message provided; aborting.')
-            return 1
-        if not args.message:
-            print('Empty message; aborting.')
-            return 1
+            with open(results_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    result = json.loads(line)
+                    if result.get('row') not in rows:
+                        continue
+                    if result.get('status') in SENT_STATUSES:
+                        sent.append(rows[result['row']])
+                    else:
+                        print(f"Scheduled job {rows[result['row']]} failed: {result.get('error') or result.get('status')}")
+        except (OSError, ValueError) as e:
+            print('Could not read batch results:', e)
+    return sent
+
 
+def run_schedule(args):
+    """Serve --schedule until Ctrl+C (or until no jobs are left)."""
+    import message_scheduler
+    try:
+        jobs = message_scheduler.load_jobs(args.schedule)
+    except (OSError, ValueError) as e:
+        print('Could not load schedule:', e)
+        return 2
+    sched = message_scheduler.Scheduler(
+        jobs, lambda batch: send_batch(batch, args), state_path=args.schedule + '.state.json',
+        catch_up=args.catch_up, max_late=args.max_late, batch_window=args.batch_window)
+    print(f'Loaded {len(jobs)} scheduled job(s); {len(sched)} pending. Ctrl+C to stop.')
+    try:
+        sched.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sched.save_state()
+    return 0
+
+
+def dispatch(args):
     # Try to use Desktop automation first
     use_desktop = True
     try:
@@ -102,6 +192,13 @@ def main():
     except Exception as e:
         print('Error in smart lookup:', e)
         smart_phone = None
+    if smart_phone:
+        try:
+            smart_phone = phone_numbers.normalize(smart_phone, args.country_code)
+        except phone_numbers.PhoneError as e:
+            # a bad entry would only open a dead chat; search by name instead
+            print(f'Ignoring contacts.json number for "{args.name}" ({e}).')
+            smart_phone = None
 
     if use_desktop:
         # 1. Smart Send Mode (if contact found in json)
@@ -121,7 +218,12 @@ def main():
         
         # 2. Search Mode (Fallback or default if name not in json)
         print('Attempting to send via WhatsApp Desktop (Search Mode)...')
-        ok = send_message_desktop(args.name or args.phone, args.message, args.repeat, args.delay)
+        scheduler = rate_limiter.from_args(args).load_state(rate_limiter.state_path(args.profile_dir))
+        try:
+            ok = send_message_desktop(args.name or args.phone, args.message, args.repeat, args.delay,
+                                      scheduler=scheduler, account=args.profile_dir)
+        finally:
+            scheduler.save_state(rate_limiter.state_path(args.profile_dir))
         if ok:
              print('Message sent via WhatsApp Desktop.')
              return 0
@@ -130,5 +232,95 @@ def main():
     return run_web_script(args)
 
 
+def main():
+    parser = argparse.ArgumentParser(description='Auto-choose Desktop or Web WhatsApp automation.')
+    parser.add_argument('--phone', help='Phone number in international format, e.g. 15551234567')
+    parser.add_argument('--name', help='Contact name as it appears in WhatsApp')
+    parser.add_argument('--message', required=False, help='Message text to send (if omitted, you will be prompted)')
+    parser.add_argument('--repeat', type=int, default=1, help='How many times to send the message')
+    parser.add_argument('--delay', type=float, default=1.0, help='Seconds between repeated messages')
+    parser.add_argument('--profile-dir', dest='profile_dir', default='./playwright_userdata', help='Profile dir (web)')
+    parser.add_argument('--browser-lnk', dest='browser_lnk', help='Path to a .lnk shortcut pointing to the browser to use (optional)')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true', help='Open chat and fill message but do not send')
+    parser.add_argument('--lean', action='store_true', help='Web fallback: headless, resource-blocking browser once the profile is logged in')
+    phone_numbers.add_arguments(parser)
+    invalid_numbers.add_arguments(parser)
+    rate_limiter.add_arguments(parser)
+    parser.add_argument('--queue', help='SQLite job store shared with send_whatsapp.py; skips sends already recorded as done')
+    parser.add_argument('--campaign', default='', help='With --queue: id that makes a repeated identical send a new job')
+    metrics.add_arguments(parser)
+    parser.add_argument('--schedule', help='JSONL/CSV of timed ("at") and recurring ("cron") jobs to serve until Ctrl+C')
+    parser.add_argument('--catch-up', dest='catch_up', choices=('skip', 'once', 'all'), default='once',
+                        help='With --schedule: what to do with sends missed while not running (default once)')
+    parser.add_argument('--max-late', dest='max_late', type=float, default=3600.0,
+                        help='With --schedule: never catch up a send more than this many seconds late')
+    parser.add_argument('--batch-window', dest='batch_window', type=float, default=0.0,
+                        help='With --schedule: also send jobs due within this many seconds with the current batch (i.e. early)')
+    args = parser.parse_args()
+    metrics.from_args(args)
+
+    if args.schedule:
+        return run_schedule(args)
+
+    # Prompt for contact if missing
+    if not args.name and not args.phone:
+        try:
+            contact = input('Enter contact name or phone (digits for phone): ').strip()
+        except Exception:
+            print('No contact provided; aborting.')
+            return 1
+        if not contact:
+            print('Empty contact; aborting.')
+            return 1
+        if phone_numbers.looks_like_phone(contact):
+            args.phone = contact
+        else:
+            args.name = contact
+    if args.phone:
+        try:
+            args.phone = phone_numbers.normalize(args.phone, args.country_code)
+        except phone_numbers.PhoneError as e:
+            print(f'Invalid phone number ({e}); aborting.')
+            return 1
+
+    # Prompt for message if missing
+    if not args.message:
+        try:
+            args.message = input('Enter message to send: ').strip()
+        except Exception:
+            print('No message provided; aborting.')
+            return 1
+        if not args.message:
+            print('Empty message; aborting.')
+            return 1
+
+    if not args.queue or args.dry_run:
+        status = dispatch(args)
+        metrics.report(args)
+        return status
+
+    # Durable mode: one job per (contact, message, campaign); a rerun after a crash skips what went out
+    from send_queue import SendQueue, SENT, make_key
+    with SendQueue(args.queue) as queue:
+        campaign = 'auto:' + make_key(args.phone, args.name, args.message, args.repeat, args.campaign)[:16]
+        queue.enqueue_many(campaign, [(campaign, {'phone': args.phone, 'name': args.name, 'message': args.message})])
+        queue.recover(campaign)
+        if queue.get_state(campaign) == SENT:
+            print('Already sent (recorded in --queue); use a different --campaign to send again.')
+            return 0
+        jobs = queue.claim(campaign, 1)
+        if not jobs:
+            print('Not sending: this job previously failed or was interrupted mid-send (see --queue).')
+            return 1
+        queue.start(jobs[0]['job_id'])
+        status = 1
+        try:
+            status = dispatch(args)
+        finally:
+            queue.finish(jobs[0]['job_id'], status == 0, None if status == 0 else f'exit status {status}')
+            metrics.report(args)
+        return status
+
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -13,18 +13,25 @@ import sys
 import os
 import subprocess
 
-try:
-    from pywinauto import Desktop, Application
-    from pywinauto.keyboard import send_keys
-    import pyperclip
-except Exception:
-    print('pywinauto or pyperclip not installed; please run: pip install pywinauto pyperclip')
-    # If pyperclip falls back, we might error out, so best to ensure it's there
-    pass
+import rate_limiter
+import metrics
+
+
+def _desktop():
+    """pywinauto's Desktop, imported on first use: it is slow to load and --help or the web fallback never need it."""
+    try:
+        from pywinauto import Desktop
+        return Desktop
+    except Exception:
+        print('pywinauto not installed; please run: pip install pywinauto')
+        return None
 
-# ... (omitted unaltered parts if any) ... but for now I will replace the imports and the function
 
 def find_or_start_whatsapp():
+    Desktop = _desktop()
+    if Desktop is None:
+        return None
+
     # Helper to find window
     def get_window():
         try:
@@ -66,18 +73,21 @@ def find_or_start_whatsapp():
     return None
 
 
-def send_message_desktop(name, message, repeat=1, delay=1.0):
-    win = find_or_start_whatsapp()
+@metrics.timed('send_message_desktop')
+def send_message_desktop(name, message, repeat=1, delay=1.0, scheduler=None, account='desktop'):
+    with metrics.span('desktop.find_window'):
+        win = find_or_start_whatsapp()
     if not win:
         print('Could not find or start WhatsApp Desktop.')
         return False
 
     # Focus window (type_keys will also ensure focus)
     try:
-        if win.is_minimized():
-            win.restore()
-        win.set_focus()
-        time.sleep(0.5) # ensure focus settles
+        with metrics.span('desktop.focus'):
+            if win.is_minimized():
+                win.restore()
+            win.set_focus()
+            time.sleep(0.5) # ensure focus settles
     except Exception:
         pass
 
@@ -85,18 +95,19 @@ def send_message_desktop(name, message, repeat=1, delay=1.0):
 
     # Open New Chat (Ctrl+N), type name, select
     try:
-        # Ctrl+N -> Reduced pause
-        win.type_keys('^n', pause=1.0)
-        
-        # Type name -> Faster pause
-        win.type_keys(name, with_spaces=True, pause=1.0)
-        
-        # Press Enter to select the contact -> Reduced wait for chat load
-        # We assume 2.5s is enough for most modern PCs/connections. 
-        # If it fails, we might need a retry, but speed is priority now.
-        win.type_keys('{ENTER}', pause=2.0) 
-        time.sleep(1.0) # wait for chat load
-        
+        with metrics.span('desktop.open_chat'):
+            # Ctrl+N -> Reduced pause
+            win.type_keys('^n', pause=1.0)
+
+            # Type name -> Faster pause
+            win.type_keys(name, with_spaces=True, pause=1.0)
+
+            # Press Enter to select the contact -> Reduced wait for chat load
+            # We assume 2.5s is enough for most modern PCs/connections.
+            # If it fails, we might need a retry, but speed is priority now.
+            win.type_keys('{ENTER}', pause=2.0)
+            time.sleep(1.0) # wait for chat load
+
     except Exception as e:
         print('Failed to navigate/select contact:', e)
         return False
@@ -108,12 +119,18 @@ def send_message_desktop(name, message, repeat=1, delay=1.0):
         # Check if message already typed (focus might be lost)
         # We just type blindly now
         
+        # pacing comes from the shared scheduler instead of a fixed pause after Enter
+        pace = scheduler or rate_limiter.RateScheduler(per_minute=60.0 / delay if delay else None)
         for i in range(repeat):
+             with metrics.span('pace'):
+                 pace.next_slot(account, name)
              # Type message safely (no clipboard interference preferred)
-             win.type_keys(message, with_spaces=True, pause=0.01) # fast typing
-             
-             win.type_keys('{ENTER}', pause=delay)
-             
+             with metrics.span('desktop.type'):
+                 win.type_keys(message, with_spaces=True, pause=0.01) # fast typing
+
+             with metrics.span('desktop.enter'):
+                 win.type_keys('{ENTER}', pause=0.05)
+
         return True
     except Exception as e:
         print('Failed to send message:', e)
@@ -121,6 +138,11 @@ def send_message_desktop(name, message, repeat=1, delay=1.0):
 
 
 def fallback_to_web(args):
+    # a warm send_whatsapp.py --daemon skips Python/Playwright/Chromium startup entirely
+    from send_whatsapp_auto import run_via_daemon
+    status = run_via_daemon(args)
+    if status is not None:
+        return status
     script = os.path.join(os.path.dirname(__file__), 'send_whatsapp.py')
     if not os.path.isfile(script):
         print('Web automation not available:', script)
@@ -137,30 +159,36 @@ def fallback_to_web(args):
         cmd += ['--delay', str(args.delay)]
     if args.profile_dir:
         cmd += ['--profile-dir', args.profile_dir]
+    cmd += rate_limiter.cli_flags(args)
+    cmd += metrics.cli_flags(args)
     return subprocess.run(cmd).returncode
 
 
+@metrics.timed('send_message_via_url_mode')
 def send_message_via_url_mode(repeat=1, delay=1.0):
     """
     Used when the chat is already opened via whatsapp:// scheme.
     Just waits for window and presses Enter.
     """
-    win = find_or_start_whatsapp()
+    with metrics.span('desktop.find_window'):
+        win = find_or_start_whatsapp()
     if not win:
         print('Could not find WhatsApp window after URL launch.')
         return False
 
     try:
-        if win.is_minimized():
-            win.restore()
-        win.set_focus()
-        time.sleep(1.0) # wait for focus
+        with metrics.span('desktop.focus'):
+            if win.is_minimized():
+                win.restore()
+            win.set_focus()
+            time.sleep(1.0) # wait for focus
     except Exception:
         pass
 
     print('WhatsApp window active. Waiting for chat to load/draft...')
     # Increased wait time to ensure the text is fully inserted by WhatsApp
-    time.sleep(5.0) 
+    with metrics.span('desktop.draft_wait'):
+        time.sleep(5.0)
 
     # Method: VBScript fallback (Most robust for Windows UI automation)
     # If pywinauto fails to "convince" the app that Enter was pressed, wscript usually works.
@@ -173,7 +201,8 @@ def send_message_via_url_mode(repeat=1, delay=1.0):
             f.write('WshShell.SendKeys "{ENTER}"\n')
         
         # Run the VBS
-        subprocess.run(['cscript', '//Nologo', vbs_script], check=False)
+        with metrics.span('desktop.enter'):
+            subprocess.run(['cscript', '//Nologo', vbs_script], check=False)
         
         # clean up
         try:
@@ -201,6 +230,8 @@ def main():
     parser.add_argument('--repeat', type=int, default=1)
     parser.add_argument('--delay', type=float, default=1.0)
     parser.add_argument('--profile_dir', default='./playwright_userdata')
+    rate_limiter.add_arguments(parser)
+    metrics.add_arguments(parser)
     args = parser.parse_args()
 
     if not args.name and not args.phone:
@@ -208,7 +239,15 @@ def main():
         return 1
 
     # prefer name (desktop flow supports name)
-    ok = send_message_desktop(args.name or args.phone, args.message, args.repeat, args.delay)
+    metrics.from_args(args)
+    # same account key and state file as the web sender, so the caps hold across both paths and runs
+    scheduler = rate_limiter.from_args(args).load_state(rate_limiter.state_path(args.profile_dir))
+    try:
+        ok = send_message_desktop(args.name or args.phone, args.message, args.repeat, args.delay,
+                                  scheduler=scheduler, account=args.profile_dir)
+    finally:
+        scheduler.save_state(rate_limiter.state_path(args.profile_dir))
+    metrics.report(args)
     if not ok:
         print('Desktop automation failed, falling back to web.')
         return fallback_to_web(args)
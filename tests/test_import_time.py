@@ -0,0 +1,28 @@
+"""`python -X importtime` checks for the entry points: no heavy dependency at start-up, and within budget."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import IMPORT_BUDGETS_MS, check_import, import_budget_scale  # noqa: E402
+
+RUNS = 3
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scale = import_budget_scale(RUNS)
+
+    def test_entry_points(self):
+        for module in IMPORT_BUDGETS_MS:
+            with self.subTest(module=module):
+                best, budget, heavy = check_import(module, RUNS, self.scale)
+                self.assertEqual(heavy, [], f'{module} imports {heavy} at start-up')
+                self.assertLessEqual(best, budget, f'{module}: {best:.1f} ms > {budget:.0f} ms budget')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Simulated-clock checks for rate_limiter.RateScheduler: ceilings hold, throughput reaches them, fairness."""
+import bisect
+import collections
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import HOUR, RateScheduler, SimulatedClock  # noqa: E402
+
+
+def busiest_window(slots, period):
+    """Most slots in any rolling (t - period, t]."""
+    slots = sorted(slots)
+    return max(i + 1 - bisect.bisect_right(slots, t - period) for i, t in enumerate(slots))
+
+
+def reserve_ahead(sched, n, recipient=None):
+    """n reservations at the same instant, the way SenderPool books before it sleeps."""
+    return [sched.clock.now() + sched.reserve('acct', recipient) for _ in range(n)]
+
+
+def run_for(sched, seconds, recipients=1):
+    """Sequential next_slot() calls until `seconds` of simulated time; returns (slot, recipient) pairs."""
+    sends = []
+    while True:
+        recipient = f'r{sched.sent % recipients}'
+        sched.next_slot('acct', recipient)
+        if sched.clock.now() >= seconds:
+            return sends
+        sends.append((sched.clock.now(), recipient))
+
+
+class HourlyCapTest(unittest.TestCase):
+
+    def test_reservations_ahead_of_time_respect_the_hourly_cap(self):
+        sched = RateScheduler(hourly_cap=3, clock=SimulatedClock())
+        slots = reserve_ahead(sched, 8)
+        self.assertEqual(slots, [0, 0, 0, HOUR, HOUR, HOUR, 2 * HOUR, 2 * HOUR])
+        self.assertLessEqual(busiest_window(slots, HOUR), 3)
+
+    def test_interleaved_sleep_and_reserve_respects_the_hourly_cap(self):
+        clock = SimulatedClock()
+        sched = RateScheduler(hourly_cap=5, per_minute=60, clock=clock)
+        slots = []
+        for i in range(60):
+            slots.append(clock.now() + sched.reserve('acct'))
+            if i % 3 == 2:
+                clock.sleep(700)
+        self.assertLessEqual(busiest_window(slots, HOUR), 5)
+
+    def test_jitter_never_breaks_the_cap(self):
+        sched = RateScheduler(hourly_cap=10, jitter=300, clock=SimulatedClock(), seed=7)
+        slots = reserve_ahead(sched, 200)
+        self.assertLessEqual(busiest_window(slots, HOUR), 10)
+
+
+class RecipientCapTest(unittest.TestCase):
+
+    def test_per_recipient_cap_with_reservations_ahead(self):
+        sched = RateScheduler(per_recipient_per_hour=3, clock=SimulatedClock())
+        slots = reserve_ahead(sched, 12, recipient='alice')
+        self.assertLessEqual(busiest_window(slots, HOUR), 3)
+
+    def test_recipient_burst_does_not_exceed_the_hourly_count(self):
+        sched = RateScheduler(per_recipient_per_hour=3, recipient_burst=3, clock=SimulatedClock())
+        slots = reserve_ahead(sched, 12, recipient='alice')
+        self.assertEqual(slots[:3], [0, 0, 0])
+        self.assertLessEqual(busiest_window(slots, HOUR), 3)
+
+    def test_recipients_do_not_share_a_budget(self):
+        sched = RateScheduler(per_recipient_per_hour=1, clock=SimulatedClock())
+        self.assertEqual(reserve_ahead(sched, 1, 'a') + reserve_ahead(sched, 1, 'b'), [0, 0])
+
+
+class ThroughputTest(unittest.TestCase):
+
+    def test_per_minute_ceiling_is_reached_and_not_exceeded(self):
+        sched = RateScheduler(per_minute=20, burst=3, clock=SimulatedClock())
+        sends = run_for(sched, HOUR)
+        self.assertLessEqual(busiest_window([t for t, _ in sends], 60), 20 + 2)
+        self.assertGreaterEqual(len(sends), 20 * 60)
+
+    def test_simulated_day_hits_the_hourly_cap_every_hour_and_is_fair(self):
+        sched = RateScheduler(per_minute=20, hourly_cap=600, per_recipient_per_hour=10, clock=SimulatedClock())
+        sends = run_for(sched, 24 * HOUR, recipients=100)
+        hours = collections.Counter(int(t // HOUR) for t, _ in sends)
+        self.assertEqual(set(hours.values()), {600})
+        per_recipient = collections.Counter(r for _, r in sends)
+        self.assertLessEqual(max(per_recipient.values()) - min(per_recipient.values()), 1)
+        self.assertLessEqual(busiest_window([t for t, _ in sends], HOUR), 600)
+
+
+class StateTest(unittest.TestCase):
+
+    def test_hourly_window_survives_a_restart(self):
+        clock = SimulatedClock(1000.0)
+        sched = RateScheduler(hourly_cap=2, clock=clock)
+        reserve_ahead(sched, 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'rate_state.json')
+            sched.save_state(path)
+            again = RateScheduler(hourly_cap=2, clock=clock).load_state(path)
+        self.assertAlmostEqual(again.reserve('acct'), HOUR)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""SelectorRegistry learning: only lookups that found the element move the ranking."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selector_cache import DEMOTE_AFTER, SelectorRegistry  # noqa: E402
+
+
+class FakeHandle:
+    def is_visible(self):
+        return True
+
+
+class FakePage:
+    """Sync page stand-in: `visible` is the set of selectors present on the page."""
+
+    def __init__(self, visible=()):
+        self.visible = set(visible)
+
+    def wait_for_selector(self, selector, state='visible', timeout=0):
+        if not any(sel in self.visible for sel in selector.split(', ')):
+            raise TimeoutError(selector)
+
+    def query_selector(self, selector):
+        return FakeHandle() if selector in self.visible else None
+
+
+class SelectorRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reg = SelectorRegistry({'compose': ['#a', '#b', '#c']})
+
+    def test_timeouts_do_not_demote(self):
+        # the chat never opened: the composer wasn't there for any selector to find
+        for _ in range(DEMOTE_AFTER + 2):
+            self.assertIsNone(self.reg.resolve(FakePage(), 'compose'))
+        self.assertEqual(self.reg.stats, {})
+        self.assertEqual(self.reg.ranked('compose'), ['#a', '#b', '#c'])
+
+    def test_only_candidates_ahead_of_the_match_miss(self):
+        self.assertEqual(self.reg.resolve(FakePage({'#b', '#c'}), 'compose'), '#b')
+        stats = self.reg.stats['compose']
+        self.assertEqual(stats['#a'], {'hits': 0, 'misses': 1, 'streak': 1})
+        self.assertEqual(stats['#b'], {'hits': 1, 'misses': 0, 'streak': 0})
+        self.assertNotIn('#c', stats)
+        self.assertEqual(self.reg.ranked('compose')[0], '#b')
+
+    def test_a_vanished_winner_gives_way(self):
+        self.reg.winners['compose'] = '#a'
+        self.assertEqual(self.reg.resolve(FakePage({'#c'}), 'compose'), '#c')
+        self.assertEqual(self.reg.stats['compose']['#a']['streak'], 1)
+        self.assertEqual(self.reg.ranked('compose')[0], '#c')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,290 @@
+"""The sync send path and its async twins (send_whatsapp_async) must behave the same on the same page."""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import browser_session  # noqa: E402
+import invalid_numbers  # noqa: E402
+import send_whatsapp  # noqa: E402
+import send_whatsapp_async  # noqa: E402
+from send_whatsapp import (  # noqa: E402
+    CHAT_HEADER_JS, CHAT_TITLE_JS, CONFIRM_JS, MSG_SELECTORS, OUTGOING_SELECTOR, PASTE_JS, QR_SELECTOR,
+    SEARCH_SELECTORS, SEND_SELECTORS, WHATSAPP_URL,
+)
+
+SEARCH = SEARCH_SELECTORS[0]
+COMPOSER = MSG_SELECTORS[0]
+
+
+class FakeWhatsApp:
+    """
+    Just enough of WhatsApp Web for the send flow, as a sync page. A waited-for
+    selector matches when one of the visible elements' selectors is part of it.
+    """
+
+    def __init__(self, invalid=(), names=(), logged_in=True, typing_fails=False):
+        self.url = 'about:blank'
+        self.invalid = set(invalid)
+        self.names = set(names)
+        self.logged_in = logged_in
+        self.typing_fails = typing_fails
+        self.app = False
+        self.chat = None
+        self.dialog = False
+        self.search_text = ''
+        self.composer = ''
+        self.focus = None
+        self.outgoing = 0
+        self.gotos = []
+        self.keyboard = FakeKeyboard(self)
+
+    def _visible(self):
+        shown = []
+        if self.app:
+            shown += [SEARCH, 'div[aria-label="Chat list"]']
+        if self.chat:
+            shown += [COMPOSER, SEND_SELECTORS[0]]
+        if self.dialog:
+            shown.append('div[role="dialog"]')
+        if not self.logged_in:
+            shown.append(QR_SELECTOR)
+        return shown
+
+    def _count(self, selector):
+        if selector == OUTGOING_SELECTOR:
+            return self.outgoing
+        return int(any(v in selector for v in self._visible()))
+
+    def is_closed(self):
+        return False
+
+    def goto(self, url):
+        self.gotos.append(url)
+        self.url = url
+        self.app = self.logged_in
+        self.chat = None
+        self.dialog = False
+        phone = parse_qs(urlparse(url).query).get('phone')
+        if self.app and phone:
+            if phone[0] in self.invalid:
+                self.dialog = True
+            else:
+                self.chat = phone[0]
+
+    def wait_for_selector(self, selector, state='visible', timeout=0):
+        if not self._count(selector):
+            raise TimeoutError(selector)
+
+    def wait_for_function(self, js, arg=None, timeout=0):
+        if not self.evaluate(js, arg):
+            raise TimeoutError('wait_for_function')
+
+    def query_selector(self, selector):
+        return FakeHandle(self, selector) if selector in self._visible() else None
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+    def click(self, selector):
+        self.focus = 'search' if selector == SEARCH else 'composer'
+
+    def fill(self, selector, text):
+        self.search_text = text
+
+    def evaluate(self, js, arg=None):
+        if js == CHAT_HEADER_JS:
+            _, digits, name, before = arg
+            if self.chat is None or (before is not None and self.chat == before):
+                return False
+            return self.chat == digits or bool(name) and self.chat.lower() == name
+        if js == CHAT_TITLE_JS:
+            return self.chat
+        if js == CONFIRM_JS:
+            if self.outgoing > arg[1]:
+                return {'status': 'sent', 'queued_ms': 1.0, 'sent_ms': 2.0}
+            return {'status': 'timeout', 'queued_ms': None, 'sent_ms': None}
+        if js == PASTE_JS:
+            self.composer = arg[1]
+        return None
+
+
+class FakeKeyboard:
+    def __init__(self, page):
+        self.page = page
+
+    def press(self, key):
+        page = self.page
+        if key == 'Enter' and page.focus == 'search':
+            text = page.search_text
+            if text in page.names or (text.isdigit() and text not in page.invalid):
+                page.chat = text
+            page.search_text = ''
+            page.focus = None
+        elif key == 'Enter' and page.composer:
+            page.outgoing += 1
+            page.composer = ''
+        elif key == 'Escape':
+            page.dialog = False
+            page.search_text = ''
+        elif key == 'Backspace':
+            page.composer = ''
+        elif key == 'Shift+Enter':
+            page.composer += '\n'
+
+    def insert_text(self, text):
+        if self.page.typing_fails:
+            raise RuntimeError('composer detached')
+        self.page.composer += text
+
+    type = insert_text
+
+
+class FakeHandle:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+
+    def is_visible(self):
+        return True
+
+    def click(self):
+        self.page.click(self.selector)
+
+    def evaluate(self, js, arg=None):
+        return len(self.page.composer)  # SELECT_ALL_JS: the draft's length
+
+
+class FakeLocator:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+        self.first = self
+
+    def count(self):
+        return self.page._count(self.selector)
+
+    def is_visible(self):
+        return self.count() > 0
+
+
+class Async:
+    """The same fake, as a playwright.async_api object: methods become coroutines, fakes come back wrapped."""
+
+    _FAKES = (FakeWhatsApp, FakeKeyboard, FakeHandle, FakeLocator)
+    _SYNC = ('locator', 'is_closed')  # plain methods in playwright.async_api too
+
+    def __init__(self, target):
+        self._target = target
+
+    @classmethod
+    def _wrap(cls, value):
+        return cls(value) if isinstance(value, cls._FAKES) else value
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return self._wrap(value)
+        if name in self._SYNC:
+            return lambda *args, **kwargs: self._wrap(value(*args, **kwargs))
+
+        async def method(*args, **kwargs):
+            return self._wrap(value(*args, **kwargs))
+        return method
+
+
+def run_sync(fake, steps):
+    return [step(fake) for step in steps]
+
+
+def run_async(fake, steps):
+    async def main():
+        page = Async(fake)
+        return [await step(page) for step in steps]
+    return asyncio.run(main())
+
+
+class SendPathParityTest(unittest.TestCase):
+
+    def setUp(self):
+        send_whatsapp.INVALID_NUMBERS = invalid_numbers.InvalidNumberCache()
+        send_whatsapp.SELECTORS.winners.clear()
+        send_whatsapp.SELECTORS.stats.clear()
+        for key in send_whatsapp.NAV_STATS:
+            send_whatsapp.NAV_STATS[key] = 0
+        self.opts = send_whatsapp.send_options()
+        self.profile = getattr(self, 'profile', None)
+
+    def both(self, make_fake, sync_steps, async_steps):
+        """Run each path on its own fresh fake; returns [(outcomes, nav stats, fake)] for sync, then async."""
+        runs = []
+        for runner, steps in ((run_sync, sync_steps), (run_async, async_steps)):
+            self.setUp()
+            fake = make_fake()
+            outcomes = runner(fake, steps)
+            fake.session_fresh = browser_session.session_fresh(self.profile) if self.profile else None
+            runs.append((outcomes, dict(send_whatsapp.NAV_STATS), fake))
+        return runs
+
+    def send_steps(self, jobs):
+        args = argparse.Namespace()
+
+        def sync_step(job):
+            return lambda page: send_whatsapp.send_job(page, job, args).status
+
+        def async_step(job):
+            async def step(page):
+                return (await send_whatsapp_async.async_send_job(page, job, self.opts)).status
+            return step
+        return [sync_step(job) for job in jobs], [async_step(job) for job in jobs]
+
+    def test_phone_sends_reuse_search_and_goto_alike(self):
+        jobs = [{'phone': '15550001', 'message': 'a'}, {'phone': '15550001', 'message': 'b'},
+                {'phone': '15559999', 'message': 'c'}, {'phone': '15550001', 'message': 'd'}]
+
+        def make_fake():
+            fake = FakeWhatsApp(invalid={'15559999'})
+            fake.goto(WHATSAPP_URL)
+            return fake
+        (sync_out, sync_nav, _), (async_out, async_nav, _) = self.both(make_fake, *self.send_steps(jobs))
+        self.assertEqual(sync_out, ['sent', 'sent', 'invalid', 'sent'])
+        self.assertEqual(async_out, sync_out)
+        self.assertEqual(sync_nav, {'reused': 1, 'inapp': 2, 'goto': 1})
+        self.assertEqual(async_nav, sync_nav)
+
+    def test_trusted_login_is_settled_by_the_first_load(self):
+        with tempfile.TemporaryDirectory() as profile:
+            self.profile = profile
+            sync_steps = [lambda page: send_whatsapp.ensure_logged_in(page, profile_dir=profile)]
+            async_steps = [lambda page: send_whatsapp_async.async_ensure_logged_in(page, profile_dir=profile)]
+            job = {'name': 'Team', 'message': 'standup'}
+            more_sync, more_async = self.send_steps([job])
+            for logged_in, expected in ((True, 'sent'), (False, 'failed')):
+                def make_fake():
+                    browser_session.mark_logged_in(profile)
+                    return FakeWhatsApp(names={'Team'}, logged_in=logged_in)
+                runs = self.both(make_fake, sync_steps + more_sync, async_steps + more_async)
+                for path, (outcomes, _, fake) in zip(('sync', 'async'), runs):
+                    with self.subTest(logged_in=logged_in, path=path):
+                        self.assertEqual(outcomes, [True, expected])
+                        # trusted without a load; the by-name send loaded the app once and settled the stamp
+                        self.assertEqual(fake.gotos, [WHATSAPP_URL])
+                        self.assertEqual(fake.session_fresh, logged_in)
+                        self.assertEqual(send_whatsapp._unverified, {})
+
+    def test_a_failing_composer_is_a_failed_send_not_an_exception(self):
+        def make_fake():
+            fake = FakeWhatsApp(names={'Team'}, typing_fails=True)
+            fake.goto(WHATSAPP_URL)
+            return fake
+        runs = self.both(make_fake, *self.send_steps([{'name': 'Team', 'message': 'x'}]))
+        self.assertEqual([outcomes for outcomes, _, _ in runs], [['failed'], ['failed']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""send_queue.SendQueue: no job is sent twice in one run, and only pre-Enter failures are retried."""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from send_queue import FAILED, PENDING, SENT, SendQueue  # noqa: E402
+
+
+class SendQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = SendQueue(os.path.join(self.tmp.name, 'queue.db'))
+        self.queue.enqueue_many('c', [(f'k{i}', {'row': i}) for i in range(5)])
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def run_once(self, outcome):
+        """One pass over the campaign; `outcome(row)` -> (ok, retry). Returns the rows attempted."""
+        rows = []
+        for job in self.queue.iter_claimed('c', batch=2):
+            self.queue.start(job['job_id'])
+            ok, retry = outcome(job['row'])
+            self.queue.finish(job['job_id'], ok, None if ok else 'boom', retry=retry)
+            rows.append(job['row'])
+        return rows
+
+    def test_retryable_failure_waits_for_the_next_run(self):
+        self.assertEqual(self.run_once(lambda row: (row != 1, row == 1)), [0, 1, 2, 3, 4])
+        self.assertEqual(self.queue.get_state('k1'), PENDING)
+        self.assertEqual(self.run_once(lambda row: (True, False)), [1])
+        self.assertEqual(self.queue.get_state('k1'), SENT)
+
+    def test_failure_that_may_have_sent_is_never_requeued(self):
+        self.run_once(lambda row: (row != 2, False))
+        self.assertEqual(self.queue.get_state('k2'), FAILED)
+        self.assertEqual(self.run_once(lambda row: (True, False)), [])
+
+    def test_retries_stop_after_max_attempts(self):
+        for _ in range(5):
+            self.run_once(lambda row: (row != 3, True))
+        self.assertEqual(self.queue.get_state('k3'), FAILED)
+
+    def test_claimed_but_unstarted_jobs_are_resumed(self):
+        claimed = self.queue.claim('c', 3)
+        self.queue.start(claimed[0]['job_id'])
+        self.assertEqual(self.queue.recover('c'), (2, 1))
+        self.assertEqual(self.queue.counts('c'), {PENDING: 4, FAILED: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,62 +1,53 @@
-import speech_recognition as sr
-import pyttsx3
-import sys
+#!/usr/bin/env python3
+"""
+WhatsApp voice assistant: "send message to <name>", dictate, confirm.
+
+The assistant runs as a pipeline of threads joined by queues, so nothing
+waits on anything it doesn't need:
+
+    capture -> recognize -> dialog (intent + contact) -> speak
+                                      \\-> send dispatcher (one send at a time)
+
+A confirmed message goes to the dispatcher and the assistant goes straight
+back to listening; the send (and the desktop app's draft wait) happens in the
+background and its outcome is announced when it finishes.
+
+Audio sources, recognizers and speakers are pluggable. The defaults are the
+microphone, Google's recognizer and pyttsx3; from WAV files with a stub
+recognizer that reads each file's transcript from a `.txt` next to it, the
+whole conversation runs offline:
+
+    python voice_whatsapp.py --wav cmd.wav name.wav text.wav yes.wav --recognizer stub --tts print --dry-run
+"""
+import argparse
+import json
 import os
-import time
+import queue
 import re
-import difflib
+import sys
+import threading
+import time
+import wave
 
 # Import existing modules
 import contacts_manager
-import send_whatsapp_auto
-
-# Initialize TTS
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-# Try to find a good english voice
-for v in voices:
-    if "english" in v.name.lower():
-        engine.setProperty('voice', v.id)
-        break
-engine.setProperty('rate', 160) # Speed
-
-def speak(text):
-    print(f"Assistant: {text}")
-    engine.say(text)
-    engine.runAndWait()
-
-import winsound
-
-def listen(r, source, timeout_dur=5):
-    # Visual and Auditory cue that mic is ready
-    print(f"Listening... (Threshold: {r.energy_threshold})")
-    winsound.Beep(500, 200) # Low freq, short beep
-    
-    try:
-        # Increased phrase_time_limit to allow longer pauses/sentences
-        audio = r.listen(source, timeout=timeout_dur, phrase_time_limit=15)
-        text = r.recognize_google(audio)
-        print(f"You said: {text}")
-        return text.lower()
-    except sr.WaitTimeoutError:
-        print("Timeout (silence)")
-        return ""
-    except sr.UnknownValueError:
-        print("Could not understand audio")
-        return ""
-    except sr.RequestError:
-        print("Network error")
-        return ""
+
+# chosen TTS voice, so later starts skip enumerating every installed voice
+VOICE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tts_voice.json')
+YES_WORDS = ('yes', 'send', 'okay')
+EXIT_WORDS = ('exit', 'stop', 'quit')
+_DONE = object()  # end-of-stream marker passed down the queues
+
 
 def parse_contact_from_command(command):
     # Expanded regex to handle "message to", "message tu", "send to" etc.
-    # command is already lowercased in listen()
-    
+    # command is already lowercased by the recognizer stage
+
     # Remove common start phrases to simplify parsing
     command = command.replace("send a message", "message")
     command = command.replace("send message", "message")
-    
-    # Regex to capture name. 
+
+    # Regex to capture name.
     # specific handling for 'tu' which often appears instead of 'to' in Indian English accents
     match = re.search(r'(?:to|tell|msg|message)\s+(?:to\s+|tu\s+)?(\w+(?:\s+\w+)*)', command)
     if match:
@@ -66,157 +57,456 @@ def parse_contact_from_command(command):
              possible_name = possible_name[3:]
         if possible_name.startswith("tu "):
              possible_name = possible_name[3:]
-             
+
         return possible_name
     return None
 
 def normalize_name(name):
-    # Fuzzy match helper using difflib
-    contacts = contacts_manager.load_contacts()
-    all_names = list(contacts.keys())
-    
+    # Fuzzy match helper backed by the prebuilt contact_matcher index
     # Sanity check: if name is too long (> 4 words), it's probably not a name
     if len(name.split()) > 4:
         return None
-    
-    # 1. Exact match (case insensitive)
-    for c in all_names:
-        if c.lower() == name.lower():
-            return c
-            
-    # 2. Contains match
-    for c in all_names:
-        if name.lower() in c.lower():
-            return c
-            
-    # 3. Fuzzy match (get closest matches)
-    # cutoff=0.6 means 60% similarity required
-    matches = difflib.get_close_matches(name, all_names, n=1, cutoff=0.6)
+
+    import contact_matcher
+
+    # exact > contains > fuzzy (60% similarity or same-sounding words)
+    matches = contact_matcher.get_matcher().match(name, limit=3)
     if matches:
-        return matches[0]
-            
+        print(f"Contact candidates: {matches}")
+        return matches[0][0]
+
     return None
 
-def main():
-    # Setup microphone and ambient noise once
-    r = sr.Recognizer()
-    mic = sr.Microphone()
-    with mic as source:
-        print("Adjusting for ambient noise... ensure silence for 1 second.")
-        r.adjust_for_ambient_noise(source, duration=1.0)
-        # Disable dynamic adjustment to prevent threshold drifting to 0
-        r.dynamic_energy_threshold = False
-        print(f"Threshold set to: {r.energy_threshold}")
-    
-    speak("WhatsApp Voice Assistant Ready. Say 'Send message to [Name]'")
-    
-    while True:
-        # Pass pre-initialized recognizer and source
-        with mic as source:
-             command = listen(r, source, timeout_dur=10)
-             
-        if not command:
-            continue
-            
-        if "exit" in command or "stop" in command or "quit" in command:
-            speak("Goodbye.")
-            break
-            
-        if "send" in command or "message" in command:
-            target_name = parse_contact_from_command(command)
-            
-            # Name resolution loop
-            while True:
-                if not target_name:
-                    speak("Who do you want to send the message to?")
-                    with mic as source:
-                        target_name = listen(r, source, timeout_dur=8)
-                    if not target_name:
-                         break 
-                
-                resolved_name = normalize_name(target_name)
-                if not resolved_name:
-                    if len(target_name.split()) > 4:
-                         speak("That sounds like a message, not a name. Please say just the contact name.")
-                    else:
-                         speak(f"I could not find contact {target_name}. Please say the name again.")
-                    
-                    with mic as source:
-                        target_name = listen(r, source, timeout_dur=8)
-                    if not target_name:
-                        break
-                    continue
-                
+
+# -- audio sources ----------------------------------------------------------------
+
+class WavClip:
+    """One utterance read from a WAV file (raw PCM plus its format)."""
+
+    __slots__ = ('path', 'frames', 'sample_rate', 'sample_width')
+
+    def __init__(self, path):
+        self.path = path
+        with wave.open(path, 'rb') as w:
+            self.sample_rate = w.getframerate()
+            self.sample_width = w.getsampwidth()
+            self.frames = w.readframes(w.getnframes())
+
+
+class WavSource:
+    """Replays WAV files as utterances, one per listen, then ends the stream."""
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+
+    def listen(self, timeout):
+        path = next(self._paths, None)
+        return _DONE if path is None else WavClip(path)
+
+
+class MicSource:
+    """The default microphone via speech_recognition; an empty utterance on silence."""
+
+    def __init__(self, recognizer=None):
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.recognizer = recognizer or sr.Recognizer()
+        self.mic = sr.Microphone()
+        with self.mic as source:
+            print("Adjusting for ambient noise... ensure silence for 1 second.")
+            self.recognizer.adjust_for_ambient_noise(source, duration=1.0)
+            # Disable dynamic adjustment to prevent threshold drifting to 0
+            self.recognizer.dynamic_energy_threshold = False
+            print(f"Threshold set to: {self.recognizer.energy_threshold}")
+
+    def listen(self, timeout):
+        # Visual and Auditory cue that mic is ready
+        print(f"Listening... (Threshold: {self.recognizer.energy_threshold})")
+        try:
+            import winsound
+            winsound.Beep(500, 200) # Low freq, short beep
+        except ImportError:
+            pass
+        try:
+            with self.mic as source:
+                # Increased phrase_time_limit to allow longer pauses/sentences
+                return self.recognizer.listen(source, timeout=timeout, phrase_time_limit=15)
+        except self.sr.WaitTimeoutError:
+            print("Timeout (silence)")
+            return None
+
+
+# -- recognizers ------------------------------------------------------------------
+
+class GoogleRecognizer:
+    """speech_recognition's Google Web Speech API; accepts mic audio or WavClips."""
+
+    def __init__(self):
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, audio):
+        if isinstance(audio, WavClip):
+            audio = self.sr.AudioData(audio.frames, audio.sample_rate, audio.sample_width)
+        try:
+            return self.recognizer.recognize_google(audio)
+        except self.sr.UnknownValueError:
+            print("Could not understand audio")
+        except self.sr.RequestError:
+            print("Network error")
+        return ""
+
+
+class StubRecognizer:
+    """
+    Offline recognizer for tests and benchmarks: the transcript of `clip.wav`
+    is `transcripts[path]` or the contents of `clip.txt`. `latency` (seconds)
+    stands in for the time a real recognizer takes.
+    """
+
+    def __init__(self, transcripts=None, latency=0.0):
+        self.transcripts = transcripts or {}
+        self.latency = latency
+
+    def recognize(self, audio):
+        if self.latency:
+            time.sleep(self.latency)
+        path = getattr(audio, 'path', None)
+        if path in self.transcripts:
+            return self.transcripts[path]
+        try:
+            with open(os.path.splitext(path)[0] + '.txt', 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except (OSError, TypeError):
+            return ""
+
+
+# -- speakers ---------------------------------------------------------------------
+
+def pick_voice(engine, cache_path=VOICE_CACHE):
+    """Set an English voice on `engine`: the cached id if it still works, else scan the voices once and cache it."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f).get('voice_id')
+    except (OSError, ValueError):
+        cached = None
+    if cached:
+        try:
+            engine.setProperty('voice', cached)
+            return cached
+        except Exception:
+            pass
+    # Try to find a good english voice
+    for v in engine.getProperty('voices'):
+        if "english" in v.name.lower():
+            engine.setProperty('voice', v.id)
+            try:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump({'voice_id': v.id, 'name': v.name}, f)
+            except OSError as e:
+                print(f'Warning: could not cache TTS voice: {e}')
+            return v.id
+    return None
+
+
+class Pyttsx3Speaker:
+    """pyttsx3 text-to-speech. The engine is created on first use, i.e. on the TTS thread that owns it."""
+
+    def __init__(self, rate=160):
+        self.rate = rate
+        self.engine = None
+
+    def say(self, text):
+        if self.engine is None:
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            pick_voice(self.engine)
+            self.engine.setProperty('rate', self.rate) # Speed
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+
+class PrintSpeaker:
+    """Prints only; `seconds_per_char` simulates speaking time for benchmarks."""
+
+    def __init__(self, seconds_per_char=0.0):
+        self.seconds_per_char = seconds_per_char
+
+    def say(self, text):
+        if self.seconds_per_char:
+            time.sleep(len(text) * self.seconds_per_char)
+
+
+# -- senders ----------------------------------------------------------------------
+
+def desktop_send(job):
+    """Send one {'name', 'phone', 'message'} job through WhatsApp Desktop; True on success."""
+    import send_whatsapp_desktop
+
+    if job['phone']:
+        print(f"Smart Send to {job['name']} ({job['phone']})")
+        from urllib.parse import quote
+
+        # 1. Open URL
+        os.startfile(f"whatsapp://send?phone={job['phone']}&text={quote(job['message'])}")
+        # 2. Key injection (send_message_via_url_mode waits for the draft internally)
+        return send_whatsapp_desktop.send_message_via_url_mode()
+    # Fallback to search mode if no phone number (less likely here as we resolve name)
+    return send_whatsapp_desktop.send_message_desktop(job['name'], job['message'])
+
+
+def dry_run_send(job):
+    print(f"[dry run] would send to {job['name']} ({job['phone'] or 'by name'}): {job['message']}")
+    return True
+
+
+# -- dialog -----------------------------------------------------------------------
+
+class Dialog:
+    """
+    The conversation as a state machine: feed it each recognized utterance,
+    get back (prompts to speak, listen timeout, send job or None). No I/O, so
+    it runs the same inside the pipeline or in a plain loop.
+    """
+
+    def __init__(self):
+        self.reset()
+        self.finished = False
+
+    def reset(self):
+        self.state = 'command'
+        self.name = self.phone = self.content = None
+        self.misses = 0
+
+    def handle(self, text):
+        text = (text or '').lower().strip()
+        handler = getattr(self, '_on_' + self.state)
+        return handler(text)
+
+    def _reply(self, *prompts, timeout=10, job=None):
+        return list(prompts), timeout, job
+
+    def _on_command(self, text):
+        if not text:
+            return self._reply()
+        if any(word in text for word in EXIT_WORDS):
+            self.finished = True
+            return self._reply("Goodbye.")
+        if "send" in text or "message" in text:
+            target = parse_contact_from_command(text)
+            if not target:
+                self.state = 'name'
+                return self._reply("Who do you want to send the message to?", timeout=8)
+            return self._resolve(target)
+        print("Command ignored.")
+        return self._reply()
+
+    def _on_name(self, text):
+        if not text:
+            self.reset()
+            return self._reply()
+        return self._resolve(text)
+
+    def _resolve(self, target):
+        resolved = normalize_name(target)
+        if not resolved:
+            self.state = 'name'
+            if len(target.split()) > 4:
+                return self._reply("That sounds like a message, not a name. Please say just the contact name.",
+                                   timeout=8)
+            return self._reply(f"I could not find contact {target}. Please say the name again.", timeout=8)
+        self.name = resolved
+        self.phone = contacts_manager.get_phone_by_name(resolved)
+        self.state = 'message'
+        self.misses = 0
+        return self._reply(f"Found contact {resolved}. What is the message?")
+
+    def _on_message(self, text):
+        if not text:
+            self.misses += 1
+            if self.misses < 3:
+                return self._reply("I didn't hear anything. Please say the message again.")
+            self.reset()
+            return self._reply("Timed out waiting for message. Cancelling.")
+        self.content = text
+        self.state = 'confirm'
+        self.misses = 0
+        return self._reply(f"Ready to send to {self.name}. Message is: {text}. Say yes to send.", timeout=8)
+
+    def _on_confirm(self, text):
+        if not text:
+            self.misses += 1
+            if self.misses < 3:
+                return self._reply("I didn't hear you. Say Yes/Send to confirm, or No to cancel.", timeout=8)
+        if text and any(word in text for word in YES_WORDS):
+            job = {'name': self.name, 'phone': self.phone, 'message': self.content}
+            self.reset()
+            return self._reply("Sending message now...", job=job)
+        self.reset()
+        return self._reply("Cancelled.")
+
+
+# -- pipeline ---------------------------------------------------------------------
+
+class VoicePipeline:
+    """
+    Five stages on their own threads: capture, recognize, dialog, speak and
+    send. Capture takes turns with the dialog and waits while the assistant
+    is talking (so the microphone doesn't hear it), but never waits for a
+    send: the next command is heard while earlier messages are still going out.
+    A send finishes at no particular moment, so its announcement is held until
+    capture is between turns rather than spoken into an open microphone.
+    """
+
+    def __init__(self, source, recognizer, speaker, sender=desktop_send, dialog=None):
+        self.source = source
+        self.recognizer = recognizer
+        self.speaker = speaker
+        self.sender = sender
+        self.dialog = dialog or Dialog()
+        self.audio_q = queue.Queue(maxsize=4)
+        self.text_q = queue.Queue()
+        self.speech_q = queue.Queue()
+        self.send_q = queue.Queue()
+        self.quiet = threading.Event()  # set while nothing is queued or being spoken
+        self.quiet.set()
+        self.turn = threading.Event()   # set once the dialog has answered the last utterance
+        self.turn.set()
+        self.stopped = threading.Event()
+        self._unspoken = 0
+        self._held = []  # send outcomes waiting for the microphone to close
+        self._lock = threading.Lock()
+        self.timeout = 10
+        self.sent = []  # (job, ok) in completion order
+
+    def say(self, text):
+        print(f"Assistant: {text}")
+        with self._lock:
+            self._unspoken += 1
+            self.quiet.clear()
+        self.speech_q.put(text)
+
+    def announce(self, text):
+        """Like say(), but waits until capture isn't listening."""
+        with self._lock:
+            self._held.append(text)
+
+    def _release_held(self):
+        with self._lock:
+            held, self._held = self._held, []
+        for text in held:
+            self.say(text)
+
+    def _capture(self):
+        while True:
+            self.turn.wait()
+            self.turn.clear()
+            # between turns: anything said now is spoken (and waited out) before the mic opens
+            self._release_held()
+            self.quiet.wait()
+            if self.stopped.is_set():
+                return
+            audio = self.source.listen(self.timeout)
+            self.audio_q.put(audio)
+            if audio is _DONE:
+                return
+
+    def _recognize(self):
+        while True:
+            audio = self.audio_q.get()
+            if audio is _DONE:
+                self.text_q.put(_DONE)
+                return
+            text = self.recognizer.recognize(audio) if audio is not None else ""
+            if text:
+                print(f"You said: {text}")
+            self.text_q.put(text.lower())
+
+    def _converse(self):
+        while True:
+            text = self.text_q.get()
+            if text is _DONE:
+                break
+            prompts, self.timeout, job = self.dialog.handle(text)
+            for prompt in prompts:
+                self.say(prompt)
+            if job:
+                self.send_q.put(job)
+            if self.dialog.finished:
                 break
-            
-            if not resolved_name:
-                continue
-
-            phone = contacts_manager.get_phone_by_name(resolved_name)
-            speak(f"Found contact {resolved_name}. What is the message?")
-            
-            content = ""
-            for attempt in range(3):
-                with mic as source:
-                    content = listen(r, source, timeout_dur=10)
-                if content:
-                    break
-                else:
-                    if attempt < 2:
-                        speak("I didn't hear anything. Please say the message again.")
-            
-            if not content:
-                speak("Timed out waiting for message. Cancelling.")
-                continue
-                
-            speak(f"Ready to send to {resolved_name}. Message is: {content}. Say yes to send.")
-            
-            confirm = ""
-            for attempt in range(3):
-                with mic as source:
-                    confirm = listen(r, source, timeout_dur=8)
-                if confirm:
-                     break
-                elif attempt < 2:
-                     speak("I didn't hear you. Say Yes/Send to confirm, or No to cancel.")
-            
-            if confirm and ("yes" in confirm or "send" in confirm or "okay" in confirm):
-                speak("Sending message now...")
-                
-                try:
-                    # Optimization: Use direct module calls instead of subprocess
-                    # This avoids python startup overhead
-                    if phone:
-                        print(f"Smart Send to {resolved_name} ({phone})")
-                        from urllib.parse import quote
-                        import send_whatsapp_desktop
-                        
-                        # 1. Open URL
-                        url = f'whatsapp://send?phone={phone}&text={quote(content)}'
-                        os.startfile(url)
-                        
-                        # 2. Key injection
-                        # send_message_via_url_mode waits internally
-                        if send_whatsapp_desktop.send_message_via_url_mode():
-                            speak("Message sent.")
-                        else:
-                            speak("Mechanism reported failure.")
-                    else:
-                        # Fallback to search mode if no phone number (less likely here as we resolve name)
-                        import send_whatsapp_desktop
-                        if send_whatsapp_desktop.send_message_desktop(resolved_name, content):
-                            speak("Message sent.")
-                        else:
-                            speak("Could not send message.")
-
-                except Exception as e:
-                    print(f"Error: {e}")
-                    speak("Failed to execute sending command.")
-            else:
-                speak("Cancelled.")
-        
-        else:
-            print("Command ignored.")
+            self.turn.set()
+        self.stopped.set()
+        self.turn.set()
+        self.send_q.put(_DONE)
+
+    def _speak(self):
+        while True:
+            text = self.speech_q.get()
+            if text is _DONE:
+                return
+            try:
+                self.speaker.say(text)
+            except Exception as e:
+                print(f"TTS error: {e}")
+            with self._lock:
+                self._unspoken -= 1
+                if not self._unspoken:
+                    self.quiet.set()
+
+    def _dispatch(self):
+        while True:
+            job = self.send_q.get()
+            if job is _DONE:
+                return
+            try:
+                ok = bool(self.sender(job))
+            except Exception as e:
+                print(f"Error: {e}")
+                ok = False
+            self.sent.append((job, ok))
+            self.announce(f"Message to {job['name']} sent." if ok else f"Could not send the message to {job['name']}.")
+
+    def run(self, greeting="WhatsApp Voice Assistant Ready. Say 'Send message to [Name]'"):
+        """Run until the user says exit (or the source runs out); returns [(job, ok)] for every send."""
+        if greeting:
+            self.say(greeting)
+        threads = {}
+        for stage in (self._speak, self._dispatch, self._recognize, self._converse, self._capture):
+            name = stage.__name__.strip('_')
+            threads[name] = threading.Thread(target=stage, name=name, daemon=True)
+        for thread in threads.values():
+            thread.start()
+        try:
+            # the dialog ends the conversation; pending sends and their announcements still finish
+            for name in ('converse', 'dispatch', 'capture'):
+                while threads[name].is_alive():
+                    threads[name].join(0.5)
+            self._release_held()
+            self.speech_q.put(_DONE)
+            while threads['speak'].is_alive():
+                threads['speak'].join(0.5)
+        except KeyboardInterrupt:
+            self.stopped.set()
+        return self.sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WhatsApp voice assistant (WhatsApp Desktop).')
+    parser.add_argument('--wav', nargs='+', help='Play these WAV files as the spoken input instead of using the microphone')
+    parser.add_argument('--recognizer', choices=['google', 'stub'], default='google', help='stub: transcript of x.wav is read from x.txt')
+    parser.add_argument('--tts', choices=['pyttsx3', 'print'], default='pyttsx3', help='print: show replies without speaking them')
+    parser.add_argument('--dry-run', action='store_true', help='Print messages instead of sending them')
+    args = parser.parse_args()
+
+    recognizer = StubRecognizer() if args.recognizer == 'stub' else GoogleRecognizer()
+    source = WavSource(args.wav) if args.wav else MicSource()
+    speaker = PrintSpeaker() if args.tts == 'print' else Pyttsx3Speaker()
+    pipeline = VoicePipeline(source, recognizer, speaker, sender=dry_run_send if args.dry_run else desktop_send)
+    sent = pipeline.run()
+    return 0 if all(ok for _, ok in sent) else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())